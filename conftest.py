@@ -0,0 +1,29 @@
+import os
+from subprocess import run
+
+import pytest
+from pyffmpeg.misc import ffmpeg_bin
+
+
+TEST_FOLDER = os.path.join(os.path.abspath('.'), 'tests')
+EASY_LEMON = os.path.join(TEST_FOLDER, 'Easy_Lemon_30_Second_-_Kevin_MacLeod.mp3')
+
+
+@pytest.fixture(scope='module')
+def long_video(tmp_path_factory):
+    # 12s at 25 fps with a keyframe every second
+    file_name = str(tmp_path_factory.mktemp('segments') / 'long.mp4')
+    run([
+        ffmpeg_bin(), '-loglevel', 'error', '-y',
+        '-f', 'lavfi', '-i', 'testsrc=size=160x120:rate=25',
+        '-f', 'lavfi', '-i', 'sine=f=440:sample_rate=22050',
+        '-t', '12', '-c:v', 'libx264', '-g', '25', '-c:a', 'aac',
+        '-shortest', file_name], check=True)
+    return file_name
+
+
+def _frames(file_name):
+    out = run([
+        ffmpeg_bin(), '-loglevel', 'error', '-i', file_name, '-map', '0:v',
+        '-c', 'copy', '-f', 'framecrc', '-'], capture_output=True, check=True)
+    return sum(1 for x in out.stdout.splitlines() if not x.startswith(b'#'))
@@ -40,27 +40,25 @@ bin_name = 'ffmpeg'
 if sys.platform == "win32":
     # Download FFmpeg for Windows
     link = 'https://github.com/BtbN/FFmpeg-Builds/releases/download/latest/ffmpeg-master-latest-win64-gpl.zip'
-    out = out_folder= 'win32'
+    out_folder = 'win32'
     bin_name = 'ffmpeg.exe'
 
   
 elif sys.platform == "darwin":
     # Download FFmpeg for MacOS
     link = 'https://evermeet.cx/ffmpeg/get/zip'
-    out = out_folder= 'darwin'
+    out_folder = 'darwin'
 
 else:
     # Download FFmpeg for linux
     link = "https://github.com/BtbN/FFmpeg-Builds/releases/download/latest/ffmpeg-master-latest-linux64-gpl.tar.xz"
-    out = 'linux'
     out_folder = 'linuxmod'
 
 try:
     arch = download(link)
     fullpath = extract_to_folder(bin_name, arch, z=False)
-    misc.Paths().convert_to_py(fullpath, out)
-    pyfile_dest = bin_path / out_folder
-    shutil.copy(f'{out}.py', pyfile_dest)
+    # compressed binary and its sha256, extracted on first use
+    misc.Paths.convert_to_blob(fullpath, bin_path / out_folder)
 
 except Exception as err:
     print(f"{err!r}")
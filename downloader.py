@@ -117,16 +117,9 @@ if os_name == 'win32':
         # extract to folder
         arch = glob.glob('ffmpeg*.zip')[0]
         fullpath = extract_to_folder('ffmpeg.exe', arch, z=False)
-        out = 'win32'
-
-        misc.Paths().convert_to_py(fullpath, out)
-        expected_file = out + '.py'
-        print(f'{expected_file=:}')
-        print('Does it exists?')
-        print(os.path.exists(expected_file))
-        # copy py file to folder_name
+
         win32 = os.path.join(bin_path, 'win32')
-        # delete old file
+        # delete the old base64 module, the blob replaces it
         old_file = os.path.join(win32, 'win32.py')
         print("old_file exists: ", os.path.exists(old_file))
         try:
@@ -134,12 +127,11 @@ if os_name == 'win32':
             print('removed old file')
         except Exception as e:
             print(e)
-        # copy file to folder
-        print('copying python file')
-        shutil.copy('win32.py', win32)
+        # compressed binary and its sha256, extracted on first use
+        blob = misc.Paths.convert_to_blob(fullpath, win32)
+        print("blob exists now: ", os.path.exists(blob))
         print('contents of win32 below')
         print(os.listdir(win32))
-        print("file exist now: ", os.path.exists(old_file))
 
     except Exception as err:
         print(err)
@@ -156,21 +148,16 @@ elif os_name == 'darwin':
 
         arch = glob.glob('ffmpeg*.zip')[0]
         fullpath = extract_to_folder('ffmpeg',arch, z=False)
-        out = 'darwin'
-
-        misc.Paths().convert_to_py(fullpath, out)
 
         darwin = os.path.join(bin_path, 'darwin')
         old_file = os.path.join(darwin, 'darwin.py')
         try:
-            # delete old file
+            # delete the old base64 module, the blob replaces it
             os.remove(old_file)
         except Exception as e:
             print(e)
-        # copy file to folder
-        print('file exists: ', os.path.exists('darwin.py'))
-        shutil.copy('darwin.py', darwin)
-        print('file exists in folder: ', os.path.exists(old_file))
+        blob = misc.Paths.convert_to_blob(fullpath, darwin)
+        print('blob exists in folder: ', os.path.exists(blob))
     except Exception as err:
         print(err)
         print(os.listdir(cwd))
@@ -184,26 +171,18 @@ else:
 
         arch = glob.glob('ffmpeg*.tar.xz')[0]
         fullpath = extract_to_folder('ffmpeg', arch, z=False)
-        out = 'linux'
-
-        misc.Paths().convert_to_py(fullpath, out)
 
         linux = os.path.join(bin_path, 'linuxmod')
+        old_file = os.path.join(linux, 'linux.py')
         try:
-            # delete old file
+            # delete the old base64 module, the blob replaces it
             print('delete old file')
-            old_file = os.path.join(linux, 'linux.py')
             os.remove(old_file)
         except Exception as e:
             print(e)
-        # copy file to folder
-        print(f"{old_file=:}")
-        print('Does it exist: ', os.path.exists(old_file))
-        print('coping to new file')
-        print(os.listdir('.'))
-        shutil.copy('linux.py', linux)
-        print(f"{old_file=:}")
-        print('Does it exist: ', os.path.exists(old_file))
+        blob = misc.Paths.convert_to_blob(fullpath, linux)
+        print(f"{blob=:}")
+        print('Does it exist: ', os.path.exists(blob))
     except Exception as err:
         print(err)
         print(os.listdir(cwd))
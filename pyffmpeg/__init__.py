@@ -7,32 +7,26 @@ import os
 import shlex
 import threading
 import logging
-from time import sleep
 from typing import Optional, List
 from subprocess import Popen, PIPE
 # from platform import system
 # from lzma import decompress
 # from base64 import b64decode, b64encode
 
-from .pseudo_ffprobe import FFprobe
-from .misc import Paths, fix_splashes, SHELL, OS_NAME
+from .command import Command, Template, literal, literals, output_indexes
+from .pseudo_ffprobe import FFprobe, BANNER_END_MARKERS
+from .probe_cache import probe_cache
+from .pipes import CHUNK_SIZE, start_feeder, start_drain
+from .progress import (
+    PROGRESS_OPTIONS, ProgressInfo, read_progress)
+from .misc import (
+    ConvertResult, FFmpegBinary, fix_splashes, resolve_ffmpeg,
+    set_resolve_order, setup_logging, SHELL, OS_NAME)
 
 
+# handlers are added by setup_logging on first use,
+# so importing does not touch the disk
 logger = logging.getLogger('pyffmpeg')
-logger.setLevel(logging.DEBUG)
-
-log_file = os.path.join(Paths().home_path, 'pyffmpeg.log')
-fh = logging.FileHandler(log_file)
-ch = logging.StreamHandler()
-fh.setLevel(logging.DEBUG)
-ch.setLevel(logging.DEBUG)
-
-formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-fh.setFormatter(formatter)
-ch.setFormatter(formatter)
-
-logger.addHandler(fh)
-logger.addHandler(ch)
 
 
 class FFmpeg():
@@ -41,17 +35,20 @@ class FFmpeg():
     Provide methods for working with FFmpeg
     """
 
-    def __init__(self, directory=".", enable_log: bool=True):
+    def __init__(
+            self, directory=".", enable_log: bool=True,
+            ffmpeg_path: Optional[str] = None):
         """
         Init function
+
+        ffmpeg_path: ffmpeg executable to use, see misc.resolve_ffmpeg
         """
 
         # Logger flag
         self.enable_log = enable_log
 
-        if not self.enable_log:
-            global log_file
-            log_file = os.path.join(Paths(False).home_path, 'pyffmpeg.log')
+        if self.enable_log:
+            setup_logging()
 
         self.logger = logging.getLogger('pyffmpeg.FFmpeg')
         if self.enable_log:
@@ -72,34 +69,147 @@ class FFmpeg():
         else:
             self._over_write = '-n'
 
+        # threads used to encode each output, 0 lets ffmpeg decide
+        self.threads = 0
+
         # Progress
         self.report_progress = False
         self._in_duration: float = 0.0
         self._progress: int = 0
         self.onProgressChanged = self.progressChangeMock
+        self.progress_info: Optional[ProgressInfo] = None
+        self.onProgressInfo = self.progressInfoMock
+        self._monitor_thread: Optional[threading.Thread] = None
 
         # Chain Parameters
         self.inputs = ()
         self.outputs = ()
-        self.chain_string = ''
+        self.command = Command()
+        # options waiting for the next input or output
+        self._pending = []
 
         # instances are store according to function names
         self._ffmpeg_instances = {}
-        if self.enable_log:
-            self._ffmpeg_file = Paths(enable_log=True).load_ffmpeg_bin()
-        else:
-            self._ffmpeg_file = Paths(enable_log=False).load_ffmpeg_bin()
+        # probes of the conversions use the same ffmpeg
+        self.ffmpeg_path = ffmpeg_path
+        self._binary = resolve_ffmpeg(ffmpeg_path, self.enable_log)
+        self._ffmpeg_file = self._binary.path
         if self.enable_log:
             self.logger.info(f"FFmpeg file: {self._ffmpeg_file}")
         self.error = ''
 
-    def convert(self, input_file, output_file):
+    def convert(
+            self, input_file, output_file, start=None, end=None,
+            output_options: Optional[List[str]] = None):
 
         """
         Converts and input file to the output file
+        start, end: convert only this part of the input, seeking it
+            like clip() does. int, float or time: '10:02:01'
+        output_options: extra options for the output, eg. ['-an']
         """
         if self.enable_log:
             self.logger.info('Inside convert function')
+
+        options, out, inf = self._convert_args(
+            input_file, output_file, start, end, output_options)
+
+        stderr = ''
+        probe = None
+        try:
+            outP = Popen(
+                options, shell=False, stdin=PIPE,
+                stdout=PIPE, stderr=PIPE
+                )
+            self._ffmpeg_instances['convert'] = outP
+            if self.report_progress:
+                self.monitor(outP)
+            stderr, probe = self._read_log(outP, inf)
+        except Exception as e:
+            self.logger.error(e)
+            stderr = str(e)
+            self.quit()
+
+        self._check_convert_log(stderr)
+
+        out = ConvertResult(out)
+        out.probe = probe
+        return out
+
+    def convert_stream(
+            self, source, output_format: str,
+            input_format: Optional[str] = None,
+            output_options: Optional[List[str]] = None,
+            chunk_size: int = CHUNK_SIZE):
+        """
+        Converts in memory, without touching the disk.
+        source: bytes, a file-like object or an iterable of bytes
+        output_format: container to write, eg. 'mp3' or 'wav'
+        input_format: only needed when ffmpeg can not guess it
+        output_options: extra options for the output, eg.
+            ['-movflags', 'frag_keyframe+empty_moov'] for mp4, which
+            can not be written to a pipe otherwise
+        Yields the output in chunks of at most chunk_size bytes.
+        """
+        if self.enable_log:
+            self.logger.info('Inside convert_stream')
+
+        if self.loglevel not in self.loglevels:
+            msg = 'Warning: "{}" not an ffmpeg loglevel flag.' +\
+             ' Using fatal instead'
+            print(msg.format(self.loglevel))
+            self.loglevel = 'fatal'
+
+        options = [self._ffmpeg_file, '-loglevel', self.loglevel]
+        if input_format:
+            options.extend(['-f', input_format])
+        options.extend(['-i', 'pipe:0'])
+        options.extend(output_options or [])
+        options.extend(['-f', output_format, 'pipe:1'])
+        options = self._add_threads(options)
+        self.logger.info(f"Options is: {options}")
+
+        outP = Popen(options, shell=False, stdin=PIPE, stdout=PIPE, stderr=PIPE)
+        self._ffmpeg_instances['convert_stream'] = outP
+
+        # stdin and stderr get their own threads, so none of
+        # the three pipes can fill up and stall the others
+        feeder, feed_errors = start_feeder(outP.stdin, source, chunk_size)
+        drain, log_tail = start_drain(outP.stderr)
+
+        finished = False
+        try:
+            while True:
+                chunk = outP.stdout.read1(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+            finished = True
+        finally:
+            # the caller stopped iterating early
+            if not finished:
+                outP.kill()
+            outP.wait()
+            feeder.join()
+            drain.join()
+            outP.stdout.close()
+
+        if feed_errors:
+            raise feed_errors[0]
+
+        if outP.returncode != 0:
+            self.error = "".join(log_tail).strip()
+            self.logger.error(self.error)
+            raise Exception(self.error)
+        self.error = ''
+
+    def _convert_args(
+            self, input_file, output_file, start=None, end=None,
+            output_options: Optional[List[str]] = None):
+        """
+        Returns the command line of convert, the output file
+        and the input file
+        """
         if os.path.isabs(output_file):
             # absolute file
             out = output_file
@@ -124,34 +234,38 @@ class FFmpeg():
             print(msg.format(self.loglevel))
             self.loglevel = 'fatal'
 
-        options = [self._ffmpeg_file, "-loglevel", self.loglevel, self._over_write, "-i", inf, out]
+        options = [self._ffmpeg_file, "-loglevel", self._banner_loglevel(), self._over_write]
+        if start is not None:
+            options.extend(['-ss', str(start)])
+        if end is not None:
+            options.extend(['-to', str(end)])
+        options.extend(["-i", inf])
+        options.extend(output_options or [])
+        options.append(out)
+        options = self._add_threads(options)
 
         if self.enable_log:
             self.logger.info(f"shell: {SHELL}")
 
+        # the duration comes from the conversion's own log
+        self._in_duration = 0.0
         if self.report_progress:
-            f = FFprobe(inf)
-            d = f.duration.replace(':', '')
-            self._in_duration = float(d)
-            self.monitor(out)
+            options[1:1] = PROGRESS_OPTIONS
 
-        try:
-            outP = Popen(
-                options, shell=False, stdin=PIPE,
-                stdout=PIPE, stderr=PIPE
-                )
-            self.logger.error('did we')
-            self._ffmpeg_instances['convert'] = outP
-            self.logger.error('didn we')
-            stderr = str(outP.stderr.read(), 'utf-8')
-            self.logger.error('error should')
+        return options, out, inf
 
-            print(stderr)
-        except Exception as e:
-            self.logger.error(e)
-            stderr = e
-            self.quit()
+    def _add_threads(self, options: list) -> list:
+        # -threads is an output option, so it goes just before
+        # each output file, options[0] being ffmpeg
+        if not self.threads:
+            return options
+
+        options = list(options)
+        for at in reversed(output_indexes(options[1:])):
+            options[at + 1:at + 1] = ['-threads', str(self.threads)]
+        return options
 
+    def _check_convert_log(self, stderr):
         if 'Output #0' not in stderr:
             lines = stderr.splitlines()
             if len(lines) > 0:
@@ -167,87 +281,109 @@ class FFmpeg():
             self.error = ''
             if self.enable_log:
                 self.logger.info('Conversion Done')
-        return out
 
-    def clip(self, start, end):
+    def clip(self, start, end, input: Optional[int] = None):
         """
         start and end can either int, float of time: '10:02:01'
+        input: index of the input to clip, all of them by default
         """
         self.logger.info("Inside Clip")
-        if '-i' not in self.chain_string:
+        if not self.command.inputs:
             self.logger.error("input must be set before calling clip")
             self.error = "input must be set before calling clip"
+            return self
+
+        if input is None:
+            indexes = range(len(self.command.inputs))
         else:
-            timeframe = f"-ss {start} -to {end} -i"
-            self.chain_string = self.chain_string.replace('-i', timeframe)
+            indexes = [input]
+        for index in indexes:
+            self.command = self.command.input_options(
+                index, *literals(['-ss', start, '-to', end]))
         return self
 
     def duration(self, duration):
         self.logger.info("Inside duration")
-        if self.chain_string:
-            spacing = " "
-        else:
-            spacing = ""
-
-        dura = f"{spacing}-t {duration}"
-        self.chain_string = self.chain_string + dura
-
+        self._pending.extend(['-t', str(duration)])
         return self
 
-    def run(self):
+    def run(self, command=None, **values):
         """
-        Allows user to pass any other command line options
-        to the FFmpeg executable
-        eg.: command line options of 'ffmpeg -i a.mp4 b.mp3'
-        will be passed by user as: opts: '-i a.mp4 b.mp3'
+        Runs the command chained with input, output and the like.
+        command: a Command or Template to run instead, with values
+            for its placeholders
         """
         if self.enable_log:
             self.logger.info("inside Chain run")
 
-        c_string = self.chain_string
+        options = self._run_args(command, **values)
 
-        ## Add ffmpeg and overwrite variable
+        try:
+            out = Popen(options, shell=False, stdin=PIPE, stdout=PIPE, stderr=PIPE)
+            self._ffmpeg_instances['options'] = out
+            if self.report_progress:
+                self.monitor(out)
+            stderr, _ = self._read_log(out)
+        except:
+            self.quit()
 
-        # handle overwrite
-        if self._over_write not in c_string:
-            options = " ".join([self._over_write, c_string])
+        self._check_options_log(stderr, 'Operation Done')
 
-        # handle loglevel
-        if self._log_level_stmt not in options:
-            if self.loglevel not in self.loglevels:
-                msg = 'Warning: "{}" not an ffmpeg loglevel flag.' +\
-                    ' Using fatal instead'
-                print(msg.format(self.loglevel))
-                self.loglevel = 'fatal'
+        # wipe all chain data
+        if command is None:
+            self.chain_string = ''
 
-            if self.loglevel != 'fatal':
-                options = " ".join(
-                    [options])
+        return True
 
-        # add ffmpeg
-        # Put into brackets if contain spaces
-        if OS_NAME == "windows":
-            _ffmpeg_file = '"' + self._ffmpeg_file + '"'
-        else:
-            _ffmpeg_file = self._ffmpeg_file
-        
-        self.logger.info(f'Using {_ffmpeg_file} as ffmpeg file')
-        options = " ".join([_ffmpeg_file, options])
-        self.logger.info(f"Options is: {options} as at now")
+    def _run_args(self, command=None, **values):
+        """
+        Returns the command line of run
+        """
+        if command is None:
+            command = self.command
+            if self._pending:
+                self.logger.error(
+                    f'Options after the last output ignored: {self._pending}')
 
-        if self.enable_log:
-            self.logger.info(f"Shell: {SHELL}")
+        if self.loglevel not in self.loglevels:
+            msg = 'Warning: "{}" not an ffmpeg loglevel flag.' +\
+                ' Using fatal instead'
+            print(msg.format(self.loglevel))
+            self.loglevel = 'fatal'
 
-        if not SHELL:
-            options = shlex.split(options, posix=False)
+        self.logger.info(f'Using {self._ffmpeg_file} as ffmpeg file')
+        # the duration comes from the process' own log
+        self._in_duration = 0.0
+        options = [self._ffmpeg_file]
+        if self.report_progress:
+            options.extend(PROGRESS_OPTIONS)
+        options.append(self._over_write)
+        options.extend(command.argv(**values))
+        self.logger.info(f"Options is: {options} as at now")
 
-        try:
-            out = Popen(options, shell=SHELL, stdin=PIPE, stdout=PIPE, stderr=PIPE)
-            self._ffmpeg_instances['options'] = out
-            stderr = str(out.stderr.read(), 'utf-8')
-        except:
-            self.quit()
+        return self._add_threads(options)
 
+    @property
+    def chain_string(self) -> str:
+        """
+        The chained command, as it would be typed in a shell
+        """
+        args = self.command.argv() + self._pending
+        return ' '.join(shlex.quote(x) for x in args)
+
+    @chain_string.setter
+    def chain_string(self, value: str):
+        # only wiping is supported, build commands with the methods
+        if value:
+            raise ValueError('chain_string can only be reset to ""')
+        self.command = Command()
+        self._pending = []
+
+    def _take_pending(self) -> list:
+        pending, self._pending = self._pending, []
+        return pending
+
+    def _check_options_log(self, stderr, done_msg='Conversion Done'):
         if stderr and 'Output #0' not in stderr:
             lines = stderr.splitlines()
             if len(lines) > 0:
@@ -258,12 +394,7 @@ class FFmpeg():
             raise Exception(self.error)
         else:
             self.error = ''
-            self.logger.info('Operation Done')
-
-        # wipe all chain string data
-        self.chain_string = ''
-
-        return True
+            self.logger.info(done_msg)
 
     def input(
             self, *inputs,
@@ -278,27 +409,28 @@ class FFmpeg():
 
         fixed_inputs = []
 
-        # frame rate
+        # frame rate, of the first input
+        options = self._take_pending()
         if rate:
-            self.chain_string += f"-r {rate} " # extra space added
+            options.extend(['-r', str(rate)])
 
         for input_file in inputs:
             input_f = input_file.replace("\\", "/")
 
             fixed_inputs.append(input_f)
+            # the chain has no placeholders, braces are literal
+            self.command = self.command.input(
+                literal(input_f), *literals(options))
+            options = []
 
             if self.enable_log:
                 self.logger.info(f"Input file: {input_f}")
 
         self.inputs = tuple(fixed_inputs)
-        fixed_inputs.insert(0, '')
-        self.chain_string += ' -i '.join(fixed_inputs)#.strip()
 
-        # mapping
-        if map:
-            fixed_map = list(map)
-            fixed_map.insert(0, '')
-            self.chain_string += ' -map '.join(fixed_map)
+        # mapping, an option of the next output
+        for value in map or []:
+            self._pending.extend(['-map', value])
 
         return self
 
@@ -325,36 +457,48 @@ class FFmpeg():
                 self.logger.info(f"Output file: {out}")
 
         self.outputs = tuple(fixed_outputs)
-        output_string = ' '.join(fixed_outputs).strip()
-        self.chain_string += " " + output_string # extra space
+        # options chained since the last input or output are the
+        # first output's
+        options = self._take_pending()
+        for out in fixed_outputs:
+            self.command = self.command.output(
+                literal(out), *literals(options))
+            options = []
         return self
 
     def bitrate(self, value: int, specifier: str = ""):
         specifier = specifier.lower()
         if specifier in ['a', 'v']:
-            self.chain_string += f" -b:{specifier} {value}"
+            self._pending.extend([f"-b:{specifier}", str(value)])
         else:
-            self.chain_string += f" -b {value}"
+            self._pending.extend(["-b", str(value)])
         return self
 
     def aspect_ratio(self, value: str, map: str):
         if map:
             map = f":{map}"
-        self.chain_string += f" -aspect{map} {value}"
+        self._pending.extend([f"-aspect{map}", str(value)])
         return self
 
     def filter(self, value: str, specifier: str = ""):
         specifier = specifier.lower()
         if specifier in ['a', 'v']:
-            self.chain_string += f" -filter:{specifier} {value}"
+            self._pending.extend([f"-filter:{specifier}", value])
         else:
-            self.chain_string += f" -filter {value}"
+            self._pending.extend(["-filter", value])
+        return self
+
+    def filter_complex(self, graph: str):
+        """
+        Adds a filtergraph, all of them go in one -filter_complex
+        """
+        self.command = self.command.filter(literal(graph))
         return self
 
     def force(self):
         # Force container format
 
-        self.chain_string += " -f"
+        self._pending.append("-f")
         return self
 
     def channels(self, value: int, specifier: str, map: str):
@@ -364,21 +508,21 @@ class FFmpeg():
 
         specifier = specifier.lower()
         if specifier in ['a', 'v']:
-            self.chain_string += f" -{specifier}c{map} {value}"
+            self._pending.extend([f"-{specifier}c{map}", str(value)])
         else:
-            self.chain_string += f" -c{map} {value}"
+            self._pending.extend([f"-c{map}", str(value)])
         return self
 
     def rate(self, value: int = 24, specifier: str= "", map: str = ""):
-        # frame rate
+        # frame rate, of the next input or output
         specifier = specifier.lower()
         if map:
             map = f":{map}"
 
         if specifier in ['a', 'v']:
-            self.chain_string += f"-{specifier}r{map} {value} "
+            self._pending.extend([f"-{specifier}r{map}", str(value)])
         else:
-            self.chain_string += f"-r{map} {value} " # extra space for next
+            self._pending.extend([f"-r{map}", str(value)])
         return self
 
     def codec(self, value: str = 'copy', specifier: str = ""):
@@ -389,16 +533,16 @@ class FFmpeg():
         """
         specifier = specifier.lower()
         if specifier in ['v', 'a', 's']:
-            self.chain_string += f" -c:{specifier} {value}"
+            self._pending.extend([f"-c:{specifier}", value])
         else:
-            self.chain_string += f" -c {value}"
+            self._pending.extend(["-c", value])
         return self
 
     def disable(self, value: str):
 
         value = value.lower()
         if value in ['v', 'a', 's']:
-            self.chain_string += f' -{value}n'
+            self._pending.append(f'-{value}n')
         return self
 
     def map(self, value: str):
@@ -406,7 +550,7 @@ class FFmpeg():
         Map
         value: must be of format '0:0' or '0:v'
         """
-        self.chain_string += f' -map {value}'
+        self._pending.extend(['-map', value])
         return self
 
     def get_ffmpeg_bin(self):
@@ -426,29 +570,77 @@ class FFmpeg():
         """
         if self.enable_log:
             self.logger.info("Inside get_fps")
-        fprobe = FFprobe(input_file)
+        fprobe = FFprobe(input_file, ffmpeg_path=self.ffmpeg_path)
         fps = fprobe.fps
         return fps
 
-    def monitor(self, fn: str):
-        m_thread = threading.Thread(target=self._monitor, args=[fn])
+    def _banner_loglevel(self):
+        # ffmpeg only prints the input banner from the info level up,
+        # and progress needs the duration in it
+        if self.report_progress and self.loglevel in self.loglevels:
+            if self.loglevels.index(self.loglevel) < self.loglevels.index('info'):
+                return 'info'
+        return self.loglevel
+
+    def _read_log(self, process: Popen, input_file=None):
+        """
+        Read the stderr of a running process line by line, parsing the
+        input banner as soon as it is complete, so progress gets the
+        input duration without probing the input separately.
+        Returns the whole log and the FFprobe of the first input
+        (None if the log has no banner), once the progress of the
+        process has been read to its end too
+        """
+        lines = []
+        probe = None
+        in_banner = True
+
+        for raw in process.stderr:
+            line = str(raw, 'utf-8', 'replace')
+            lines.append(line)
+            if in_banner and line.startswith(BANNER_END_MARKERS):
+                in_banner = False
+                probe = self._parse_banner(''.join(lines), input_file)
+
+        monitor, self._monitor_thread = self._monitor_thread, None
+        if monitor is not None:
+            monitor.join()
+        return ''.join(lines), probe
+
+    def _parse_banner(self, banner: str, input_file=None):
+        if 'Input #0' not in banner:
+            return None
+
+        try:
+            probe = FFprobe.from_banner(
+                input_file, banner, ffmpeg_path=self.ffmpeg_path)
+        except Exception as e:
+            self.logger.error(f'Could not parse the input banner: {e}')
+            return None
+
+        self._in_duration = probe.info.duration or 0.0
+        return probe
+
+    def monitor(self, process: Popen):
+        """
+        Follow the -progress reports of a running process
+        """
+        m_thread = threading.Thread(target=self._monitor, args=[process])
         m_thread.daemon = True
         m_thread.start()
+        # joined by _read_log, so the last report is in before returning
+        self._monitor_thread = m_thread
 
-    def _monitor(self, fn: str):
+    def _monitor(self, process: Popen):
         if self.enable_log:
             self.logger.info('Monitoring spirit started')
-        sleep(1)
-        dura = 0.0
-        while dura < self._in_duration:
-            try:
-                f = FFprobe(fn)
-                d = f.duration.replace(':', '')
-                dura = float(d)
-            except:
-                dura = 0.0
-            self.progress = dura / self._in_duration * 100
-            sleep(0.1)
+
+        for block in read_progress(process.stdout):
+            info = ProgressInfo(block, self._in_duration)
+            self.progress_info = info
+            self.onProgressInfo(info)
+            if self._in_duration or info.done:
+                self.progress = info.percent
 
     def options(self, opts):
 
@@ -461,21 +653,46 @@ class FFmpeg():
         if self.enable_log:
             self.logger.info("inside options")
 
+        options = self._options_args(opts)
+
+        try:
+            # a list is an argv, only a string needs the shell
+            shell = SHELL and isinstance(options, str)
+            out = Popen(options, shell=shell, stdin=PIPE, stdout=PIPE, stderr=PIPE)
+            self._ffmpeg_instances['options'] = out
+            if self.report_progress:
+                self.monitor(out)
+            stderr, _ = self._read_log(out)
+        except:
+            self.quit()
+
+        self._check_options_log(stderr)
+        return True
+
+    def _options_args(self, opts):
+        """
+        Returns the command line of options
+        """
         if isinstance(opts, list):
             if self.enable_log:
                 self.logger.info('Options is a List')
-            options = fix_splashes(opts)
-
-            # Add overwrite variable
-            options.insert(0, self._over_write)
             if self.loglevel not in self.loglevels:
                 msg = 'Warning: "{}" not an ffmpeg loglevel flag.' +\
                  ' Using fatal instead'
                 print(msg.format(self.loglevel))
                 self.loglevel = 'fatal'
 
-            options = ' '.join(options)
-            options = ' '.join(['-loglevel', self.loglevel, options])
+            # kept a list, so arguments with spaces stay whole
+            options = [self._ffmpeg_file]
+            if self.report_progress:
+                options.extend(PROGRESS_OPTIONS)
+            options.extend(
+                ['-loglevel', self._banner_loglevel(), self._over_write])
+            options.extend(fix_splashes(list(opts)))
+            self.logger.info(f"Options is: {options} as at now")
+            # the duration comes from the process' own log
+            self._in_duration = 0.0
+            return self._add_threads(options)
 
         else:
             if self.enable_log:
@@ -508,34 +725,29 @@ class FFmpeg():
             _ffmpeg_file = self._ffmpeg_file
         
         self.logger.info(f'Using {_ffmpeg_file} as ffmpeg file')
+        # the duration comes from the process' own log
+        self._in_duration = 0.0
+        if self.report_progress:
+            options = " ".join(PROGRESS_OPTIONS + [options])
         options = " ".join([_ffmpeg_file, options])
         self.logger.info(f"Options is: {options} as at now")
 
         if self.enable_log:
             self.logger.info(f"Shell: {SHELL}")
 
-        if not SHELL:
-            options = shlex.split(options, posix=False)
+        # quotes are kept, so joining gives the same command back
+        options = self._add_threads(shlex.split(options, posix=False))
+        if SHELL:
+            options = ' '.join(options)
 
-        try:
-            out = Popen(options, shell=SHELL, stdin=PIPE, stdout=PIPE, stderr=PIPE)
-            self._ffmpeg_instances['options'] = out
-            stderr = str(out.stderr.read(), 'utf-8')
-        except:
-            self.quit()
+        return options
 
-        if stderr and 'Output #0' not in stderr:
-            lines = stderr.splitlines()
-            if len(lines) > 0:
-                self.error = lines[-1]
-            else:
-                self.error = ""
-            self.logger.error(self.error)
-            raise Exception(self.error)
-        else:
-            self.error = ''
-            self.logger.info('Conversion Done')
-        return True
+    @property
+    def ffmpeg_version(self) -> str:
+        """
+        Version of the ffmpeg in use, eg. '7.0.2-static'
+        """
+        return self._binary.version
 
     @property
     def progress(self):
@@ -549,6 +761,9 @@ class FFmpeg():
     def progressChangeMock(self, progress):
         pass
 
+    def progressInfoMock(self, info: ProgressInfo):
+        pass
+
     def quit(self, function: Optional[str] = ''):
 
         """
@@ -0,0 +1,414 @@
+"""
+asyncio front end for FFmpeg and FFprobe, so many jobs can be
+supervised from one event loop without a thread per job
+"""
+
+import os
+import asyncio
+import logging
+from asyncio.subprocess import PIPE, STDOUT
+from functools import partial
+from itertools import islice
+from typing import List, Optional
+
+from . import FFmpeg
+from .misc import ConvertResult
+from .progress import ProgressInfo, ProgressParser
+from .pseudo_ffprobe import (
+    FFprobe, BANNER_END_MARKERS, PROBE_TIMEOUT)
+
+
+logger = logging.getLogger('pyffmpeg.async_ffmpeg')
+
+# seconds a cancelled process gets to quit on 'q' before it is killed
+QUIT_TIMEOUT = 5.0
+
+_CHUNK_SIZE = 65536
+
+
+async def _spawn(options, stderr=PIPE):
+    if isinstance(options, str):
+        # options come as a string when SHELL is in use
+        return await asyncio.create_subprocess_shell(
+            options, stdin=PIPE, stdout=PIPE, stderr=stderr)
+    return await asyncio.create_subprocess_exec(
+        *options, stdin=PIPE, stdout=PIPE, stderr=stderr)
+
+
+async def _lines(stream):
+    # ffmpeg ends its stats lines with '\r' only, so StreamReader's
+    # readline could run past its limit on a long job
+    pending = b''
+    while True:
+        chunk = await stream.read(_CHUNK_SIZE)
+        if not chunk:
+            break
+        pending += chunk.replace(b'\r\n', b'\n').replace(b'\r', b'\n')
+        *lines, pending = pending.split(b'\n')
+        for line in lines:
+            yield line.decode('utf-8', 'replace') + '\n'
+    if pending:
+        yield pending.decode('utf-8', 'replace')
+
+
+async def stop_process(process, timeout: float = QUIT_TIMEOUT):
+    """
+    Ask ffmpeg to quit with 'q', kill it if it does not within
+    timeout, and reap it
+    """
+    if process.returncode is None:
+        try:
+            process.stdin.write(b'q')
+            await process.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+        try:
+            await asyncio.wait_for(process.wait(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning('ffmpeg did not quit, killing it')
+            process.kill()
+            await process.wait()
+
+
+async def run_bounded_async(func, items, max_workers: int = 0):
+    """
+    asyncio version of pseudo_ffprobe.run_bounded, awaiting func on
+    at most max_workers items at once.
+    Yields (item, result) in completion order, where result is the
+    exception raised by func if it failed.
+    """
+    if max_workers < 1:
+        max_workers = os.cpu_count() or 1
+
+    items = iter(items)
+    pending = {}
+    try:
+        while True:
+            for item in items:
+                pending[asyncio.ensure_future(func(item))] = item
+                if len(pending) >= max_workers:
+                    break
+
+            if not pending:
+                break
+
+            done, _ = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                item = pending.pop(task)
+                error = task.exception()
+                if error is None:
+                    yield item, task.result()
+                else:
+                    logger.error(f'Failed on {item}: {error}')
+                    yield item, error
+    finally:
+        # the caller stopped iterating early
+        for task in pending:
+            task.cancel()
+
+
+async def read_banner_async(commands, timeout: float = PROBE_TIMEOUT):
+    """
+    asyncio version of pseudo_ffprobe.read_banner
+    """
+    logger.info('Inside read_banner_async')
+    process = await _spawn(commands, stderr=STDOUT)
+    lines = []
+
+    async def _reader():
+        async for line in _lines(process.stdout):
+            lines.append(line)
+            if line.startswith(BANNER_END_MARKERS):
+                break
+
+    try:
+        await asyncio.wait_for(_reader(), timeout)
+    except asyncio.TimeoutError:
+        logger.warning(f'Probe timed out after {timeout}s')
+    finally:
+        # headers are all we want
+        if process.returncode is None:
+            process.kill()
+        await process.wait()
+
+    return ''.join(lines)
+
+
+class AsyncJob():
+    """
+    A running ffmpeg process started by AsyncFFmpeg.
+    Await it for its result, or iterate progress() for its reports.
+    Cancelling the task awaiting it sends 'q' to ffmpeg and reaps it.
+    """
+
+    def __init__(self, ffmpeg, process, check, result=True, input_file=None):
+
+        self.ffmpeg = ffmpeg
+        self.process = process
+        self.result = result
+        self.input_file = input_file
+        self.probe = None
+        self.duration = 0.0
+        self.progress_info = None
+        self.stderr = ''
+        self._check = check
+        self._reports = asyncio.Queue()
+
+        if ffmpeg.report_progress:
+            self._progress_task = asyncio.ensure_future(self._read_progress())
+        else:
+            self._progress_task = None
+            self._reports.put_nowait(None)
+
+    def __await__(self):
+        return self.wait().__await__()
+
+    async def progress(self):
+        """
+        Yields a ProgressInfo for every report until the job ends
+        """
+        while True:
+            info = await self._reports.get()
+            if info is None:
+                # let other iterators end too
+                self._reports.put_nowait(None)
+                return
+            yield info
+
+    async def _read_progress(self):
+        parser = ProgressParser()
+        try:
+            async for line in _lines(self.process.stdout):
+                block = parser.feed(line)
+                if block is None:
+                    continue
+
+                info = ProgressInfo(block, self.duration)
+                self.progress_info = info
+                self.ffmpeg.progress_info = info
+                self.ffmpeg.onProgressInfo(info)
+                if self.duration or info.done:
+                    self.ffmpeg.progress = info.percent
+                self._reports.put_nowait(info)
+        finally:
+            self._reports.put_nowait(None)
+
+    def _parse_banner(self, banner):
+        if 'Input #0' not in banner:
+            return
+
+        try:
+            self.probe = FFprobe.from_banner(
+                self.input_file, banner, ffmpeg_path=self.ffmpeg.ffmpeg_path)
+        except Exception as e:
+            logger.error(f'Could not parse the input banner: {e}')
+            return
+
+        self.duration = self.probe.info.duration or 0.0
+
+    async def wait(self):
+        """
+        Wait for ffmpeg to finish and return the job's result
+        """
+        lines = []
+        in_banner = True
+
+        try:
+            async for line in _lines(self.process.stderr):
+                lines.append(line)
+                if in_banner and line.startswith(BANNER_END_MARKERS):
+                    in_banner = False
+                    self._parse_banner(''.join(lines))
+
+            await self.process.wait()
+            if self._progress_task:
+                await self._progress_task
+
+        except asyncio.CancelledError:
+            logger.info('Job cancelled')
+            await stop_process(self.process)
+            if self._progress_task:
+                self._progress_task.cancel()
+            raise
+
+        self.stderr = ''.join(lines)
+        self._check(self.stderr)
+
+        if isinstance(self.result, ConvertResult):
+            self.result.probe = self.probe
+        return self.result
+
+
+class AsyncFFmpeg(FFmpeg):
+    """
+    FFmpeg for asyncio. It builds the same commands as FFmpeg, but
+    convert, options and run are coroutines, and the start_ methods
+    return the running AsyncJob for progress reports.
+    """
+
+    async def start_convert(
+            self, input_file, output_file, start=None, end=None,
+            output_options: Optional[List[str]] = None) -> AsyncJob:
+        if self.enable_log:
+            self.logger.info('Inside start_convert')
+
+        options, out, inf = self._convert_args(
+            input_file, output_file, start, end, output_options)
+        process = await _spawn(options)
+        self._ffmpeg_instances['convert'] = process
+
+        return AsyncJob(
+            self, process, self._check_convert_log,
+            ConvertResult(out), inf)
+
+    async def convert(
+            self, input_file, output_file, start=None, end=None,
+            output_options: Optional[List[str]] = None):
+        """
+        Converts and input file to the output file, see FFmpeg.convert
+        """
+        job = await self.start_convert(
+            input_file, output_file, start, end, output_options)
+        return await job
+
+    async def start_options(self, opts) -> AsyncJob:
+        if self.enable_log:
+            self.logger.info('Inside start_options')
+
+        process = await _spawn(self._options_args(opts))
+        self._ffmpeg_instances['options'] = process
+
+        return AsyncJob(self, process, self._check_options_log)
+
+    async def options(self, opts):
+        """
+        Allows user to pass any other command line options
+        to the FFmpeg executable, see FFmpeg.options
+        """
+        job = await self.start_options(opts)
+        return await job
+
+    async def start_run(self, command=None, **values) -> AsyncJob:
+        if self.enable_log:
+            self.logger.info('Inside start_run')
+
+        process = await _spawn(self._run_args(command, **values))
+        self._ffmpeg_instances['options'] = process
+
+        # wipe all chain data
+        if command is None:
+            self.chain_string = ''
+
+        return AsyncJob(self, process, self._check_options_log)
+
+    async def run(self, command=None, **values):
+        """
+        Runs the chained options, see FFmpeg.run
+        """
+        job = await self.start_run(command, **values)
+        return await job
+
+    async def quit(self, function: str = ''):
+        """
+        Stops any running process started by this instance
+        """
+        if self.enable_log:
+            self.logger.info('Inside Quit')
+
+        if function:
+            await stop_process(self._ffmpeg_instances[function])
+        else:
+            for inst in self._ffmpeg_instances.values():
+                await stop_process(inst)
+
+
+class AsyncFFprobe(FFprobe):
+    """
+    FFprobe for asyncio, probe a file with:
+    fp = await AsyncFFprobe(file_name)
+    probe_many and get_album_arts are async generators:
+    async for file_name, fp in AsyncFFprobe.probe_many(files): ...
+    """
+
+    def __init__(
+            self, file_name=None, probe_timeout: float = PROBE_TIMEOUT,
+            use_cache: bool = True, ffmpeg_path: Optional[str] = None):
+
+        # probing happens when the instance is awaited
+        self._setup(file_name, probe_timeout, use_cache, ffmpeg_path)
+
+    def __await__(self):
+        return self.probe().__await__()
+
+    async def probe(self):
+        self.logger.info('Inside async probe')
+        self.logger.info(f'Probing file: "{self.file_name}"')
+
+        if not self._from_cache():
+            commands = self._probe_commands()
+            stdout = await read_banner_async(commands, self.probe_timeout)
+            self._load_banner(stdout)
+
+        return self
+
+    @classmethod
+    async def probe_many(
+            cls, file_names, max_workers: int = 0,
+            timeout: float = PROBE_TIMEOUT, use_cache: bool = True,
+            chunk_size: int = 1, ffmpeg_path: Optional[str] = None):
+        """
+        asyncio version of FFprobe.probe_many, yielding (file_name,
+        result) in completion order. Groups of chunk_size files are
+        probed with probe_group on a thread.
+        """
+        logger.info('Inside async probe_many')
+
+        if chunk_size <= 1:
+            def _probe(file_name):
+                return cls(
+                    file_name, probe_timeout=timeout, use_cache=use_cache,
+                    ffmpeg_path=ffmpeg_path).probe()
+
+            async for item in run_bounded_async(
+                    _probe, file_names, max_workers):
+                yield item
+            return
+
+        loop = asyncio.get_running_loop()
+
+        def _probe_group(chunk):
+            return loop.run_in_executor(None, partial(
+                cls.probe_group, chunk, timeout, use_cache, ffmpeg_path))
+
+        names = iter(file_names)
+        chunks = iter(lambda: list(islice(names, chunk_size)), [])
+        async for chunk, results in run_bounded_async(
+                _probe_group, chunks, max_workers):
+            if isinstance(results, Exception):
+                for file_name in chunk:
+                    yield file_name, results
+            else:
+                for item in results:
+                    yield item
+
+    @classmethod
+    async def get_album_arts(
+            cls, file_names, max_workers: int = 0,
+            timeout: float = PROBE_TIMEOUT,
+            ffmpeg_path: Optional[str] = None):
+        """
+        asyncio version of FFprobe.get_album_arts, yielding
+        (file_name, result) in completion order
+        """
+        logger.info('Inside async get_album_arts')
+        loop = asyncio.get_running_loop()
+
+        async def _art(file_name):
+            probe = await cls(
+                file_name, probe_timeout=timeout, ffmpeg_path=ffmpeg_path)
+            return await loop.run_in_executor(None, probe.get_album_art)
+
+        async for item in run_bounded_async(_art, file_names, max_workers):
+            yield item
@@ -0,0 +1,134 @@
+"""
+To read decoded audio samples straight from ffmpeg into NumPy arrays,
+falling back to memoryviews when NumPy is not installed
+"""
+
+import logging
+from typing import Optional
+from subprocess import Popen, PIPE, DEVNULL
+
+from .misc import ffmpeg_bin
+from .pipes import read_raw, readinto_full, start_drain
+from .pseudo_ffprobe import FFprobe
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+logger = logging.getLogger('pyffmpeg.audio')
+
+# ffmpeg format: (numpy dtype, memoryview format, bytes per sample)
+SAMPLE_FMTS = {
+    'f32le': ('<f4', 'f', 4),
+    's16le': ('<i2', 'h', 2),
+}
+
+
+class AudioReader():
+    """
+    Decodes audio to raw samples at sample_rate and channels.
+
+    Iterating yields blocks of block_size samples per channel, shaped
+    (samples, channels). They share a ring of preallocated buffers, so
+    memory does not grow with the file, and a block is only valid
+    until ring_size more have been read. The last may be shorter.
+
+    read_all() returns the whole signal in one array.
+    """
+
+    def __init__(
+            self, file_name: str, sample_rate: int = 44100,
+            channels: int = 1, sample_fmt: str = 'f32le',
+            block_size: int = 65536, ring_size: int = 2,
+            ffmpeg_path: Optional[str] = None):
+
+        self.logger = logging.getLogger('pyffmpeg.audio.AudioReader')
+        if sample_fmt not in SAMPLE_FMTS:
+            raise ValueError(
+                f'sample_fmt must be one of {tuple(SAMPLE_FMTS)}')
+
+        self.file_name = file_name
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.sample_fmt = sample_fmt
+        self.block_size = block_size
+        self.ring_size = max(ring_size, 2)
+        self._dtype, self._view_fmt, self.sample_bytes = SAMPLE_FMTS[sample_fmt]
+        # bytes of one sample for every channel
+        self.frame_bytes = self.sample_bytes * channels
+        self.ffmpeg_path = ffmpeg_path
+        self._ffmpeg = ffmpeg_bin(ffmpeg_path=ffmpeg_path)
+        self.error = ''
+
+    def _commands(self):
+        return [
+            self._ffmpeg, '-loglevel', 'error', '-i', self.file_name,
+            '-vn', '-sn', '-f', self.sample_fmt,
+            '-ar', str(self.sample_rate), '-ac', str(self.channels),
+            'pipe:1']
+
+    def _as_array(self, buffer, samples: int):
+        shape = (samples, self.channels)
+        count = samples * self.channels
+        if np is not None:
+            return np.frombuffer(buffer, self._dtype, count).reshape(shape)
+        view = memoryview(buffer)[:count * self.sample_bytes]
+        return view.cast(self._view_fmt, shape)
+
+    def __iter__(self):
+        block_bytes = self.block_size * self.frame_bytes
+        blocks = read_raw(self._commands(), block_bytes, self.ring_size)
+
+        try:
+            for buffer, filled in blocks:
+                samples = filled // self.frame_bytes
+                if samples:
+                    yield self._as_array(buffer, samples)
+        except Exception as e:
+            self.error = str(e)
+            raise
+        finally:
+            # stops ffmpeg when the caller breaks out early
+            blocks.close()
+
+    def read_all(self):
+        """
+        Decode the whole file into one array of shape
+        (samples, channels), sized up front from the probed duration
+        """
+        duration = FFprobe(
+            self.file_name, ffmpeg_path=self.ffmpeg_path).info.duration or 0.0
+
+        # a little extra, durations in the header are rounded
+        expected = int((duration + 1) * self.sample_rate) + 1
+        buffer = bytearray(expected * self.frame_bytes)
+        view = memoryview(buffer)
+
+        commands = self._commands()
+        self.logger.info(f'Issuing commands {commands}')
+
+        process = Popen(commands, stdin=DEVNULL, stdout=PIPE, stderr=PIPE)
+        drain, log_tail = start_drain(process.stderr)
+
+        try:
+            filled = readinto_full(process.stdout, view)
+            # the header understated the duration, read the rest
+            rest = process.stdout.read()
+        finally:
+            process.wait()
+            drain.join()
+            process.stdout.close()
+
+        if process.returncode != 0:
+            self.error = ''.join(log_tail).strip()
+            self.logger.error(self.error)
+            raise Exception(self.error)
+
+        if rest:
+            view.release()
+            buffer[filled:] = rest
+            filled += len(rest)
+
+        return self._as_array(buffer, filled // self.frame_bytes)
@@ -0,0 +1,214 @@
+"""
+To parse the banner ffmpeg prints about its inputs, going over
+the text once with precompiled patterns
+"""
+
+import re
+import logging
+from collections import defaultdict
+from typing import List
+
+from .extract_functions import VIDEO_FUNC_LIST, AUDIO_FUNC_LIST
+
+
+logger = logging.getLogger('pyffmpeg.banner')
+
+# ffmpeg prints one of these as soon as every input header is out
+BANNER_END_MARKERS = ('Stream mapping', 'Output #0')
+
+INPUT_LINE = re.compile(r'Input #(\d+), (.*), from (.*):\s*$')
+# eg. '  Stream #0:0[0x1](und): Video: h264 ...', kind is Video
+STREAM_LINE = re.compile(r'\s+Stream #(\d+):(\d+)[^:]*: (\w+)')
+CHAPTERS_LINE = re.compile(r'\s+Chapters:\s*$')
+CHAPTER_LINE = re.compile(
+    r'\s+Chapter #\d+:(\d+): start (\S+), end (\S+?)\s*$')
+DURATION_LINE = re.compile(r'\s+Duration: ')
+
+# the last line of the version banner, what follows it is the error
+# when no input could be opened
+LIBPOSTPROC = re.compile(r'libpostproc .*?.*?.*?\n')
+
+
+class StreamRecord():
+    """
+    One 'Stream #0:1: ...' entry of an input
+    """
+
+    __slots__ = ('index', 'kind', 'header', 'tags')
+
+    def __init__(self, index: int, kind: str, header: str):
+
+        self.index = index
+        # eg. Video, Audio, Subtitle, Data
+        self.kind = kind
+        self.header = header
+        self.tags = defaultdict(list)
+        _add_tags(self.tags, _parse_header(header), '')
+
+    def __repr__(self):
+        return f'StreamRecord({self.index}, {self.kind!r})'
+
+
+class ChapterRecord():
+    """
+    One 'Chapter #0:0: start 0.000000, end 2.000000' entry
+    """
+
+    __slots__ = ('index', 'start', 'end', 'tags')
+
+    def __init__(self, index: int, start: str, end: str):
+
+        self.index = index
+        self.start = start
+        self.end = end
+        self.tags = defaultdict(list)
+
+    def __repr__(self):
+        return f'ChapterRecord({self.index}, {self.start}, {self.end})'
+
+
+class InputRecord():
+    """
+    Everything ffmpeg printed about one 'Input #N' of its command
+    """
+
+    __slots__ = ('index', 'format', 'source', 'tags', 'streams', 'chapters')
+
+    def __init__(self, index: int, format: str, source: str):
+
+        self.index = index
+        self.format = format
+        self.source = source
+        self.tags = defaultdict(list)
+        self.streams: List[StreamRecord] = []
+        self.chapters: List[ChapterRecord] = []
+
+    def __repr__(self):
+        return (
+            f'InputRecord({self.index}, {self.format!r}, '
+            f'{len(self.streams)} streams)')
+
+
+def _parse_header(header: str) -> List[str]:
+    if 'Video' in header:
+        funcs = VIDEO_FUNC_LIST
+    elif 'Audio' in header:
+        funcs = AUDIO_FUNC_LIST
+    else:
+        return []
+
+    parsed = []
+    for func in funcs:
+        parsed.extend(func(header))
+    return parsed
+
+
+def _add_tags(tags, lines, prev_key: str) -> str:
+    # lines are 'key: value', a continuation of a multi line value
+    # has no key. Returns the last key, for the next continuation
+    for line in lines:
+        key, _, value = line.partition(':')
+        key = key.strip()
+        value = value.strip()
+        if key:
+            tags[key] = value
+            prev_key = key
+        elif prev_key:
+            tags[prev_key] += '\n' + value
+        else:
+            tags['unpaired_values'].append(value)
+    return prev_key
+
+
+def _is_tag(line: str) -> bool:
+    # 'key: value', where 'Metadata:' and the like are only titles
+    parts = line.split(': ', 2)
+    return len(parts) > 1 and bool(parts[1])
+
+
+def generate_tags(lines) -> defaultdict:
+    """
+    Turns 'key: value' lines into a dict
+    """
+    tags = defaultdict(list)
+    _add_tags(tags, lines, '')
+    return tags
+
+
+def parse_banner(banner: str) -> List[InputRecord]:
+    """
+    Parse the inputs described by an ffmpeg log, up to the first of
+    BANNER_END_MARKERS. Returns an empty list when it has none.
+    """
+    inputs = []
+    current = None
+    # what the metadata lines being read belong to
+    target = None
+    prev_key = ''
+
+    for line in banner.splitlines():
+        if line.startswith(BANNER_END_MARKERS):
+            break
+
+        if line.startswith('Input #'):
+            found = INPUT_LINE.match(line)
+            if found:
+                current = InputRecord(
+                    int(found.group(1)), found.group(2),
+                    found.group(3).strip("'"))
+            else:
+                current = InputRecord(len(inputs), '', '')
+            inputs.append(current)
+            target = current.tags
+            prev_key = ''
+            continue
+
+        if current is None:
+            continue
+
+        stream = STREAM_LINE.match(line)
+        if stream:
+            record = StreamRecord(
+                int(stream.group(2)), stream.group(3), line.strip())
+            current.streams.append(record)
+            target = record.tags
+            prev_key = ''
+            continue
+
+        chapter = CHAPTER_LINE.match(line)
+        if chapter:
+            record = ChapterRecord(
+                int(chapter.group(1)), chapter.group(2), chapter.group(3))
+            current.chapters.append(record)
+            target = record.tags
+            prev_key = ''
+            continue
+
+        if DURATION_LINE.match(line):
+            # back to the input after its metadata and chapters,
+            # 'Duration: 00:00:04.37, start: 0.000000, bitrate: 322 kb/s'
+            target = current.tags
+            prev_key = _add_tags(
+                target, [x for x in line.split(', ') if _is_tag(x)], '')
+            continue
+
+        if CHAPTERS_LINE.match(line):
+            continue
+
+        if target is current.tags:
+            # the input's own lines carry several values, split by ', '
+            parts = [x for x in line.split(', ') if _is_tag(x)]
+        elif _is_tag(line):
+            parts = [line]
+        else:
+            continue
+        prev_key = _add_tags(target, parts, prev_key)
+
+    return inputs
+
+
+def banner_error(banner: str) -> str:
+    """
+    The error ffmpeg printed in place of the input headers
+    """
+    return LIBPOSTPROC.split(banner.split('Stream mapping')[0])[-1]
@@ -0,0 +1,293 @@
+"""
+Probe results of many files as columns, one typed buffer per field,
+to hand a whole library to NumPy, pandas or Arrow at once
+"""
+
+import csv
+import logging
+from array import array
+from typing import Iterable, List, Optional
+
+from .models import FormatInfo
+from .pseudo_ffprobe import FFprobe, PROBE_TIMEOUT
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+logger = logging.getLogger('pyffmpeg.columns')
+
+# column: (array typecode, numpy dtype), floats are nan when unknown
+NUMBER_COLUMNS = {
+    'duration': ('d', '<f8'),
+    'bitrate': ('q', '<i8'),
+    'width': ('i', '<i4'),
+    'height': ('i', '<i4'),
+    'fps': ('d', '<f8'),
+    'sample_rate': ('i', '<i4'),
+    'channels': ('i', '<i4'),
+    'ok': ('b', 'i1'),
+}
+# columns of repeated strings, kept as codes into a list of values
+DICTIONARY_COLUMNS = ('format_name', 'video_codec', 'audio_codec')
+
+NAN = float('nan')
+
+
+class DictionaryColumn():
+    """
+    Strings stored once in values, rows hold their index in codes,
+    -1 for none
+    """
+
+    __slots__ = ('codes', 'values', '_lookup')
+
+    def __init__(self):
+
+        self.codes = array('i')
+        self.values: List[str] = []
+        self._lookup = {}
+
+    def append(self, value: Optional[str]):
+        if not value:
+            self.codes.append(-1)
+            return
+        code = self._lookup.get(value)
+        if code is None:
+            # codes first, it raises when exported
+            code = len(self.values)
+            self.codes.append(code)
+            self._lookup[value] = code
+            self.values.append(value)
+            return
+        self.codes.append(code)
+
+    def __getitem__(self, row: int) -> Optional[str]:
+        code = self.codes[row]
+        return self.values[code] if code >= 0 else None
+
+    def __len__(self):
+        return len(self.codes)
+
+
+class ProbeColumns():
+    """
+    One row per file: path, format_name, duration (s), bitrate (b/s),
+    then width, height, fps and video_codec of its first video stream
+    and sample_rate, channels and audio_codec of its first audio
+    stream. Files that failed to probe have ok 0 and their error kept.
+
+        columns = probe_columns(files, max_workers=8)
+        table = columns.to_numpy()
+        table['duration'][table['width'] >= 1920].sum()
+    """
+
+    def __init__(self):
+
+        self.paths: List[str] = []
+        self.errors = {}
+        self.numbers = {
+            name: array(code) for name, (code, _) in NUMBER_COLUMNS.items()}
+        self.dictionaries = {
+            name: DictionaryColumn() for name in DICTIONARY_COLUMNS}
+
+    def __len__(self):
+        return len(self.paths)
+
+    def __getitem__(self, name: str):
+        """
+        The column name, an array.array, or a list of strings
+        for the dictionary encoded ones
+        """
+        if name == 'path':
+            return self.paths
+        if name in self.numbers:
+            return self.numbers[name]
+        column = self.dictionaries[name]
+        return [column[x] for x in range(len(column))]
+
+    @property
+    def names(self) -> List[str]:
+        return ['path', *DICTIONARY_COLUMNS, *NUMBER_COLUMNS]
+
+    def append(self, path: str, info: FormatInfo):
+        """
+        Adds the row of path. Raises BufferError, adding nothing, while
+        arrays of the columns are in use, see arrays()
+        """
+        video = next(
+            (x for x in info.video_streams if not x.attached_pic), None)
+        audio = next(iter(info.audio_streams), None)
+
+        numbers = {
+            'duration': NAN if info.duration is None else info.duration,
+            'bitrate': info.bitrate, 'ok': 1,
+            'width': 0, 'height': 0, 'fps': NAN,
+            'sample_rate': 0, 'channels': 0}
+        codecs = {
+            'format_name': info.format_name, 'video_codec': None,
+            'audio_codec': None}
+        if video is not None:
+            numbers['width'] = video.width
+            numbers['height'] = video.height
+            if video.frame_rate:
+                numbers['fps'] = float(video.frame_rate)
+            codecs['video_codec'] = video.codec
+        if audio is not None:
+            numbers['sample_rate'] = audio.sample_rate
+            numbers['channels'] = audio.channels
+            codecs['audio_codec'] = audio.codec
+
+        done = []
+        try:
+            for name, value in numbers.items():
+                self.numbers[name].append(value)
+                done.append(self.numbers[name])
+            for name, value in codecs.items():
+                self.dictionaries[name].append(value)
+                done.append(self.dictionaries[name].codes)
+        except BufferError:
+            # an array.array can not grow while it is exported
+            for column in done:
+                column.pop()
+            raise BufferError(
+                'Columns can not grow while arrays of them are in use, '
+                'delete them or copy them first')
+        self.paths.append(path)
+
+    def append_error(self, path: str, error):
+        self.errors[path] = str(error)
+        self.append(path, FormatInfo())
+        self.numbers['ok'][-1] = 0
+
+    # exports
+
+    def to_numpy(self):
+        """
+        A structured array, with the dictionary columns as their codes
+        and their values in .dtype.metadata['dictionaries']
+        """
+        if np is None:
+            raise ImportError('to_numpy needs numpy')
+
+        dictionaries = {
+            name: list(column.values)
+            for name, column in self.dictionaries.items()}
+        dtype = np.dtype(
+            [('path', object)]
+            + [(name, '<i4') for name in DICTIONARY_COLUMNS]
+            + [(name, dtype) for name, (_, dtype) in NUMBER_COLUMNS.items()],
+            metadata={'dictionaries': dictionaries})
+
+        table = np.empty(len(self), dtype)
+        table['path'] = self.paths
+        for name, values in self.arrays().items():
+            table[name] = values
+        return table
+
+    def to_csv(self, file):
+        """
+        Writes a header and a row per file to file, a path or an
+        open text file. Unknown numbers are written empty.
+        """
+        if isinstance(file, str):
+            with open(file, 'w', newline='') as out:
+                return self.to_csv(out)
+
+        names = self.names
+        columns = [self[name] for name in names]
+        writer = csv.writer(file)
+        writer.writerow(names)
+        for row in zip(*columns):
+            writer.writerow([
+                '' if x is None or x != x else x for x in row])
+
+    def arrays(self) -> dict:
+        """
+        The number columns and codes of the dictionary columns as
+        NumPy arrays over the same buffers, nothing is copied.
+        While they, or a DataFrame or Table made from them, are alive
+        append raises BufferError. Copy them to keep them and go on
+        appending.
+        """
+        if np is None:
+            raise ImportError('arrays needs numpy')
+
+        arrays = {
+            name: np.frombuffer(column.codes, '<i4')
+            for name, column in self.dictionaries.items()}
+        for name, (_, np_dtype) in NUMBER_COLUMNS.items():
+            arrays[name] = np.frombuffer(self.numbers[name], np_dtype)
+        return arrays
+
+    def to_pandas(self):
+        """
+        A DataFrame whose number columns share the buffers of this,
+        and dictionary columns are Categorical. No row can be appended
+        while it is alive, see arrays()
+        """
+        import pandas as pd
+
+        arrays = self.arrays()
+        data = {'path': self.paths}
+        for name, column in self.dictionaries.items():
+            data[name] = pd.Categorical.from_codes(
+                arrays.pop(name), column.values)
+        data.update(arrays)
+        return pd.DataFrame(data, copy=False)
+
+    def to_arrow(self):
+        """
+        A pyarrow Table, with the dictionary columns as DictionaryArray.
+        No row can be appended while it is alive, see arrays()
+        """
+        import pyarrow as pa
+        import pyarrow.compute as pc
+
+        types = {
+            'd': pa.float64(), 'q': pa.int64(), 'i': pa.int32(),
+            'b': pa.int8()}
+
+        def _wrap(buffer):
+            # no copy, the array reads the buffer of the column
+            return pa.Array.from_buffers(
+                types[buffer.typecode], len(buffer),
+                [None, pa.py_buffer(buffer)])
+
+        data = {'path': pa.array(self.paths, pa.string())}
+        for name, column in self.dictionaries.items():
+            codes = _wrap(column.codes)
+            # -1 is none, a null for arrow
+            codes = pc.if_else(
+                pc.less(codes, 0), pa.scalar(None, pa.int32()), codes)
+            data[name] = pa.DictionaryArray.from_arrays(
+                codes, pa.array(column.values, pa.string()))
+        for name in NUMBER_COLUMNS:
+            data[name] = _wrap(self.numbers[name])
+        return pa.table(data)
+
+
+def probe_columns(
+        file_names: Iterable[str], max_workers: int = 0,
+        timeout: float = PROBE_TIMEOUT, use_cache: bool = True,
+        chunk_size: int = 1,
+        ffmpeg_path: Optional[str] = None) -> ProbeColumns:
+    """
+    Probe file_names on FFprobe.probe_many, writing each result
+    straight into the columns of a ProbeColumns as it completes.
+    Rows are in completion order.
+    """
+    logger.info('Inside probe_columns')
+
+    columns = ProbeColumns()
+    results = FFprobe.probe_many(
+        file_names, max_workers=max_workers, timeout=timeout,
+        use_cache=use_cache, chunk_size=chunk_size, ffmpeg_path=ffmpeg_path)
+    for file_name, result in results:
+        if isinstance(result, Exception):
+            columns.append_error(file_name, result)
+        else:
+            columns.append(file_name, result.info)
+    return columns
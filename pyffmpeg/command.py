@@ -0,0 +1,269 @@
+"""
+Immutable ffmpeg command lines, kept as their parts and compiled
+straight to an argv list, so no string is ever split again
+"""
+
+import string
+from typing import List, Optional
+
+
+_FORMATTER = string.Formatter()
+
+# options of ffmpeg that take no value, the others take one
+FLAGS = frozenset((
+    'y', 'n', 'an', 'vn', 'sn', 'dn', 'hide_banner', 'nostdin', 'stdin',
+    'stats', 'nostats', 'shortest', 're', 'copyts', 'start_at_zero',
+    'accurate_seek', 'noaccurate_seek', 'autorotate', 'noautorotate',
+    'autoscale', 'noautoscale', 'benchmark', 'benchmark_all', 'dump',
+    'hex', 'xerror', 'ignore_unknown', 'copy_unknown', 'debug_ts',
+    'vstats', 'psnr', 'qphist', 'fix_sub_duration', 'bitexact',
+    'print_graphs', 'stream_loop_disable'))
+
+
+def _args(options) -> tuple:
+    return tuple(str(x) for x in options)
+
+
+def literal(arg) -> str:
+    """
+    arg with its braces doubled, so a Command keeps it as it is
+    instead of reading {placeholders} in it, eg. a path 'a{b}.mp4'
+    or a drawtext filter's %{pts}
+    """
+    return str(arg).replace('{', '{{').replace('}', '}}')
+
+
+def literals(options) -> list:
+    return [literal(x) for x in options]
+
+
+def output_indexes(argv) -> List[int]:
+    """
+    Indexes of the output files in argv, ffmpeg's arguments without
+    the executable: what is not an option, its value or an input
+    """
+    indexes = []
+    at = 0
+    while at < len(argv):
+        arg = argv[at]
+        if arg.startswith('-') and arg != '-':
+            name = arg[1:].split(':')[0]
+            value = argv[at + 1] if at + 1 < len(argv) else ''
+            # a value may be negative, eg. -ss -5, not another option
+            takes_value = name not in FLAGS and not (
+                value.startswith('-') and value != '-'
+                and not value[1:2].isdigit())
+            at += 2 if takes_value else 1
+            continue
+        indexes.append(at)
+        at += 1
+    return indexes
+
+
+def _fields(arg: str) -> Optional[frozenset]:
+    # names of the {placeholders} of arg, None when it has nothing
+    # to format
+    if '{' not in arg and '}' not in arg:
+        return None
+    try:
+        return frozenset(
+            name for _, name, _, _ in _FORMATTER.parse(arg) if name)
+    except ValueError:
+        # a lone brace, not a placeholder
+        return None
+
+
+class Input():
+    """
+    A source and the options before its -i, eg. ('-ss', '10')
+    """
+
+    __slots__ = ('source', 'options')
+
+    def __init__(self, source: str, options=()):
+
+        self.source = str(source)
+        self.options = _args(options)
+
+    def __repr__(self):
+        return f'Input({self.source!r}, {self.options})'
+
+    def args(self) -> list:
+        return [*self.options, '-i', self.source]
+
+
+class Output():
+    """
+    A target and the options before it, eg. ('-c:a', 'aac')
+    """
+
+    __slots__ = ('target', 'options')
+
+    def __init__(self, target: str, options=()):
+
+        self.target = str(target)
+        self.options = _args(options)
+
+    def __repr__(self):
+        return f'Output({self.target!r}, {self.options})'
+
+    def args(self) -> list:
+        return [*self.options, self.target]
+
+
+class Template():
+    """
+    The arguments of a Command, compiled once. Arguments holding
+    {placeholders} are the only ones formatted when it is filled:
+
+        template = Command().input('{src}').output('{dst}').compile()
+        template.argv('ffmpeg', src='a.mp4', dst='a.mp3')
+    """
+
+    __slots__ = ('args', 'fields', 'names')
+
+    def __init__(self, args):
+
+        self.args = _args(args)
+        # (position, argument) of the arguments to format
+        self.fields = tuple(
+            (at, arg) for at, arg in enumerate(self.args)
+            if _fields(arg) is not None)
+        self.names = frozenset().union(*(_fields(x) for _, x in self.fields))
+
+    def __repr__(self):
+        return f'Template({list(self.args)})'
+
+    def argv(self, ffmpeg: Optional[str] = None, **values) -> List[str]:
+        """
+        The arguments with values in their placeholders, after the
+        ffmpeg executable when one is given
+        """
+        missing = self.names.difference(values)
+        if missing:
+            raise ValueError(f'No value for {", ".join(sorted(missing))}')
+
+        argv = list(self.args)
+        for at, arg in self.fields:
+            argv[at] = arg.format_map(values)
+        if ffmpeg:
+            argv.insert(0, ffmpeg)
+        return argv
+
+
+class Command():
+    """
+    An ffmpeg command as global options, inputs with their options,
+    filtergraphs and outputs with their options. It never changes,
+    every method returns a new Command, so one can be the starting
+    point of many:
+
+        base = Command(['-hide_banner']).input('{src}')
+        mp3 = base.output('{dst}', '-vn', '-b:a', '{bitrate}')
+        mp3.argv('ffmpeg', src='a.mp4', dst='a.mp3', bitrate='96k')
+
+    Arguments may hold {name} placeholders, filled by argv, and {{ }}
+    for literal braces. Pass arguments that come from elsewhere, like
+    file names, through literal() first.
+    """
+
+    __slots__ = ('global_options', 'inputs', 'filters', 'outputs', '_template')
+
+    def __init__(self, global_options=(), inputs=(), filters=(), outputs=()):
+
+        set_ = object.__setattr__
+        set_(self, 'global_options', _args(global_options))
+        set_(self, 'inputs', tuple(inputs))
+        # joined by ';' into one -filter_complex
+        set_(self, 'filters', _args(filters))
+        set_(self, 'outputs', tuple(outputs))
+        set_(self, '_template', None)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('Command is immutable')
+
+    def __repr__(self):
+        return f'Command({self.compile().args})'
+
+    def __eq__(self, other):
+        return isinstance(other, Command) and (
+            self.compile().args == other.compile().args)
+
+    def __hash__(self):
+        return hash(self.compile().args)
+
+    def _replace(self, **parts):
+        values = {
+            'global_options': self.global_options, 'inputs': self.inputs,
+            'filters': self.filters, 'outputs': self.outputs}
+        values.update(parts)
+        return Command(**values)
+
+    def with_options(self, *options):
+        """
+        Adds global options, eg. '-hide_banner'
+        """
+        return self._replace(
+            global_options=self.global_options + _args(options))
+
+    def input(self, source: str, *options):
+        """
+        Adds an input, with the options that go before its -i
+        """
+        return self._replace(inputs=self.inputs + (Input(source, options),))
+
+    def filter(self, graph: str):
+        """
+        Adds a filtergraph to the -filter_complex of the command
+        """
+        return self._replace(filters=self.filters + (str(graph),))
+
+    def output(self, target: str, *options):
+        """
+        Adds an output, with the options that go before it
+        """
+        return self._replace(
+            outputs=self.outputs + (Output(target, options),))
+
+    def input_options(self, index: int, *options):
+        """
+        Adds options to the input at index, after those it has
+        """
+        inputs = list(self.inputs)
+        found = inputs[index]
+        inputs[index] = Input(found.source, found.options + _args(options))
+        return self._replace(inputs=tuple(inputs))
+
+    def output_options(self, index: int, *options):
+        """
+        Adds options to the output at index, after those it has
+        """
+        outputs = list(self.outputs)
+        found = outputs[index]
+        outputs[index] = Output(found.target, found.options + _args(options))
+        return self._replace(outputs=tuple(outputs))
+
+    def compile(self) -> Template:
+        """
+        The Template of the command, worked out once
+        """
+        if self._template is None:
+            args = list(self.global_options)
+            for source in self.inputs:
+                args.extend(source.args())
+            if self.filters:
+                args.extend(['-filter_complex', ';'.join(self.filters)])
+            for target in self.outputs:
+                args.extend(target.args())
+            object.__setattr__(self, '_template', Template(args))
+        return self._template
+
+    @property
+    def placeholders(self) -> frozenset:
+        return self.compile().names
+
+    def argv(self, ffmpeg: Optional[str] = None, **values) -> List[str]:
+        """
+        The command line as a list, ready for Popen
+        """
+        return self.compile().argv(ffmpeg, **values)
@@ -2,153 +2,107 @@
 # Each function must return a list.
 # the string should be in the format; key: value
 # all functions must also be put in the FUNC_LIST
+# They run on every stream header of every probe, so patterns are
+# compiled once here and nothing is logged per call.
 import re
 import logging
 
 
 logger = logging.getLogger('pyggmpeg.extract_functions')
 
+VIDEO_CODEC = re.compile(r'Video: (.*?) ')
+AUDIO_CODEC = re.compile(r'Audio: (.*?) ')
+RATE = re.compile(r', (\d+ [a-zA-Z]+/s)')
+DIMENSIONS = re.compile(r', (\d+x\d+)[ ,]')
+SAR_DAR = re.compile(r'\[SAR (.*?) DAR (.*?)\]')
+# the number before a unit, eg. '29.97' of '29.97 fps' or '30k' of '30k tbn'
+NUMBER_END = re.compile(r'(\d+.?\d*)$')
+SAMPLE_RATE = re.compile(r', (\d+ Hz)')
+
+
+def _first(pattern, line, key):
+    found = pattern.search(line)
+    if found:
+        return [key + ': ' + found.group(1)]
+    return []
+
+
+def _number_before(line, unit, key):
+    # finding the unit first is many times faster than searching
+    # the whole line for r'\d+.?\d* fps'
+    unit = ' ' + unit
+    at = line.find(unit)
+    while at != -1:
+        found = NUMBER_END.search(line, max(at - 16, 0), at)
+        if found:
+            return [key + ': ' + found.group(1)]
+        at = line.find(unit, at + 1)
+    return []
+
+
 # video functions
 
 def _codec_name(line):
-    logger.info('Inside _codec_name')
-    if 'Video:' in line:
-        cod = re.findall(r'Video: .*? ', line)[0]
-        if cod.endswith(', '):
-            cod = cod[:-2]
-        name = cod.split(':')[1].strip()
-        name_string = 'codec: ' + name
-    else:
-        return []
-
-    return [name_string]
+    found = VIDEO_CODEC.search(line)
+    if found:
+        return ['codec: ' + found.group(1).rstrip(',').strip()]
+    return []
 
 
 def _data_rate(line):
-    logger.info('Inside _data_rate')
-    dr = re.findall(r', \d+ [a-zA-Z]+/s', line)
-    if dr:
-        dr = dr[0].split(', ')[1]
-        dr_string = 'data_rate: ' + dr
-    else:
-        return []
-
-    return [dr_string]
+    return _first(RATE, line, 'data_rate')
 
 
 def _dimensions(line):
-    logger.info("Inside _dimensions")
-    dim = re.findall(r', \d+x\d+ ', line)
-    if dim:
-        dim = dim[0].split(', ')[1].strip()
-        dim_string = 'dimensions: ' + dim
-    else:
+    dim = DIMENSIONS.search(line)
+    if not dim:
         return []
 
-    sd = re.findall(r'\[SAR .*? DAR .*?\]', line)
-    if sd:
-        sd = sd[0].split(' ')
-        sar_string = 'SAR: ' + sd[1]
-        dar_string = 'DAR: ' + sd[3][:-1]
-    else:
+    dim_string = 'dimensions: ' + dim.group(1)
+    sd = SAR_DAR.search(line)
+    if not sd:
         return [dim_string]
 
-    return [dim_string, dar_string, sar_string]
+    return [dim_string, 'DAR: ' + sd.group(2), 'SAR: ' + sd.group(1)]
 
 
 def _fps(line):
-    logger.info('Inside _fps')
-    if 'fps' in line:
-        fps = re.findall(r'\d+.?\d* fps', line)[0].split(' fps')[0]
-        fps_str = 'fps: '+fps
-    else:
-        return []
-
-    return [fps_str]
+    return _number_before(line, 'fps', 'fps')
 
 
 def _tbc(line):
-    logger.info("Inside _tbc")
-    if 'tbc' in line:
-        tbc = re.findall(r'\d+.?\d* tbc', line)[0].split(' tbc')[0]
-        tbc_str = 'tbc: ' + tbc
-    else:
-        return []
-
-    return [tbc_str]
+    return _number_before(line, 'tbc', 'tbc')
 
 
 def _tbn(line):
-    logger.info('Inside _tbn')
-    if 'tbn' in line:
-        tbn = re.findall(r'\d+.?\d* tbn', line)[0].split(' tbn')[0]
-        tbn_str = 'tbn: ' + tbn
-    else:
-        return []
-
-    return [tbn_str]
+    return _number_before(line, 'tbn', 'tbn')
 
 
 def _tbr(line):
-    logger.info("Inside _tbr")
-    if 'tbr' in line:
-        tbr = re.findall(r'\d+.?\d* tbr', line)[0].split(' tbr')[0]
-        tbr_str = 'tbr: ' + tbr
-    else:
-        return []
-
-    return [tbr_str]
+    return _number_before(line, 'tbr', 'tbr')
 
 
 # audio functions
 
 def _audio_codec_name(line):
-    logger.info('Inside _audio_codec_name')
-    if 'Audio:' in line:
-        cod = re.findall(r'Audio: .*? ', line)[0]
-        if cod.endswith(', '):
-            cod = cod[:-2]
-        name = cod.split(':')[1].strip()
-        name_string = 'codec: ' + name
-    else:
-        return []
-
-    return [name_string]
+    found = AUDIO_CODEC.search(line)
+    if found:
+        return ['codec: ' + found.group(1).rstrip(',').strip()]
+    return []
 
 
 def _bit_rate(line):
-    logger.info('Inside _bit_rate')
-    bt = re.findall(r', \d+ [a-zA-Z]+/s', line)
-    if bt:
-        bt = bt[0].split(', ')[1]
-        bt_string = 'bitrate: ' + bt
-    else:
-        return []
-
-    return [bt_string]
+    return _first(RATE, line, 'bitrate')
 
 
 def _channels(line):
-    logger.info("Inside _channels")
-    ch_string = 'channels: '
     if 'stereo' in line:
-        ch_string += 'stereo'
-    else:
-        ch_string += 'mono'
-
-    return [ch_string]
+        return ['channels: stereo']
+    return ['channels: mono']
 
 
 def _sample_rate(line):
-    logger.info("Inside _sample_rate")
-    sr = re.findall(r', \d+ Hz', line)
-    if sr:
-        sr = sr[0].split(', ')[1]
-        sr_string = 'sample_rate: ' + sr
-    else:
-        return []
-
-    return [sr_string]
+    return _first(SAMPLE_RATE, line, 'sample_rate')
 
 
 AUDIO_FUNC_LIST = [_audio_codec_name, _bit_rate, _channels, _sample_rate]
@@ -0,0 +1,289 @@
+"""
+To read decoded video frames straight from ffmpeg into NumPy arrays,
+falling back to memoryviews when NumPy is not installed,
+and to encode arrays back into a video
+"""
+
+import logging
+import threading
+from queue import Queue
+from subprocess import Popen, PIPE, DEVNULL
+from typing import List, Optional, Tuple
+
+from .misc import ffmpeg_bin
+from .pipes import read_raw, start_drain
+from .pseudo_ffprobe import FFprobe
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+logger = logging.getLogger('pyffmpeg.frames')
+
+PIX_FMTS = ('rgb24', 'gray', 'yuv420p')
+
+
+def frame_shape(pix_fmt: str, width: int, height: int) -> Tuple[int, ...]:
+    """
+    Shape of one frame of pix_fmt
+    """
+    if pix_fmt == 'rgb24':
+        return (height, width, 3)
+    if pix_fmt == 'gray':
+        return (height, width)
+    if pix_fmt == 'yuv420p':
+        if width % 2 or height % 2:
+            # chroma planes are rounded up, so it does not fit 2d
+            chroma = ((width + 1) // 2) * ((height + 1) // 2)
+            return (width * height + 2 * chroma,)
+        # Y plane on top of the U and V planes
+        return (height * 3 // 2, width)
+    raise ValueError(f'pix_fmt must be one of {PIX_FMTS}')
+
+
+class FrameReader():
+    """
+    Iterates the frames of a video in batches:
+
+        for batch in FrameReader('f.mp4', batch_size=8, size=(224, 224)):
+            batch.shape  # (8, 224, 224, 3)
+
+    Frames are read into a ring of preallocated buffers and yielded
+    without a copy, so a batch is only valid until ring_size more
+    batches have been read. Copy it to keep it longer.
+    The last batch may hold fewer than batch_size frames.
+    """
+
+    def __init__(
+            self, file_name: str, pix_fmt: str = 'rgb24',
+            batch_size: int = 1, size: Optional[Tuple[int, int]] = None,
+            fps: Optional[float] = None, ring_size: int = 2,
+            ffmpeg_path: Optional[str] = None):
+        """
+        size: (width, height) to scale the frames to
+        fps: frame rate to resample the video to
+        ring_size: batches buffered, at least 2
+        ffmpeg_path: ffmpeg executable to use, see misc.resolve_ffmpeg
+        """
+
+        self.logger = logging.getLogger('pyffmpeg.frames.FrameReader')
+        if pix_fmt not in PIX_FMTS:
+            raise ValueError(f'pix_fmt must be one of {PIX_FMTS}')
+
+        self.file_name = file_name
+        self.pix_fmt = pix_fmt
+        self.batch_size = max(batch_size, 1)
+        self.fps = fps
+        self.ring_size = max(ring_size, 2)
+        self.ffmpeg_path = ffmpeg_path
+        self._ffmpeg = ffmpeg_bin(ffmpeg_path=ffmpeg_path)
+
+        if size:
+            self.width, self.height = size
+        else:
+            self.width, self.height = self._probe_size()
+        self.scale = bool(size)
+
+        self.shape = frame_shape(pix_fmt, self.width, self.height)
+        self.frame_size = 1
+        for dim in self.shape:
+            self.frame_size *= dim
+
+        self.error = ''
+
+    def _probe_size(self):
+        probe = FFprobe(self.file_name, ffmpeg_path=self.ffmpeg_path)
+        for video in probe.info.video_streams:
+            if not video.attached_pic:
+                return video.width, video.height
+        raise Exception(f'No video stream found in {self.file_name}')
+
+    def _commands(self):
+        commands = [self._ffmpeg, '-loglevel', 'error', '-i', self.file_name]
+
+        filters = []
+        if self.fps:
+            filters.append(f'fps={self.fps}')
+        if self.scale:
+            filters.append(f'scale={self.width}:{self.height}')
+        if filters:
+            commands.extend(['-vf', ','.join(filters)])
+
+        commands.extend([
+            '-an', '-sn', '-f', 'rawvideo', '-pix_fmt', self.pix_fmt,
+            'pipe:1'])
+        return commands
+
+    def _as_batch(self, buffer, frames: int):
+        shape = (frames,) + self.shape
+        if np is not None:
+            return np.frombuffer(
+                buffer, np.uint8, frames * self.frame_size).reshape(shape)
+        return memoryview(buffer)[:frames * self.frame_size].cast('B', shape)
+
+    def __iter__(self):
+        batch_bytes = self.batch_size * self.frame_size
+        blocks = read_raw(self._commands(), batch_bytes, self.ring_size)
+
+        try:
+            for buffer, filled in blocks:
+                frames = filled // self.frame_size
+                if frames:
+                    yield self._as_batch(buffer, frames)
+        except Exception as e:
+            self.error = str(e)
+            raise
+        finally:
+            # stops ffmpeg when the caller breaks out early
+            blocks.close()
+
+
+class FrameWriter():
+    """
+    Encodes frames made in Python by writing them to ffmpeg's stdin:
+
+        with FrameWriter('out.mp4', size=(640, 360), fps=30) as writer:
+            for frame in frames:
+                writer.write(frame)
+
+    A frame is any C-contiguous buffer (NumPy array, bytes, ...) of
+    one frame of pix_fmt. It is handed to ffmpeg without a copy, so do
+    not change it in place after write(). At most queue_size frames
+    wait for the encoder, after that write() blocks until it catches up.
+    """
+
+    def __init__(
+            self, output_file: str, size: Tuple[int, int],
+            fps: float = 30, pix_fmt: str = 'rgb24',
+            codec: Optional[str] = None, out_pix_fmt: str = 'yuv420p',
+            audio: Optional[str] = None,
+            output_options: Optional[List[str]] = None,
+            queue_size: int = 8, ffmpeg_path: Optional[str] = None):
+        """
+        size: (width, height) of the frames
+        out_pix_fmt: pixel format of the encoded video, yuv420p is
+            the one every player supports
+        audio: file whose audio is muxed in as the sound track
+        output_options: extra options for the output
+        ffmpeg_path: ffmpeg executable to use, see misc.resolve_ffmpeg
+        """
+
+        self.logger = logging.getLogger('pyffmpeg.frames.FrameWriter')
+        if pix_fmt not in PIX_FMTS:
+            raise ValueError(f'pix_fmt must be one of {PIX_FMTS}')
+
+        self.output_file = output_file
+        self.width, self.height = size
+        self.fps = fps
+        self.pix_fmt = pix_fmt
+        self.codec = codec
+        self.out_pix_fmt = out_pix_fmt
+        self.audio = audio
+        self.output_options = output_options or []
+        self.frame_size = 1
+        for dim in frame_shape(pix_fmt, self.width, self.height):
+            self.frame_size *= dim
+        self.frames_written = 0
+        self.error = ''
+        self._ffmpeg = ffmpeg_bin(ffmpeg_path=ffmpeg_path)
+
+        self._queue = Queue(maxsize=max(queue_size, 1))
+        self._write_error = None
+
+        commands = self._commands()
+        self.logger.info(f'Issuing commands {commands}')
+        self.process = Popen(commands, stdin=PIPE, stdout=DEVNULL, stderr=PIPE)
+        self._drain, self._log_tail = start_drain(self.process.stderr)
+        self._writer = threading.Thread(target=self._write_frames)
+        self._writer.daemon = True
+        self._writer.start()
+
+    def _commands(self):
+        commands = [
+            self._ffmpeg, '-loglevel', 'error', '-y',
+            '-f', 'rawvideo', '-pix_fmt', self.pix_fmt,
+            '-s', f'{self.width}x{self.height}', '-r', str(self.fps),
+            '-i', 'pipe:0']
+
+        if self.audio:
+            commands.extend([
+                '-i', self.audio, '-map', '0:v', '-map', '1:a', '-shortest'])
+        if self.codec:
+            commands.extend(['-c:v', self.codec])
+        if self.out_pix_fmt:
+            commands.extend(['-pix_fmt', self.out_pix_fmt])
+
+        commands.extend(self.output_options)
+        commands.append(self.output_file)
+        return commands
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.close()
+        else:
+            # do not wait for a half written video, and leave
+            # the original error to propagate
+            self.process.kill()
+            self._finish()
+
+    def _write_frames(self):
+        while True:
+            frame = self._queue.get()
+            if frame is None:
+                break
+            if self._write_error:
+                # ffmpeg is gone, keep emptying the queue so
+                # write() never blocks on it
+                continue
+            try:
+                self.process.stdin.write(frame)
+            except (BrokenPipeError, OSError, ValueError) as e:
+                self._write_error = e
+
+        try:
+            self.process.stdin.close()
+        except (BrokenPipeError, OSError):
+            pass
+
+    def write(self, frame):
+        """
+        Queue one frame for encoding, blocks while the queue is full
+        """
+        if self._write_error:
+            raise Exception(
+                f'ffmpeg stopped taking frames: {"".join(self._log_tail)}')
+
+        view = memoryview(frame)
+        if not view.c_contiguous:
+            raise ValueError('frame must be C-contiguous')
+        view = view.cast('B')
+        if view.nbytes != self.frame_size:
+            raise ValueError(
+                f'frame has {view.nbytes} bytes, expected {self.frame_size}')
+
+        self._queue.put(view)
+        self.frames_written += 1
+
+    def close(self):
+        """
+        Flush the queued frames and wait for ffmpeg to finish the file
+        """
+        self._finish()
+
+        if self.process.returncode != 0:
+            self.error = ''.join(self._log_tail).strip()
+            self.logger.error(self.error)
+            raise Exception(self.error)
+
+    def _finish(self):
+        if self._writer.is_alive():
+            self._queue.put(None)
+            self._writer.join()
+
+        self.process.wait()
+        self._drain.join()
@@ -3,9 +3,13 @@ To Provide miscellaneous function
 """
 
 import os
+import re
+import shutil
+import threading
+import subprocess
+from contextlib import contextmanager
+from importlib.util import find_spec
 from platform import system
-from lzma import decompress, compress
-from base64 import b64decode, b64encode
 import logging
 
 
@@ -20,6 +24,67 @@ if OS_NAME == 'linux':
 else:
     SHELL = True
 
+# folder of the packaged binary for each os, under static/bin
+BIN_FOLDERS = {'windows': 'win32', 'linux': 'linuxmod', 'darwin': 'darwin'}
+# and of the base64 module older packages ship instead, in that folder
+BIN_MODULES = {'windows': 'win32', 'linux': 'linux', 'darwin': 'darwin'}
+BLOB_NAME = 'ffmpeg.xz'
+
+# size of the pieces the binary is (de)compressed in
+_CHUNK_SIZE = 1024 * 1024
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# environment variables to point at an ffmpeg, and to change
+# where it is looked for, eg. PYFFMPEG_ORDER=bundled,system
+FFMPEG_ENV = 'PYFFMPEG_FFMPEG'
+ORDER_ENV = 'PYFFMPEG_ORDER'
+
+# argument: the ffmpeg_path given to FFmpeg or FFprobe
+# env: the file in PYFFMPEG_FFMPEG
+# bundled: the binary shipped with pyffmpeg, extracted if needed
+# system: ffmpeg on PATH
+# the bundled binary comes first, as it always did, so it is extracted
+# even with an ffmpeg on PATH, see set_resolve_order. Without one,
+# eg. a package built without binaries, system is next
+BIN_SOURCES = ('argument', 'env', 'bundled', 'system')
+
+# set up once per process, on first use rather than on import
+_lock = threading.Lock()
+_resolve_order = None
+_binaries = {}
+_log_handlers = []
+
+
+@contextmanager
+def file_lock(path: str):
+    """
+    Hold an exclusive lock on path, shared with other processes
+    """
+    with open(path, 'a+b') as lock_file:
+        if OS_NAME == 'windows':
+            import msvcrt
+            lock_file.seek(0)
+            # LK_LOCK gives up after 10 tries, so keep trying
+            while True:
+                try:
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    pass
+            try:
+                yield
+            finally:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
 
 class Paths():
     """
@@ -44,15 +109,19 @@ class Paths():
             os.environ[env_name], '.pyffmpeg')
         self.bin_path = os.path.join(
             self.home_path, 'bin')
-        # Create the folders
+        self.ffmpeg_file = ''
+
+    def make_folders(self):
+        """
+        Create the folders, only done when something is written there
+        """
         if not os.path.exists(self.bin_path):
-            os.makedirs(self.bin_path)
+            os.makedirs(self.bin_path, exist_ok=True)
             if self.os_name != 'windows':
-                os.system(f'chmod +rw {self.home_path}')
-                os.system(f'chmod +rw {self.bin_path}')
+                for path in (self.home_path, self.bin_path):
+                    os.chmod(path, os.stat(path).st_mode | 0o600)
         if self.enable_log:
             self.logger.info(f'bin folder: {self.bin_path}')
-        self.ffmpeg_file = ''
 
     def load_ffmpeg_bin(self):
 
@@ -60,38 +129,151 @@ class Paths():
             self.logger.info('Inside load_ffmpeg_bin')
 
         # Load OS specific ffmpeg executable
+        self.make_folders()
 
         self.ffmpeg_file = os.path.join(
             self.bin_path, 'ffmpeg'+self._ffmpeg_ext)
 
-        if not os.path.exists(self.ffmpeg_file):
+        # the file only appears once complete, see _extract_blob
+        if os.path.exists(self.ffmpeg_file):
+            return self.ffmpeg_file
 
-            # load os specific ffmpeg bin data
-            if self.os_name == 'windows':
-                from .static.bin.win32 import win32
-                b64 = win32.contents
-            elif self.os_name == 'linux':
-                from .static.bin.linuxmod import linux
-                b64 = linux.contents
-            else:
-                from .static.bin.darwin import darwin
-                b64 = darwin.contents
+        # workers starting together must not extract it at once
+        with file_lock(self.ffmpeg_file + '.lock'):
+            if not os.path.exists(self.ffmpeg_file):
+                blob = self.bin_blob()
+                if os.path.exists(blob):
+                    self._extract_blob(blob, self.ffmpeg_file)
+                else:
+                    self._extract_module(self.ffmpeg_file)
+
+        return self.ffmpeg_file
 
-            raw = b64decode(b64)
-            decompressed = decompress(raw)
-            # Finally create the ffmpeg file
-            with open(self.ffmpeg_file, 'wb') as f_file:
-                f_file.write(decompressed)
+    def has_bundle(self) -> bool:
+        """
+        Whether there is a bundled ffmpeg, extracted or still packaged
+        """
+        ffmpeg_file = os.path.join(self.bin_path, 'ffmpeg'+self._ffmpeg_ext)
+        if os.path.exists(ffmpeg_file) or os.path.exists(self.bin_blob()):
+            return True
+        folder = BIN_FOLDERS.get(self.os_name, 'darwin')
+        module = BIN_MODULES.get(self.os_name, 'darwin')
+        try:
+            return find_spec(
+                f'{__package__}.static.bin.{folder}.{module}') is not None
+        except ImportError:
+            return False
+
+    def bin_blob(self):
+        """
+        Path of the compressed ffmpeg packaged for this os
+        """
+        folder = BIN_FOLDERS.get(self.os_name, 'darwin')
+        return os.path.join(
+            os.path.dirname(__file__), 'static', 'bin', folder, BLOB_NAME)
+
+    def _extract_blob(self, blob: str, target: str):
+        """
+        Decompress blob into target a piece at a time, so memory stays
+        bounded, check it against the stored sha256 and only then move
+        it into place
+        """
+        if self.enable_log:
+            self.logger.info(f'Extracting {blob}')
+
+        import hashlib
+        from lzma import LZMADecompressor
+
+        temp = f'{target}.{os.getpid()}.tmp'
+        digest = hashlib.sha256()
+        decompressor = LZMADecompressor()
+
+        try:
+            with open(blob, 'rb') as b_file, open(temp, 'wb') as t_file:
+                while not decompressor.eof:
+                    if decompressor.needs_input:
+                        chunk = b_file.read(_CHUNK_SIZE)
+                        if not chunk:
+                            raise Exception(f'{blob} is truncated')
+                    else:
+                        chunk = b''
+                    data = decompressor.decompress(chunk, _CHUNK_SIZE)
+                    digest.update(data)
+                    t_file.write(data)
+                t_file.flush()
+                os.fsync(t_file.fileno())
+
+            with open(blob + '.sha256', 'r') as s_file:
+                expected = s_file.read().split()[0]
+            if digest.hexdigest() != expected:
+                raise Exception(f'Checksum of {blob} does not match')
+
+            self._make_executable(temp)
+            os.replace(temp, target)
+        finally:
+            if os.path.exists(temp):
+                os.unlink(temp)
+
+    def _extract_module(self, target: str):
+        # older packages ship the binary as a base64 python module
+        from lzma import decompress
+        from base64 import b64decode
 
-            # Do chmod on Unix
-            if self.os_name != 'windows':
-                os.system(f'chmod +x {self.ffmpeg_file}')
+        if self.os_name == 'windows':
+            from .static.bin.win32 import win32
+            b64 = win32.contents
+        elif self.os_name == 'linux':
+            from .static.bin.linuxmod import linux
+            b64 = linux.contents
+        else:
+            from .static.bin.darwin import darwin
+            b64 = darwin.contents
+
+        temp = f'{target}.{os.getpid()}.tmp'
+        try:
+            with open(temp, 'wb') as f_file:
+                f_file.write(decompress(b64decode(b64)))
+            self._make_executable(temp)
+            os.replace(temp, target)
+        finally:
+            if os.path.exists(temp):
+                os.unlink(temp)
+
+    def _make_executable(self, fn: str):
+        if self.os_name != 'windows':
+            os.chmod(fn, os.stat(fn).st_mode | 0o755)
 
-        return self.ffmpeg_file
+    @staticmethod
+    def convert_to_blob(fn: str, target_dir: str):
+        """
+        Compress the binary fn into target_dir as the blob
+        load_ffmpeg_bin extracts, with its sha256 next to it
+        """
+        logger.info('Inside convert_to_blob')
+
+        import hashlib
+        from lzma import LZMACompressor
+
+        blob = os.path.join(target_dir, BLOB_NAME)
+        digest = hashlib.sha256()
+        compressor = LZMACompressor()
+
+        with open(fn, 'rb') as f_file, open(blob, 'wb') as b_file:
+            for chunk in iter(lambda: f_file.read(_CHUNK_SIZE), b''):
+                digest.update(chunk)
+                b_file.write(compressor.compress(chunk))
+            b_file.write(compressor.flush())
+
+        with open(blob + '.sha256', 'w') as s_file:
+            s_file.write(digest.hexdigest() + '\n')
+
+        return blob
 
     @staticmethod
     def convert_to_py(fn: str, target: str):
         logger.info('Inside convert_to_py')
+        from lzma import compress
+        from base64 import b64encode
 
         with open(fn, 'rb') as f_file:
             raw = f_file.read()
@@ -104,6 +286,161 @@ class Paths():
             t_file.write(smtm)
 
 
+class FFmpegBinary():
+    """
+    An ffmpeg executable, where it was found and its version
+    """
+
+    def __init__(self, path: str, source: str):
+
+        self.path = path
+        self.source = source
+        self._version = None
+
+    def __repr__(self):
+        return f'FFmpegBinary({self.path!r}, {self.source!r})'
+
+    @property
+    def version(self) -> str:
+        """
+        Version from 'ffmpeg -version', only run the first time
+        """
+        if self._version is None:
+            try:
+                out = subprocess.run(
+                    [self.path, '-version'], stdin=subprocess.DEVNULL,
+                    capture_output=True, timeout=10).stdout
+            except (OSError, subprocess.SubprocessError) as e:
+                logger.error(f'Could not run {self.path}: {e}')
+                out = b''
+            found = re.search(rb'ffmpeg version (\S+)', out)
+            self._version = found.group(1).decode() if found else ''
+        return self._version
+
+
+def set_resolve_order(*sources):
+    """
+    Change the order ffmpeg is looked for in, from BIN_SOURCES.
+    Called with nothing, goes back to PYFFMPEG_ORDER or the default
+    """
+    global _resolve_order
+
+    for source in sources:
+        if source not in BIN_SOURCES:
+            raise ValueError(f'source must be one of {BIN_SOURCES}')
+
+    with _lock:
+        _resolve_order = tuple(sources) or None
+        _binaries.clear()
+
+
+def resolve_order():
+    if _resolve_order:
+        return _resolve_order
+
+    env_order = os.environ.get(ORDER_ENV, '')
+    if env_order:
+        order = tuple(s.strip() for s in env_order.split(',') if s.strip())
+        for source in order:
+            if source not in BIN_SOURCES:
+                raise ValueError(
+                    f'{ORDER_ENV} must list sources from {BIN_SOURCES}')
+        return order
+    return BIN_SOURCES
+
+
+def _find_bin(source: str, ffmpeg_path, enable_log: bool):
+    if source == 'argument':
+        path = ffmpeg_path
+    elif source == 'env':
+        path = os.environ.get(FFMPEG_ENV)
+    elif source == 'system':
+        return shutil.which('ffmpeg')
+    else:
+        paths = Paths(enable_log)
+        if not paths.has_bundle():
+            return None
+        return paths.load_ffmpeg_bin()
+
+    if path and not os.path.isfile(path):
+        # asked for by name, so do not quietly use another
+        raise Exception(f'ffmpeg not found at {path} ({source})')
+    return path
+
+
+def resolve_ffmpeg(
+        ffmpeg_path=None, enable_log: bool = True) -> FFmpegBinary:
+    """
+    Find ffmpeg by trying each source of resolve_order in turn.
+    The result is remembered for the rest of the process
+    """
+    binary = _binaries.get(ffmpeg_path)
+    if binary:
+        return binary
+
+    with _lock:
+        binary = _binaries.get(ffmpeg_path)
+        if binary:
+            return binary
+
+        for source in resolve_order():
+            path = _find_bin(source, ffmpeg_path, enable_log)
+            if path:
+                binary = FFmpegBinary(path, source)
+                break
+        else:
+            raise Exception(
+                f'No ffmpeg found, looked in {", ".join(resolve_order())}')
+
+        logger.info(f'Using {binary}')
+        _binaries[ffmpeg_path] = binary
+    return binary
+
+
+def clear_resolved():
+    """
+    Forget the resolved binaries, so the next use looks again
+    """
+    with _lock:
+        _binaries.clear()
+
+
+def ffmpeg_bin(enable_log: bool = True, ffmpeg_path=None) -> str:
+    """
+    Path of the ffmpeg executable, see resolve_ffmpeg
+    """
+    return resolve_ffmpeg(ffmpeg_path, enable_log).path
+
+
+def setup_logging():
+    """
+    Send pyffmpeg's logs to ~/.pyffmpeg/pyffmpeg.log and stderr.
+    Runs once, when the first FFmpeg or FFprobe is made
+    """
+    if _log_handlers:
+        return
+
+    with _lock:
+        if _log_handlers:
+            return
+
+        paths = Paths(False)
+        paths.make_folders()
+
+        root = logging.getLogger('pyffmpeg')
+        root.setLevel(logging.DEBUG)
+        formatter = logging.Formatter(LOG_FORMAT)
+
+        fh = logging.FileHandler(
+            os.path.join(paths.home_path, 'pyffmpeg.log'))
+        ch = logging.StreamHandler()
+        for handler in (fh, ch):
+            handler.setLevel(logging.DEBUG)
+            handler.setFormatter(formatter)
+            root.addHandler(handler)
+            _log_handlers.append(handler)
+
+
 def fix_splashes(options):
     """
     Make splashes synanymous irrespective of the OS
@@ -128,6 +465,15 @@ def fix_splashes(options):
         return options
 
 
+class ConvertResult(str):
+    """
+    The output file of a conversion. probe holds the FFprobe of its
+    input, read from the conversion's own log, or None when the log
+    level was too low for ffmpeg to print it.
+    """
+    probe = None
+
+
 class ModifiedList(list):
 
     def __init__(self, other=[]):
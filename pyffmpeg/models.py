@@ -0,0 +1,373 @@
+"""
+Typed records of what FFprobe found, with numbers as numbers:
+seconds as float, bits/s as int and frame rates as Fraction
+"""
+
+import re
+from fractions import Fraction
+from typing import List, Optional
+
+from .progress import time_to_seconds
+
+
+# eg. 'Stream #0:1[0x2](und): Audio: aac (LC) ..., 96 kb/s (default)',
+# the language may be a tag like (en-US)
+STREAM_HEAD = re.compile(
+    r'Stream #\d+:(\d+)(?:\[\w+\])?(?:\(([^)]*)\))?: (\w+): (.*)$')
+# the flags ffmpeg puts at the end of a header, eg. (default)
+DISPOSITIONS = (
+    'default', 'dub', 'original', 'comment', 'lyrics', 'karaoke', 'forced',
+    'hearing impaired', 'visual impaired', 'clean effects', 'attached pic',
+    'timed thumbnails', 'non diegetic', 'captions', 'descriptions',
+    'metadata', 'dependent', 'still image')
+DISPOSITION = re.compile(r'\s*\((%s)\)$' % '|'.join(DISPOSITIONS))
+BIT_RATE = re.compile(r'([\d.]+) ([kmg]?)b/s', re.I)
+SIZE = re.compile(r'(\d+)x(\d+)')
+ASPECT = re.compile(r'SAR (\S+) DAR ([^\]\s]+)')
+# eg. '5.1(side)' or '6 channels'
+CHANNEL_COUNT = re.compile(r'(\d+)(?:\.(\d+))?')
+
+_UNITS = {'': 1, 'k': 1000, 'm': 1000000, 'g': 1000000000}
+
+# rates of the NTSC family, n * 1000/1001, as n
+NTSC_RATES = (24, 30, 48, 60, 120, 240)
+
+# channels of the layouts ffmpeg names instead of numbering
+_LAYOUTS = {'mono': 1, 'stereo': 2, 'quad': 4}
+
+
+def bits_per_second(value) -> int:
+    """
+    Converts '128 kb/s' to 128000, 0 when there is no rate
+    """
+    found = BIT_RATE.search(value or '')
+    if not found:
+        return 0
+    return int(float(found.group(1)) * _UNITS[found.group(2).lower()])
+
+
+def frame_rate(value) -> Optional[Fraction]:
+    """
+    Converts the rate ffmpeg prints, eg. '25' or '29.97', to a
+    Fraction. The NTSC rates it rounds are given back exactly,
+    '29.97' is 30000/1001, other rates as printed.
+    """
+    if not value:
+        return None
+
+    value = value.strip()
+    if value.endswith('k'):
+        return Fraction(value[:-1]) * 1000
+    try:
+        rate = Fraction(value)
+    except ValueError:
+        return None
+
+    # only when the NTSC rate, printed as ffmpeg does, gives value
+    digits = len(value.partition('.')[2])
+    ntsc = round(rate * Fraction(1001, 1000))
+    if digits and ntsc in NTSC_RATES and (
+            round(Fraction(ntsc * 1000, 1001), digits) == rate):
+        return Fraction(ntsc * 1000, 1001)
+    return rate
+
+
+def _fields(text: str) -> List[str]:
+    # split on ', ' that is not inside brackets,
+    # eg. 'yuvj420p(pc, bt470bg/unknown/unknown)' is one field
+    fields = []
+    depth = 0
+    start = 0
+    for at, char in enumerate(text):
+        if char in '([':
+            depth += 1
+        elif char in ')]':
+            depth -= 1
+        elif char == ',' and not depth:
+            fields.append(text[start:at].strip())
+            start = at + 1
+    fields.append(text[start:].strip())
+    return fields
+
+
+class Stream():
+    """
+    A stream ffmpeg has no dedicated record for, eg. Data
+    """
+
+    __slots__ = (
+        'index', 'kind', 'codec', 'bitrate', 'language', 'disposition',
+        'tags')
+
+    def __init__(
+            self, index: int, kind: str, codec: str = '', bitrate: int = 0,
+            language: str = '', disposition=(), tags=None):
+
+        self.index = index
+        self.kind = kind
+        self.codec = codec
+        # bits/s, 0 when unknown
+        self.bitrate = bitrate
+        self.language = language
+        self.disposition = tuple(disposition)
+        self.tags = dict(tags or {})
+
+    def __repr__(self):
+        return f'{type(self).__name__}({self.index}, {self.codec!r})'
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.as_dict() == other.as_dict()
+
+    @property
+    def default(self) -> bool:
+        return 'default' in self.disposition
+
+    def as_dict(self) -> dict:
+        """
+        Plain values only, ready for json
+        """
+        data = {}
+        for cls in reversed(type(self).__mro__[:-1]):
+            for name in cls.__dict__.get('__slots__', ()):
+                data[name] = getattr(self, name)
+        data['disposition'] = list(self.disposition)
+        return data
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        return cls(**data)
+
+    def _read_fields(self, fields):
+        pass
+
+
+class VideoStream(Stream):
+
+    __slots__ = ('width', 'height', 'pix_fmt', 'frame_rate', 'sar', 'dar')
+
+    def __init__(
+            self, index: int, kind: str = 'Video', width: int = 0,
+            height: int = 0, pix_fmt: str = '', frame_rate=None,
+            sar: str = '', dar: str = '', **kwargs):
+
+        super().__init__(index, kind, **kwargs)
+        self.width = width
+        self.height = height
+        self.pix_fmt = pix_fmt
+        # Fraction, None for a still image
+        if isinstance(frame_rate, str):
+            frame_rate = Fraction(frame_rate)
+        self.frame_rate = frame_rate
+        self.sar = sar
+        self.dar = dar
+
+    @property
+    def attached_pic(self) -> bool:
+        # cover art rather than a video
+        return 'attached pic' in self.disposition
+
+    def as_dict(self) -> dict:
+        data = super().as_dict()
+        if self.frame_rate is not None:
+            data['frame_rate'] = str(self.frame_rate)
+        return data
+
+    def _read_fields(self, fields):
+        if len(fields) > 1:
+            self.pix_fmt = fields[1].split('(')[0]
+
+        for field in fields[2:]:
+            size = SIZE.match(field)
+            if size and not self.width:
+                self.width, self.height = int(size[1]), int(size[2])
+                aspect = ASPECT.search(field)
+                if aspect:
+                    self.sar, self.dar = aspect.groups()
+            elif field.endswith(' fps'):
+                self.frame_rate = frame_rate(field[:-4])
+            elif field.endswith(' tbr') and self.frame_rate is None:
+                if not self.attached_pic:
+                    self.frame_rate = frame_rate(field[:-4])
+
+
+class AudioStream(Stream):
+
+    __slots__ = ('sample_rate', 'channels', 'channel_layout', 'sample_fmt')
+
+    def __init__(
+            self, index: int, kind: str = 'Audio', sample_rate: int = 0,
+            channels: int = 0, channel_layout: str = '',
+            sample_fmt: str = '', **kwargs):
+
+        super().__init__(index, kind, **kwargs)
+        # Hz
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.channel_layout = channel_layout
+        self.sample_fmt = sample_fmt
+
+    def _read_fields(self, fields):
+        for position, field in enumerate(fields[1:], 1):
+            if field.endswith(' Hz'):
+                self.sample_rate = int(field[:-3])
+                layout = fields[position + 1:position + 2]
+                if layout:
+                    self._set_layout(layout[0])
+                sample_fmt = fields[position + 2:position + 3]
+                if sample_fmt and 'b/s' not in sample_fmt[0]:
+                    self.sample_fmt = sample_fmt[0]
+
+    def _set_layout(self, layout):
+        self.channel_layout = layout
+        if layout in _LAYOUTS:
+            self.channels = _LAYOUTS[layout]
+            return
+        found = CHANNEL_COUNT.match(layout)
+        if found:
+            self.channels = int(found[1]) + int(found[2] or 0)
+
+
+class SubtitleStream(Stream):
+
+    __slots__ = ()
+
+    def __init__(self, index: int, kind: str = 'Subtitle', **kwargs):
+        super().__init__(index, kind, **kwargs)
+
+
+STREAM_TYPES = {
+    'Video': VideoStream, 'Audio': AudioStream, 'Subtitle': SubtitleStream}
+
+
+def stream_from_header(header: str, tags=None) -> Stream:
+    """
+    Builds the record of a 'Stream #0:0...' line of ffmpeg's log
+    """
+    found = STREAM_HEAD.search(header)
+    if not found:
+        raise ValueError(f'Not a stream header: {header}')
+
+    index, language, kind, rest = found.groups()
+
+    disposition = []
+    while True:
+        flag = DISPOSITION.search(rest)
+        if not flag:
+            break
+        disposition.insert(0, flag.group(1))
+        rest = rest[:flag.start()]
+
+    fields = _fields(rest)
+    cls = STREAM_TYPES.get(kind, Stream)
+    stream = cls(
+        int(index), kind=kind, codec=fields[0].split(' ')[0],
+        language=language or '', disposition=disposition, tags=tags)
+
+    stream.bitrate = max(
+        (bits_per_second(x) for x in fields[1:] if x.endswith('b/s')),
+        default=0)
+    stream._read_fields(fields)
+    return stream
+
+
+class FormatInfo():
+    """
+    An input as a whole, with all its streams
+    """
+
+    __slots__ = (
+        'format_name', 'duration', 'start', 'bitrate', 'tags', 'streams')
+
+    def __init__(
+            self, format_name: str = '', duration: Optional[float] = None,
+            start: float = 0.0, bitrate: int = 0, tags=None,
+            streams: Optional[List[Stream]] = None):
+
+        # eg. 'mov,mp4,m4a,3gp,3g2,mj2'
+        self.format_name = format_name
+        # seconds, None when ffmpeg does not know it
+        self.duration = duration
+        self.start = start
+        # bits/s
+        self.bitrate = bitrate
+        self.tags = dict(tags or {})
+        self.streams = streams or []
+
+    def __repr__(self):
+        return (
+            f'FormatInfo({self.format_name!r}, duration={self.duration}, '
+            f'{len(self.streams)} streams)')
+
+    def __eq__(self, other):
+        return isinstance(other, FormatInfo) and (
+            self.as_dict() == other.as_dict())
+
+    @property
+    def video_streams(self) -> List[VideoStream]:
+        return [x for x in self.streams if isinstance(x, VideoStream)]
+
+    @property
+    def audio_streams(self) -> List[AudioStream]:
+        return [x for x in self.streams if isinstance(x, AudioStream)]
+
+    @property
+    def subtitle_streams(self) -> List[SubtitleStream]:
+        return [x for x in self.streams if isinstance(x, SubtitleStream)]
+
+    def as_dict(self) -> dict:
+        """
+        Plain values only, ready for json
+        """
+        return {
+            'format_name': self.format_name, 'duration': self.duration,
+            'start': self.start, 'bitrate': self.bitrate,
+            'tags': dict(self.tags),
+            'streams': [x.as_dict() for x in self.streams]}
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        data = dict(data)
+        streams = []
+        for stream in data.pop('streams', []):
+            stream_cls = STREAM_TYPES.get(stream['kind'], Stream)
+            streams.append(stream_cls.from_dict(stream))
+        return cls(streams=streams, **data)
+
+    @classmethod
+    def from_record(cls, source):
+        """
+        Builds it from an InputRecord of banner.parse_banner
+        """
+        tags = {
+            k: v for k, v in source.tags.items()
+            if k not in ('Duration', 'start', 'bitrate')}
+
+        duration = source.tags.get('Duration', '')
+        if duration and duration != 'N/A':
+            duration = time_to_seconds(duration)
+        else:
+            duration = None
+
+        start = source.tags.get('start', '')
+        try:
+            start = float(start)
+        except ValueError:
+            start = 0.0
+
+        streams = [
+            stream_from_header(x.header, _stream_tags(x.tags))
+            for x in source.streams]
+
+        return cls(
+            source.format, duration, start,
+            bits_per_second(source.tags.get('bitrate')), tags, streams)
+
+
+# keys the header functions add, the header itself is parsed instead
+_HEADER_KEYS = {
+    'codec', 'data_rate', 'dimensions', 'DAR', 'SAR', 'fps', 'tbc', 'tbn',
+    'tbr', 'bitrate', 'channels', 'sample_rate'}
+
+
+def _stream_tags(tags):
+    return {k: v for k, v in tags.items() if k not in _HEADER_KEYS}
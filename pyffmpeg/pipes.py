@@ -0,0 +1,139 @@
+"""
+Helpers to feed ffmpeg through stdin and read it through stdout
+without deadlocking on full pipes
+"""
+
+import threading
+import logging
+from collections import deque
+from subprocess import Popen, PIPE, DEVNULL
+
+
+logger = logging.getLogger('pyffmpeg.pipes')
+
+CHUNK_SIZE = 65536
+
+# lines of stderr kept for the error message
+LOG_TAIL = 50
+
+
+def iter_source(source, chunk_size: int = CHUNK_SIZE):
+    """
+    Yields source in chunks. source can be bytes-like, a file-like
+    object with read(), or an iterable of bytes-like chunks
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        view = memoryview(source)
+        for start in range(0, len(view), chunk_size):
+            yield view[start:start + chunk_size]
+
+    elif hasattr(source, 'read'):
+        while True:
+            chunk = source.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+    else:
+        yield from source
+
+
+def _feed(stdin, source, chunk_size, errors):
+    try:
+        for chunk in iter_source(source, chunk_size):
+            # blocks while the pipe is full, which is the backpressure
+            stdin.write(chunk)
+    except (BrokenPipeError, OSError, ValueError) as e:
+        # ffmpeg stopped reading, its stderr says why
+        logger.info(f'Stopped feeding ffmpeg: {e}')
+    except Exception as e:
+        errors.append(e)
+    finally:
+        try:
+            stdin.close()
+        except (BrokenPipeError, OSError):
+            pass
+
+
+def start_feeder(stdin, source, chunk_size: int = CHUNK_SIZE):
+    """
+    Write source to stdin on a thread, closing it at the end.
+    Returns the thread and a list that gets any error of the source.
+    """
+    errors = []
+    f_thread = threading.Thread(
+        target=_feed, args=[stdin, source, chunk_size, errors])
+    f_thread.daemon = True
+    f_thread.start()
+    return f_thread, errors
+
+
+def readinto_full(stream, view) -> int:
+    """
+    Fill view from stream unless the stream ends first.
+    Returns the number of bytes read.
+    """
+    filled = 0
+    while filled < len(view):
+        count = stream.readinto(view[filled:])
+        if not count:
+            break
+        filled += count
+    return filled
+
+
+def _drain(stream, tail):
+    for raw in stream:
+        tail.append(raw.decode('utf-8', 'replace'))
+
+
+def start_drain(stream, size: int = LOG_TAIL):
+    """
+    Read stream on a thread so ffmpeg never blocks on it, keeping
+    only its last lines. Returns the thread and the lines.
+    """
+    tail = deque(maxlen=size)
+    d_thread = threading.Thread(target=_drain, args=[stream, tail])
+    d_thread.daemon = True
+    d_thread.start()
+    return d_thread, tail
+
+
+def read_raw(commands, block_size: int, ring_size: int = 2):
+    """
+    Run ffmpeg with raw output on stdout and yield (buffer, filled)
+    for every block_size bytes it writes. The buffers come from a
+    ring of ring_size preallocated bytearrays, so nothing is allocated
+    per block. filled is below block_size only for the last block.
+    Raises when ffmpeg fails.
+    """
+    logger.info(f'Issuing commands {commands}')
+    process = Popen(commands, stdin=DEVNULL, stdout=PIPE, stderr=PIPE)
+    drain, log_tail = start_drain(process.stderr)
+
+    ring = [bytearray(block_size) for _ in range(max(ring_size, 1))]
+
+    finished = False
+    try:
+        index = 0
+        while True:
+            buffer = ring[index % len(ring)]
+            filled = readinto_full(process.stdout, memoryview(buffer))
+            if filled:
+                yield buffer, filled
+            if filled < block_size:
+                break
+            index += 1
+        finished = True
+    finally:
+        # the caller stopped reading early
+        if not finished:
+            process.kill()
+        process.wait()
+        drain.join()
+        process.stdout.close()
+
+    if process.returncode != 0:
+        error = ''.join(log_tail).strip()
+        logger.error(error)
+        raise Exception(error)
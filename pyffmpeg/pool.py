@@ -0,0 +1,176 @@
+"""
+To run many FFmpeg jobs without oversubscribing the machine
+"""
+
+import os
+import itertools
+import threading
+import logging
+from queue import PriorityQueue
+from concurrent.futures import Future
+from typing import Callable, Iterable, Iterator, Optional
+
+from . import FFmpeg
+
+
+logger = logging.getLogger('pyffmpeg.pool')
+
+# lower runs first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_NORMAL = 5
+PRIORITY_BATCH = 10
+
+# sorts after every real job, so queued jobs run before the workers stop
+_STOP = float('inf')
+
+
+class FFmpegPool():
+    """
+    Runs convert and options jobs on at most max_jobs ffmpeg processes
+    at once. Jobs with a lower priority number start first, and every
+    job gets an equal share of the cpus through -threads.
+    Each submit returns a concurrent.futures.Future.
+    """
+
+    def __init__(
+            self, max_jobs: int = 0, threads_per_job: int = 0,
+            directory: str = ".", enable_log: bool = True,
+            configure: Optional[Callable] = None,
+            ffmpeg_path: Optional[str] = None):
+        """
+        max_jobs: processes running at once, defaults to a quarter
+            of the cpus
+        threads_per_job: defaults to splitting the cpus evenly
+            between max_jobs
+        configure: called with the FFmpeg instance of every job,
+            eg. to set its loglevel
+        ffmpeg_path: ffmpeg executable the jobs use
+        """
+
+        self.logger = logging.getLogger('pyffmpeg.pool.FFmpegPool')
+        cpus = os.cpu_count() or 1
+
+        if max_jobs < 1:
+            max_jobs = max(cpus // 4, 1)
+        if threads_per_job < 1:
+            threads_per_job = max(cpus // max_jobs, 1)
+
+        self.max_jobs = max_jobs
+        self.threads_per_job = threads_per_job
+        self.directory = directory
+        self.enable_log = enable_log
+        self.configure = configure
+        self.ffmpeg_path = ffmpeg_path
+        self.logger.info(
+            f'{max_jobs} jobs at once, {threads_per_job} threads each')
+
+        self._queue = PriorityQueue()
+        # keeps jobs of the same priority in submission order
+        self._counter = itertools.count()
+        self._shutdown = False
+        self._lock = threading.Lock()
+
+        self._workers = []
+        for _ in range(max_jobs):
+            worker = threading.Thread(target=self._work)
+            worker.daemon = True
+            worker.start()
+            self._workers.append(worker)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+
+    def submit(self, job: Callable, priority: int = PRIORITY_NORMAL) -> Future:
+        """
+        Queue job, which is called with a ready FFmpeg instance.
+        The future holds what job returns.
+        """
+        future = Future()
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError('cannot submit to a pool after shutdown')
+            self._queue.put((priority, next(self._counter), future, job))
+        return future
+
+    def submit_convert(
+            self, input_file, output_file,
+            priority: int = PRIORITY_NORMAL) -> Future:
+        """
+        Queue FFmpeg.convert(input_file, output_file)
+        """
+        return self.submit(
+            lambda ff: ff.convert(input_file, output_file), priority)
+
+    def submit_options(self, opts, priority: int = PRIORITY_NORMAL) -> Future:
+        """
+        Queue FFmpeg.options(opts)
+        """
+        return self.submit(lambda ff: ff.options(opts), priority)
+
+    def map(
+            self, job: Callable, items: Iterable,
+            priority: int = PRIORITY_NORMAL) -> Iterator:
+        """
+        Queue job(ff, item) for every item, eg. a presets.preset and
+        files. Returns an iterator of what they return, in the order
+        of items, that raises the error of a job that failed.
+        """
+        futures = [
+            self.submit(lambda ff, item=item: job(ff, item), priority)
+            for item in items]
+
+        def _results():
+            for future in futures:
+                yield future.result()
+        return _results()
+
+    def shutdown(self, wait: bool = True, cancel_pending: bool = False):
+        """
+        Stop the workers once the queued jobs are done.
+        cancel_pending: cancel the jobs that have not started instead
+        """
+        with self._lock:
+            if self._shutdown:
+                return
+            self._shutdown = True
+
+        if cancel_pending:
+            while not self._queue.empty():
+                item = self._queue.get_nowait()
+                item[2].cancel()
+
+        for _ in self._workers:
+            self._queue.put((_STOP, next(self._counter), None, None))
+
+        if wait:
+            for worker in self._workers:
+                worker.join()
+
+    def _new_ffmpeg(self):
+        ff = FFmpeg(
+            self.directory, enable_log=self.enable_log,
+            ffmpeg_path=self.ffmpeg_path)
+        ff.threads = self.threads_per_job
+        if self.configure:
+            self.configure(ff)
+        return ff
+
+    def _work(self):
+        while True:
+            priority, _, future, job = self._queue.get()
+            if priority == _STOP:
+                break
+
+            if not future.set_running_or_notify_cancel():
+                continue
+
+            try:
+                result = job(self._new_ffmpeg())
+            except BaseException as e:
+                self.logger.error(f'Job failed: {e}')
+                future.set_exception(e)
+            else:
+                future.set_result(result)
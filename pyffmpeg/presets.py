@@ -0,0 +1,244 @@
+"""
+Ready made commands, read from ffmpegcommands.preference and compiled
+once into Templates, to run on many files:
+
+    with FFmpegPool() as pool:
+        list(pool.map(preset('reduce_audio_bitrate', br='96k'), files))
+"""
+
+import os
+import re
+import shlex
+import string
+import threading
+import logging
+from typing import Dict, Optional
+
+from .command import Command, Template
+
+
+logger = logging.getLogger('pyffmpeg.presets')
+
+PREFERENCE_FILE = os.path.join(
+    os.path.dirname(__file__), 'ffmpegcommands.preference')
+
+# 'name - [arguments]' or 'NAME = "arguments"'
+_LINE = re.compile(
+    r'^(?P<name>[^\[="]+?)\s*(?:-\s*\[(?P<list>.*)\]|=\s*"(?P<quoted>.*)")\s*$')
+# {name} or {name=default}
+_PARAM = re.compile(r'\{(\w+)(?:=([^{}]*))?\}')
+# names the input and output get in the templates
+INPUT = 'input'
+OUTPUT = 'output'
+# the output of a file when neither the preset nor its recipe has
+# one, see Preset. A recipe names its own with o=pattern, eg.
+# o={dir}/{stem}_%04d.png, or o=.gif for this one with another extension
+DEFAULT_OUTPUT = '{dir}/{stem}_{preset}{ext}'
+OUTPUT_FIELDS = frozenset(('dir', 'stem', 'ext', 'preset'))
+
+_presets: Dict[str, 'PresetTemplate'] = {}
+_lock = threading.Lock()
+_loaded = False
+
+
+def preset_name(name: str) -> str:
+    """
+    'reduce audio bitrate' to reduce_audio_bitrate
+    """
+    return re.sub(r'\W+', '_', name.strip()).strip('_').lower()
+
+
+class PresetTemplate():
+    """
+    A recipe checked and compiled, with the defaults of its parameters
+    """
+
+    __slots__ = ('name', 'template', 'defaults', 'params', 'output')
+
+    def __init__(self, name: str, arguments: str):
+
+        self.name = preset_name(name)
+        self.defaults = {}
+        self.output = None
+        self.template = self._compile(arguments)
+        self.params = self.template.names - {INPUT, OUTPUT}
+
+    def __repr__(self):
+        return f'PresetTemplate({self.name!r}, {list(self.template.args)})'
+
+    def _default(self, found):
+        param, default = found.groups()
+        if param in (INPUT, OUTPUT):
+            raise ValueError(f'{self.name}: {param} is the name of i or o')
+        if default is not None:
+            if self.defaults.get(param, default) != default:
+                raise ValueError(
+                    f'{self.name}: {param} has two defaults')
+            self.defaults[param] = default
+        return '{' + param + '}'
+
+    def _output(self, pattern: str) -> str:
+        if pattern.startswith('.') and '/' not in pattern:
+            pattern = DEFAULT_OUTPUT.replace('{ext}', pattern)
+        try:
+            fields = {x[1] for x in string.Formatter().parse(pattern) if x[1]}
+        except ValueError as e:
+            raise ValueError(f'{self.name}: bad output {pattern}: {e}')
+        if not fields <= OUTPUT_FIELDS:
+            raise ValueError(
+                f'{self.name}: an output may only use '
+                f'{", ".join(sorted(OUTPUT_FIELDS))}')
+        return pattern
+
+    def _compile(self, arguments: str) -> Template:
+        tokens = shlex.split(arguments)
+        if tokens and tokens[-1].startswith('o='):
+            self.output = self._output(tokens[-1][2:])
+            tokens[-1] = 'o'
+        args = [_PARAM.sub(self._default, x) for x in tokens]
+
+        if args.count('i') != 1 or args.count('o') != 1:
+            raise ValueError(f'{self.name}: needs one i and one o')
+        at = args.index('i')
+        if at == 0 or args[at - 1] != '-i':
+            raise ValueError(f'{self.name}: i must follow -i')
+        if args[-1] != 'o':
+            raise ValueError(f'{self.name}: o must come last')
+
+        command = Command().input(
+            '{' + INPUT + '}', *args[:at - 1]).output(
+            '{' + OUTPUT + '}', *args[at + 1:-1])
+        return command.compile()
+
+    def bind(self, output: Optional[str] = None, **values) -> 'Preset':
+        unknown = set(values) - self.params
+        if unknown:
+            raise ValueError(
+                f'{self.name} has no {", ".join(sorted(unknown))}, '
+                f'only {", ".join(sorted(self.params)) or "no parameters"}')
+
+        bound = dict(self.defaults)
+        bound.update({k: str(v) for k, v in values.items()})
+        missing = self.params - set(bound)
+        if missing:
+            raise ValueError(
+                f'{self.name} needs {", ".join(sorted(missing))}')
+        return Preset(self, bound, output)
+
+
+class Preset():
+    """
+    A preset with its parameters set, ready for any number of files.
+    Call it with an FFmpeg and an input file, as FFmpegPool.map does,
+    to convert the file. It returns the output file.
+    output: where each file goes, may use {dir}, {stem} and {ext} of
+        the input and {preset}. Relative to the FFmpeg's directory.
+        Defaults to the output of the recipe, else DEFAULT_OUTPUT.
+    """
+
+    __slots__ = ('preset', 'values', 'output')
+
+    def __init__(
+            self, preset: PresetTemplate, values: dict,
+            output: Optional[str] = None):
+
+        self.preset = preset
+        self.values = values
+        self.output = output or preset.output or DEFAULT_OUTPUT
+
+    def __repr__(self):
+        return f'Preset({self.preset.name!r}, {self.values})'
+
+    def output_file(self, input_file: str, directory: str = '.') -> str:
+        folder, name = os.path.split(input_file)
+        stem, ext = os.path.splitext(name)
+        out = self.output.format(
+            dir=folder or '.', stem=stem, ext=ext, preset=self.preset.name)
+        if not os.path.isabs(out):
+            out = os.path.join(directory, out)
+        return out
+
+    def argv(
+            self, input_file: str, output_file: Optional[str] = None,
+            ffmpeg: Optional[str] = None) -> list:
+        if output_file is None:
+            output_file = self.output_file(input_file)
+        return self.preset.template.argv(
+            ffmpeg, input=input_file, output=output_file, **self.values)
+
+    def __call__(self, ff, input_file: str) -> str:
+        out = self.output_file(input_file, ff.save_dir)
+        out_path = os.path.dirname(out)
+        if out_path and not os.path.exists(out_path) and ff.create_folders:
+            os.makedirs(out_path)
+
+        ff.run(
+            self.preset.template, input=input_file, output=out,
+            **self.values)
+        return out
+
+
+def load_presets(path: str = PREFERENCE_FILE) -> Dict[str, PresetTemplate]:
+    """
+    Reads the recipes of a preference file, see ffmpegcommands.preference
+    """
+    presets = {}
+    with open(path, encoding='utf-8') as preference:
+        for number, line in enumerate(preference, 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+
+            found = _LINE.match(line)
+            if not found:
+                raise ValueError(f'{path}:{number}: not a recipe: {line}')
+            arguments = found.group('list')
+            if arguments is None:
+                arguments = found.group('quoted')
+            try:
+                compiled = PresetTemplate(found.group('name'), arguments)
+            except ValueError as e:
+                raise ValueError(f'{path}:{number}: {e}')
+            presets[compiled.name] = compiled
+    return presets
+
+
+def add_presets(path: str):
+    """
+    Adds the recipes of another preference file, replacing any of
+    the same name
+    """
+    loaded = load_presets(path)
+    with _lock:
+        _load()
+        _presets.update(loaded)
+
+
+def _load():
+    # under _lock, the file is only read once it is needed
+    global _loaded
+    if not _loaded:
+        _presets.update(load_presets())
+        _loaded = True
+
+
+def presets() -> Dict[str, PresetTemplate]:
+    """
+    Every preset by name
+    """
+    with _lock:
+        _load()
+        return dict(_presets)
+
+
+def preset(name: str, output: Optional[str] = None, **values) -> Preset:
+    """
+    The preset name with its parameters set. Unknown or missing
+    parameters raise ValueError here, once, not for every file.
+    """
+    with _lock:
+        _load()
+        found = _presets.get(preset_name(name))
+    if found is None:
+        raise ValueError(f'No preset named {name}')
+    return found.bind(output, **values)
@@ -0,0 +1,117 @@
+"""
+In-memory cache of probe results, shared by the whole process
+"""
+
+import os
+import threading
+import logging
+from collections import OrderedDict
+from copy import deepcopy
+
+
+logger = logging.getLogger('pyffmpeg.probe_cache')
+
+
+class ProbeCache():
+    """
+    Thread-safe LRU cache of probe results keyed by file identity
+    (realpath, size, mtime_ns, inode), so a file that changes on disk
+    is probed again.
+    index: an optional probe_index.ProbeIndex behind the memory,
+    looked up on a miss and written through on put, so results
+    outlive the process.
+    """
+
+    def __init__(self, maxsize: int = 1024):
+
+        self.maxsize = maxsize
+        self.enabled = True
+        self.hits = 0
+        self.misses = 0
+        self.index_hits = 0
+        self.index = None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(file_name):
+        """
+        Returns the identity of file_name, or None if it can not be
+        cached (urls, missing files)
+        """
+        if not file_name:
+            return None
+
+        real = os.path.realpath(file_name)
+        try:
+            st = os.stat(real)
+        except (OSError, ValueError):
+            return None
+
+        return (real, st.st_size, st.st_mtime_ns, st.st_ino)
+
+    def get(self, key):
+        """
+        Returns a copy of the entry stored for key or None
+        """
+        if not self.enabled or key is None:
+            return None
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+
+        if entry is None and self.index is not None:
+            entry = self.index.get_snapshot(key)
+            if entry is not None:
+                with self._lock:
+                    self.index_hits += 1
+                    self._store(key, entry)
+
+        if entry is None:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        return deepcopy(entry)
+
+    def put(self, key, value):
+        if not self.enabled or key is None:
+            return
+
+        value = deepcopy(value)
+        if self.maxsize > 0:
+            with self._lock:
+                self._store(key, value)
+        if self.index is not None:
+            self.index.put_snapshot(key, value)
+
+    def _store(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+            self.index_hits = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'index_hits': self.index_hits,
+                'size': len(self._entries),
+                'maxsize': self.maxsize}
+
+    def __len__(self):
+        return len(self._entries)
+
+
+probe_cache = ProbeCache()
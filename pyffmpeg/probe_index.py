@@ -0,0 +1,365 @@
+"""
+Persistent index of probe results in SQLite, for media libraries
+too big to probe again on every scan
+"""
+
+import os
+import json
+import sqlite3
+import threading
+import logging
+from collections import defaultdict
+from typing import Iterable, List, Optional
+
+from .misc import ModifiedList
+from .models import FormatInfo, VideoStream, AudioStream
+from .probe_cache import ProbeCache
+
+
+logger = logging.getLogger('pyffmpeg.probe_index')
+
+# rows written per transaction while scanning
+SCAN_BATCH = 500
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    dir TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    inode INTEGER NOT NULL,
+    format_name TEXT,
+    duration REAL,
+    bitrate INTEGER,
+    error TEXT,
+    probe TEXT
+);
+CREATE INDEX IF NOT EXISTS files_dir ON files (dir);
+CREATE INDEX IF NOT EXISTS files_duration ON files (duration);
+CREATE TABLE IF NOT EXISTS streams (
+    path TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    kind TEXT,
+    codec TEXT,
+    bitrate INTEGER,
+    width INTEGER,
+    height INTEGER,
+    frame_rate REAL,
+    sample_rate INTEGER,
+    channels INTEGER,
+    language TEXT,
+    PRIMARY KEY (path, idx)
+);
+CREATE INDEX IF NOT EXISTS streams_codec ON streams (codec);
+CREATE INDEX IF NOT EXISTS streams_audio
+    ON streams (kind, sample_rate, channels);
+'''
+
+# find() filters: name -> (sql, table it is on)
+_FILTERS = {
+    'kind': ('s.kind = ?', 's'),
+    'codec': ('s.codec = ?', 's'),
+    'width': ('s.width = ?', 's'),
+    'height': ('s.height = ?', 's'),
+    'min_width': ('s.width >= ?', 's'),
+    'min_height': ('s.height >= ?', 's'),
+    'sample_rate': ('s.sample_rate = ?', 's'),
+    'channels': ('s.channels = ?', 's'),
+    'language': ('s.language = ?', 's'),
+    'format_name': ('f.format_name = ?', 'f'),
+    'min_duration': ('f.duration >= ?', 'f'),
+    'max_duration': ('f.duration <= ?', 'f'),
+    'min_bitrate': ('f.bitrate >= ?', 'f'),
+}
+
+
+def encode_snapshot(snapshot: dict) -> str:
+    """
+    json of the attributes FFprobe caches, see FFprobe._snapshot
+    """
+    data = dict(snapshot)
+    data['metadata'] = [
+        x if isinstance(x, list) else dict(x) for x in snapshot['metadata']]
+    data['info'] = snapshot['info'].as_dict()
+    return json.dumps(data)
+
+
+def decode_snapshot(text: str) -> dict:
+    data = json.loads(text)
+    data['metadata'] = ModifiedList([
+        ModifiedList(x) if isinstance(x, list) else defaultdict(list, x)
+        for x in data['metadata']])
+    data['info'] = FormatInfo.from_dict(data['info'])
+    return data
+
+
+def _stream_row(path: str, stream):
+    row = [
+        path, stream.index, stream.kind, stream.codec, stream.bitrate,
+        None, None, None, None, None, stream.language]
+    if isinstance(stream, VideoStream):
+        row[5:8] = [
+            stream.width, stream.height,
+            float(stream.frame_rate) if stream.frame_rate else None]
+    elif isinstance(stream, AudioStream):
+        row[8:10] = [stream.sample_rate, stream.channels]
+    return row
+
+
+class ProbeIndex():
+    """
+    Probe results kept in an SQLite file, keyed by path with the
+    size, mtime and inode they were probed at:
+
+        index = ProbeIndex('library.db')
+        index.scan('/media')     # probes only new and changed files
+        index.find(codec='h264', min_duration=600)
+
+    Set it as the second tier of the probe cache and FFprobe reads
+    through it, and stores what it probes in it:
+
+        probe_cache.index = index
+    """
+
+    def __init__(self, db_path: str):
+
+        self.logger = logging.getLogger('pyffmpeg.probe_index.ProbeIndex')
+        self.db_path = db_path
+        self._lock = threading.RLock()
+        # shared by the threads of probe_many, under _lock
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.executescript(_SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute('SELECT COUNT(*) FROM files').fetchone()[0]
+
+    # the second tier of ProbeCache
+
+    def get_snapshot(self, key) -> Optional[dict]:
+        """
+        The FFprobe attributes stored for key, a ProbeCache.key,
+        or None if the file changed since or was never probed
+        """
+        with self._lock:
+            row = self._db.execute(
+                'SELECT probe FROM files WHERE path = ? AND size = ? '
+                'AND mtime_ns = ? AND inode = ?', key).fetchone()
+        if not row or not row[0]:
+            return None
+        return decode_snapshot(row[0])
+
+    def put_snapshot(self, key, snapshot: dict):
+        with self._lock, self._db:
+            self._write(key, snapshot, None)
+
+    def _write(self, key, snapshot, error):
+        path, size, mtime_ns, inode = key
+        info = snapshot['info'] if snapshot else FormatInfo()
+
+        self._db.execute('DELETE FROM streams WHERE path = ?', (path,))
+        self._db.execute(
+            'INSERT OR REPLACE INTO files VALUES (?,?,?,?,?,?,?,?,?,?)', (
+                path, os.path.dirname(path), size, mtime_ns, inode,
+                info.format_name, info.duration, info.bitrate, error,
+                encode_snapshot(snapshot) if snapshot else None))
+        self._db.executemany(
+            'INSERT INTO streams VALUES (?,?,?,?,?,?,?,?,?,?,?)',
+            [_stream_row(path, x) for x in info.streams])
+
+    # scanning
+
+    def scan(
+            self, root: str, extensions: Optional[Iterable[str]] = None,
+            max_workers: int = 0, chunk_size: int = 1,
+            prune: bool = True, ffmpeg_path: Optional[str] = None) -> dict:
+        """
+        Bring the index up to date with the files under root, probing
+        only those that are new or changed since the last scan, on
+        FFprobe.probe_many. Files that fail are stored with their
+        error and not probed again until they change.
+        extensions: eg. ('.mp4', '.mkv'), every file when None
+        prune: drop the entries of files gone from root
+        Returns the number of files unchanged, probed, failed and removed
+        """
+        from .pseudo_ffprobe import FFprobe
+
+        self.logger.info(f'Scanning {root}')
+        root = os.path.realpath(root)
+        if extensions:
+            extensions = tuple(x.lower() for x in extensions)
+
+        stats = {'unchanged': 0, 'probed': 0, 'failed': 0, 'removed': 0}
+        keys = {}
+        seen_dirs = set()
+        # realpaths of every file found, links to one file count once
+        found = set()
+        known_dirs = {}
+
+        def _known(folder):
+            # the entries of a folder, by path
+            if folder not in known_dirs:
+                with self._lock:
+                    known_dirs[folder] = {
+                        row[0]: row[1:] for row in self._db.execute(
+                            'SELECT path, size, mtime_ns, inode FROM files '
+                            'WHERE dir = ?', (folder,))}
+            return known_dirs[folder]
+
+        def _changed():
+            for dirpath, _, names in os.walk(root):
+                seen_dirs.add(dirpath)
+                for name in names:
+                    if extensions and not name.lower().endswith(extensions):
+                        continue
+                    key = ProbeCache.key(os.path.join(dirpath, name))
+                    if key is None or key[0] in found:
+                        continue
+                    found.add(key[0])
+                    if _known(os.path.dirname(key[0])).get(key[0]) == key[1:]:
+                        stats['unchanged'] += 1
+                        continue
+                    keys[key[0]] = key
+                    yield key[0]
+
+        results = FFprobe.probe_many(
+            _changed(), max_workers=max_workers, use_cache=False,
+            chunk_size=chunk_size, ffmpeg_path=ffmpeg_path)
+
+        batch = []
+        for path, result in results:
+            if isinstance(result, Exception):
+                batch.append((keys.pop(path), None, str(result)))
+                stats['failed'] += 1
+            else:
+                batch.append((keys.pop(path), result._snapshot(), None))
+                stats['probed'] += 1
+            if len(batch) >= SCAN_BATCH:
+                self._write_batch(batch)
+                batch = []
+        self._write_batch(batch)
+
+        if prune:
+            # entries are stored under their realpath, as found holds them
+            gone = [
+                x for folder in seen_dirs for x in _known(folder)
+                if x not in found]
+            self._remove(gone)
+            stats['removed'] += len(gone)
+            stats['removed'] += self._remove_dirs(root, seen_dirs)
+
+        self.logger.info(f'Scanned {root}: {stats}')
+        return stats
+
+    def _write_batch(self, batch):
+        with self._lock, self._db:
+            for key, snapshot, error in batch:
+                self._write(key, snapshot, error)
+
+    def _remove(self, paths):
+        if not paths:
+            return
+        with self._lock, self._db:
+            for path in paths:
+                self._db.execute('DELETE FROM streams WHERE path = ?', (path,))
+                self._db.execute('DELETE FROM files WHERE path = ?', (path,))
+
+    def _remove_dirs(self, root: str, seen_dirs) -> int:
+        # folders under root that the walk did not find any more
+        with self._lock:
+            dirs = [row[0] for row in self._db.execute(
+                'SELECT DISTINCT dir FROM files WHERE dir = ? '
+                'OR (dir > ? AND dir < ?)',
+                (root, root + os.sep, root + chr(ord(os.sep) + 1)))]
+
+        removed = 0
+        for folder in dirs:
+            if folder in seen_dirs:
+                continue
+            with self._lock:
+                paths = [row[0] for row in self._db.execute(
+                    'SELECT path FROM files WHERE dir = ?', (folder,))]
+            self._remove(paths)
+            removed += len(paths)
+        return removed
+
+    def remove(self, path: str):
+        """
+        Drop the entry of path
+        """
+        self._remove([os.path.realpath(path)])
+
+    # queries, none of them runs ffmpeg
+
+    def get(self, path: str) -> Optional[FormatInfo]:
+        """
+        The stored FormatInfo of path, whether or not it changed
+        since, None when it is not indexed or failed to probe
+        """
+        with self._lock:
+            row = self._db.execute(
+                'SELECT probe FROM files WHERE path = ?',
+                (os.path.realpath(path),)).fetchone()
+        if not row or not row[0]:
+            return None
+        return decode_snapshot(row[0])['info']
+
+    def errors(self) -> List[tuple]:
+        """
+        (path, error) of every file that failed to probe
+        """
+        with self._lock:
+            return self._db.execute(
+                'SELECT path, error FROM files WHERE error IS NOT NULL '
+                'ORDER BY path').fetchall()
+
+    def find(self, **filters) -> List[str]:
+        """
+        Paths of the files matching all filters, eg.
+        find(codec='h264', min_duration=600) or
+        find(kind='Audio', channels=1, sample_rate=22050).
+        Stream filters must all hold for the same stream.
+        Filters: kind, codec, width, height, min_width, min_height,
+        sample_rate, channels, language, format_name, min_duration,
+        max_duration, min_bitrate
+        """
+        clauses = []
+        values = []
+        join = False
+        for name, value in filters.items():
+            if name not in _FILTERS:
+                raise ValueError(f'Unknown filter {name}')
+            sql, table = _FILTERS[name]
+            clauses.append(sql)
+            values.append(value)
+            join = join or table == 's'
+
+        query = 'SELECT DISTINCT f.path FROM files f'
+        if join:
+            query += ' JOIN streams s ON s.path = f.path'
+        query += ' WHERE f.error IS NULL'
+        for clause in clauses:
+            query += ' AND ' + clause
+        query += ' ORDER BY f.path'
+
+        with self._lock:
+            return [row[0] for row in self._db.execute(query, values)]
+
+    def query(self, sql: str, params=()) -> List[tuple]:
+        """
+        Run any SELECT on the files and streams tables
+        """
+        with self._lock:
+            return self._db.execute(sql, params).fetchall()
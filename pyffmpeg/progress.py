@@ -0,0 +1,128 @@
+"""
+To read the progress ffmpeg reports with -progress pipe:1
+"""
+
+import logging
+
+
+logger = logging.getLogger('pyffmpeg.progress')
+
+# makes ffmpeg write key=value progress blocks to stdout
+# instead of the stats line on stderr
+PROGRESS_OPTIONS = ['-progress', 'pipe:1', '-nostats']
+
+
+def time_to_seconds(value) -> float:
+    """
+    Converts ffmpeg's 'HH:MM:SS.ss' time (or plain seconds) to seconds
+    """
+    if isinstance(value, (int, float)):
+        return float(value)
+
+    value = value.strip()
+    if not value or value == 'N/A':
+        return 0.0
+
+    negative = value.startswith('-')
+    seconds = 0.0
+    for part in value.lstrip('-').split(':'):
+        seconds = seconds * 60 + float(part)
+
+    return -seconds if negative else seconds
+
+
+def _to_float(value: str) -> float:
+    # values look like '29.97', '1.02x' or 'N/A'
+    value = value.strip().rstrip('x')
+    try:
+        return float(value)
+    except ValueError:
+        return 0.0
+
+
+class ProgressInfo():
+    """
+    One progress report of a running ffmpeg process
+    """
+
+    __slots__ = (
+        'frame', 'fps', 'bitrate', 'total_size', 'out_time', 'speed',
+        'duration', 'percent', 'eta', 'done', 'raw')
+
+    def __init__(self, block: dict, duration: float = 0.0):
+
+        self.raw = block
+        self.frame = int(_to_float(block.get('frame', '0')))
+        self.fps = _to_float(block.get('fps', '0'))
+
+        # eg. 128.0kbits/s
+        self.bitrate = _to_float(block.get('bitrate', '0').split('k')[0])
+        self.total_size = int(_to_float(block.get('total_size', '0')))
+
+        if block.get('out_time_us', 'N/A') != 'N/A':
+            self.out_time = max(int(block['out_time_us']), 0) / 1000000
+        else:
+            self.out_time = max(time_to_seconds(block.get('out_time', '')), 0)
+
+        self.speed = _to_float(block.get('speed', '0'))
+        self.done = block.get('progress') == 'end'
+        self.duration = duration
+
+        if self.done:
+            self.percent = 100.0
+        elif duration > 0:
+            self.percent = min(self.out_time / duration * 100, 100.0)
+        else:
+            self.percent = 0.0
+
+        if self.done:
+            self.eta = 0.0
+        elif duration > 0 and self.speed > 0:
+            self.eta = max(duration - self.out_time, 0) / self.speed
+        else:
+            self.eta = None
+
+    def __repr__(self):
+        return (
+            f'ProgressInfo(out_time={self.out_time}, fps={self.fps}, '
+            f'speed={self.speed}, bitrate={self.bitrate}, '
+            f'percent={self.percent:.1f}, eta={self.eta})')
+
+
+class ProgressParser():
+    """
+    Collects the key=value lines of ffmpeg's progress output into
+    blocks. A block ends with its 'progress' key, which is 'end'
+    for the last one.
+    """
+
+    def __init__(self):
+        self._block = {}
+
+    def feed(self, line):
+        """
+        Returns the finished block when line completes one, else None
+        """
+        if isinstance(line, bytes):
+            line = line.decode('utf-8', 'replace')
+        key, sep, value = line.strip().partition('=')
+        if not sep:
+            return None
+
+        self._block[key] = value
+        if key == 'progress':
+            block, self._block = self._block, {}
+            return block
+        return None
+
+
+def read_progress(stream):
+    """
+    Yields every key=value block ffmpeg writes to stream as a dict
+    """
+    logger.info('Inside read_progress')
+    parser = ProgressParser()
+    for raw in stream:
+        block = parser.feed(raw)
+        if block is not None:
+            yield block
@@ -4,20 +4,117 @@ without using ffprobe itself, but from ffmpeg log info
 """
 
 import subprocess
-from time import sleep
+import threading
 import re
-import random
 import os
 import logging
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from itertools import islice
+from typing import Optional
 # from base64 import b64decode
 
-from .misc import Paths, SHELL, ModifiedList
-from .extract_functions import VIDEO_FUNC_LIST, AUDIO_FUNC_LIST
+from .misc import (
+    Paths, SHELL, ModifiedList, resolve_ffmpeg, setup_logging)
+from .probe_cache import probe_cache
+from .models import FormatInfo
+from .banner import (
+    BANNER_END_MARKERS, banner_error, generate_tags, parse_banner)
 
 
 logger = logging.getLogger('pyffmpeg.pseudo_ffprobe')
 
+# seconds to wait for the input headers before giving up
+PROBE_TIMEOUT = 10.0
+
+# what ffmpeg says of an input it can not open, from 5.0 on, and the
+# '<file>: No such file or directory' of the versions before
+OPEN_ERROR = re.compile(
+    r'^(?:(\[in#\d+ @ [^\]]*\] )?Error opening input'
+    r'|.*: (?:No such file or directory'
+    r'|Invalid data found when processing input)\r?$)', re.M)
+
+
+def read_banner(commands, timeout=PROBE_TIMEOUT):
+    """
+    Run ffmpeg and read its log as it arrives, stopping the process
+    as soon as the input headers are complete or the timeout expires.
+    Returns the log read so far.
+    """
+    logger.info('Inside read_banner')
+
+    subP = subprocess.Popen(
+        commands,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        shell=False)
+
+    lines = []
+    done = threading.Event()
+
+    def _reader():
+        for raw in iter(subP.stdout.readline, b''):
+            line = raw.decode('utf-8', 'replace')
+            lines.append(line)
+            if line.startswith(BANNER_END_MARKERS):
+                break
+        done.set()
+
+    r_thread = threading.Thread(target=_reader)
+    r_thread.daemon = True
+    r_thread.start()
+
+    if not done.wait(timeout):
+        logger.warning(f'Probe timed out after {timeout}s')
+
+    # headers are all we want, no need to let it decode any further
+    if subP.poll() is None:
+        subP.kill()
+    subP.wait()
+    r_thread.join()
+    subP.stdout.close()
+    subP.stdin.close()
+
+    return ''.join(lines)
+
+
+def run_bounded(func, items, max_workers: int = 0):
+    """
+    Call func on every item on a thread pool, queueing only a few
+    items per worker so huge batches do not pile up futures.
+    Yields (item, result) in completion order, where result is the
+    exception raised by func if it failed.
+    max_workers: defaults to the number of cpus
+    """
+    if max_workers < 1:
+        max_workers = os.cpu_count() or 1
+
+    max_pending = max_workers * 2
+    items = iter(items)
+    pending = {}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while True:
+            for item in items:
+                future = executor.submit(func, item)
+                pending[future] = item
+                if len(pending) >= max_pending:
+                    break
+
+            if not pending:
+                break
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                item = pending.pop(future)
+                error = future.exception()
+                if error is None:
+                    yield item, future.result()
+                else:
+                    logger.error(f'Failed on {item}: {error}')
+                    yield item, error
+
 
 class FFprobe():
     """
@@ -25,14 +122,40 @@ class FFprobe():
     which is ffmpeg's log file
     """
 
-    def __init__(self, file_name=None):
+    # everything probe() fills in, saved to and restored from the cache
+    _PROBED_ATTRS = (
+        'fps', 'duration', 'start', 'bitrate', 'type', 'metadata',
+        'other_metadata', '_other_metadata', 'streams', 'stream_heads',
+        'raw_streams', 'album_art_stream', 'info', 'error')
+
+    def __init__(
+            self, file_name=None, probe_timeout: float = PROBE_TIMEOUT,
+            use_cache: bool = True, ffmpeg_path: Optional[str] = None):
+
+        self._setup(file_name, probe_timeout, use_cache, ffmpeg_path)
+
+        # START
+        self.probe()
+
+    @classmethod
+    def _blank(cls, file_name, probe_timeout, use_cache, ffmpeg_path=None):
+        # an instance that has not been probed yet
+        probe = cls.__new__(cls)
+        probe._setup(file_name, probe_timeout, use_cache, ffmpeg_path)
+        return probe
+
+    def _setup(self, file_name, probe_timeout, use_cache, ffmpeg_path=None):
 
+        setup_logging()
         self.logger = logging.getLogger('pyffmpeg.pseudo_ffprobe.FFprobe')
         self.logger.info('FFprobe initialised')
         self.misc = Paths()
-        self._ffmpeg = self.misc.load_ffmpeg_bin()
+        self._ffmpeg = resolve_ffmpeg(ffmpeg_path).path
         self.logger.info(f'ffmpeg bin: {self._ffmpeg}')
         self.file_name = file_name
+        self.probe_timeout = probe_timeout
+        self.use_cache = use_cache
+        self._cache_key = None
         self.overwrite = True
         if self.overwrite:
             self._over_write = '-y'
@@ -53,6 +176,12 @@ class FFprobe():
         self.stream_heads = []
         self.raw_streams = []
 
+        # index of the cover art stream, None if there is none
+        self.album_art_stream = None
+
+        # the same as typed records, with numbers as numbers
+        self.info = FormatInfo()
+
         # extracting methods
         self.video_extract_meths = {'fps': self._extract_fps}
         self.video_head_extract_meths = []
@@ -60,9 +189,6 @@ class FFprobe():
         # error reports
         self.error = ''
 
-        # START
-        self.probe()
-
     def _expose(self):
         # Expose public functions
         self.logger.info('Inside expose')
@@ -77,11 +203,11 @@ class FFprobe():
         if 'bitrate' in self.metadata[-1]:
             self.bitrate = self.metadata[-1]['bitrate']
 
-        if 'fps' in self.metadata[0][0]:
-            self.fps = self.metadata[0][0]['fps']
-
-        elif len(self.metadata[0]) > 1 and 'fps' in self.metadata[0][1]:
-            self.fps = self.metadata[0][1]['fps']
+        # of the first real video, cover art has no frame rate
+        for video in self.info.video_streams:
+            if video.frame_rate:
+                self.fps = round(float(video.frame_rate), 3)
+                break
 
     def _extract(self):
         self.logger.info('Inside extract')
@@ -102,29 +228,29 @@ class FFprobe():
             print('File corrupt or codecs not available for the file')
             return
 
-        all_streams = stdout.split('Stream mapping')[0]
-        all_streams = all_streams.split('Input')
+        inputs = parse_banner(stdout)
 
-        if len(all_streams) < 2:
+        if not inputs:
             # Error
-            all_streams = all_streams[0]
-            self.error = re.split(r'libpostproc .*?.*?.*?\n', all_streams)[-1]
+            self.error = banner_error(stdout)
             self.logger.error(self.error)
             raise Exception(self.error)
-        else:
-            del all_streams[0]
-            if len(all_streams) > 1:
-                print("Multiple input files found.\
-                     However only one will be probed")
-            all_streams = all_streams[0]
-        # individual streams
-        streams = all_streams.split('Stream')
-        self.metadata[-1] = self._parse_input_meta(streams[0])
+        elif len(inputs) > 1:
+            print("Multiple input files found.\
+                 However only one will be probed.\
+                 Use FFprobe.probe_group to probe them all")
+
+        self._use_input(inputs[0])
+
+    def _use_input(self, source):
+        # source is an InputRecord of banner.parse_banner
+        self.info = FormatInfo.from_record(source)
+        self.metadata[-1] = source.tags
 
         tags = defaultdict(list)
-        for x in range(1, len(streams)):
-            if streams[x]:
-                tags.update(self._parse_meta(streams[x]))
+        for stream in source.streams:
+            tags.update(stream.tags)
+            self._find_album_art(stream)
 
         if len(tags) > 0:
             self.metadata[0] = tags
@@ -134,62 +260,177 @@ class FFprobe():
         # then handle stream 0:0 so
         self._parse_stream_meta(self.stream_heads)
 
-    def get_album_art(self, out_file=None):
-        self.logger.info('Inside get_album_art')
-        user_file = True
-        if not out_file:
-            # randomize the filename to avoid overwrite prompt
-            out_file = str(random.randrange(1, 10000000)) + '.jpg'
-            out_file = os.path.join(self.misc.home_path, out_file)
-            user_file = False
+    def _find_album_art(self, stream):
+        # cover art is a video stream flagged as an attached picture,
+        # eg. 'Stream #0:1: Video: mjpeg ... (attached pic)'
+        if self.album_art_stream is None and '(attached pic)' in stream.header:
+            self.album_art_stream = stream.index
+
+    @classmethod
+    def from_banner(
+            cls, file_name, banner: str, use_cache: bool = True,
+            ffmpeg_path: Optional[str] = None):
+        """
+        Build the FFprobe of file_name from an ffmpeg log that has
+        already been read, eg. the log of a conversion.
+        Only the first input of the log is used.
+        ffmpeg_path: the ffmpeg that wrote the log, used by the probe
+        """
+        logger.info('Inside from_banner')
+
+        probe = cls._blank(file_name, PROBE_TIMEOUT, use_cache, ffmpeg_path)
+        if use_cache:
+            probe._cache_key = probe_cache.key(file_name)
+
+        inputs = parse_banner(banner)
+        if inputs:
+            probe._load_input(inputs[0])
         else:
-            # make directory suplied by user, read and write
-            dir_name = os.path.dirname(out_file)
-            if self.misc.os_name != 'windows':
-                os.system(f'chmod +rw {dir_name}')
-
-        commands = f'{self._ffmpeg} {self._over_write}'
-        commands += f' -i "{self.file_name}" -an'
-        commands += f' -vcodec copy "{out_file}"'
-
-        # start subprocess
-        subP = subprocess.run(commands, capture_output=True)
-        if subP.returncode == 0:
-            if user_file:
-                return True
+            # raises with the error of the log
+            probe._load_banner(banner)
+        return probe
+
+    @classmethod
+    def probe_group(
+            cls, file_names, timeout: float = PROBE_TIMEOUT,
+            use_cache: bool = True, ffmpeg_path: Optional[str] = None):
+        """
+        Probe several files with a single ffmpeg process, which saves
+        a process launch per file.
+        Returns a list of (file_name, result) in the order given,
+        where result is as in probe_many.
+        """
+        logger.info('Inside probe_group')
+
+        results = []
+        pending = []
+        for file_name in file_names:
+            probe = cls._blank(file_name, timeout, use_cache, ffmpeg_path)
+            results.append([file_name, probe])
+            if not probe._from_cache():
+                pending.append(results[-1])
+
+        while pending:
+            commands = [pending[0][1]._ffmpeg, '-y']
+            for _, probe in pending:
+                commands.extend(['-i', probe.file_name])
+            commands.extend(['-f', 'null', os.devnull])
+
+            stdout = read_banner(commands, timeout)
+
+            # ffmpeg stops at the first input it can not open
+            failed = OPEN_ERROR.search(stdout)
+            if failed:
+                error = stdout[failed.start():].strip()
+                stdout = stdout[:failed.start()]
+
+            inputs = parse_banner(stdout)
+            for entry, source in zip(pending, inputs):
+                try:
+                    entry[1]._load_input(source)
+                except Exception as err:
+                    entry[1] = err
+
+            done = len(inputs)
+            if done < len(pending):
+                if failed:
+                    msg = error
+                else:
+                    msg = f'Probe timed out after {timeout}s'
+                logger.error(msg)
+                pending[done][1] = Exception(msg)
+                done += 1
+            pending = pending[done:]
+
+        return [tuple(entry) for entry in results]
+
+    @classmethod
+    def probe_many(
+            cls, file_names, max_workers: int = 0,
+            timeout: float = PROBE_TIMEOUT, use_cache: bool = True,
+            chunk_size: int = 1, ffmpeg_path: Optional[str] = None):
+        """
+        Probe many files concurrently on a thread pool.
+        Yields (file_name, result) in completion order, where result
+        is the FFprobe of the file or the exception raised probing it,
+        so one bad file does not abort the batch.
+        max_workers: defaults to the number of cpus
+        chunk_size: files probed by each ffmpeg process, see probe_group.
+            Worth raising for many small files.
+        """
+        logger.info('Inside probe_many')
+
+        if chunk_size <= 1:
+            def _probe(file_name):
+                return cls(
+                    file_name, probe_timeout=timeout, use_cache=use_cache,
+                    ffmpeg_path=ffmpeg_path)
+
+            yield from run_bounded(_probe, file_names, max_workers)
+            return
+
+        def _probe_group(chunk):
+            return cls.probe_group(chunk, timeout, use_cache, ffmpeg_path)
+
+        names = iter(file_names)
+        chunks = iter(lambda: list(islice(names, chunk_size)), [])
+        for chunk, results in run_bounded(_probe_group, chunks, max_workers):
+            if isinstance(results, Exception):
+                for file_name in chunk:
+                    yield file_name, results
             else:
-                with open(out_file, 'rb') as out:
-                    data = out.read()
-                os.unlink(out_file)
-                return data
-
-    def _parse_meta(self, stream):
-        self.logger.info('Inside _parse_meta')
-        metadata = self._strip_meta(stream)
-        tags = self._generate_tags(metadata)
-        return tags
-
-    def _parse_header(self, line):
-        self.logger.info('Inside _parse_header')
-        parsed = []
-
-        if 'Video' in line:
-            # extract data
-            for func in VIDEO_FUNC_LIST:
-                parsed.extend(func(line))
-
-        elif 'Audio' in line:
-            # extract audio data
-            for func in AUDIO_FUNC_LIST:
-                parsed.extend(func(line))
-
-        return parsed
-
-    def _parse_input_meta(self, stream):
-        self.logger.info('Inside _parse_input_meta')
-        metadata = self._strip_input_meta(stream)
-        tags = self._generate_tags(metadata)
-        return tags
+                yield from results
+
+    def get_album_art(self, out_file=None):
+        """
+        Returns the cover art as bytes, piped straight out of ffmpeg.
+        If out_file is given the art is written there and True is
+        returned instead. Returns None when there is no cover art.
+        """
+        self.logger.info('Inside get_album_art')
+
+        # known from the probe, no need to start ffmpeg
+        if self.album_art_stream is None:
+            self.logger.info('No album art')
+            return None
+
+        commands = [
+            self._ffmpeg, '-loglevel', 'error', '-i', self.file_name,
+            '-map', f'0:{self.album_art_stream}', '-c', 'copy',
+            '-f', 'image2pipe', 'pipe:1']
+        self.logger.info(f"Issuing commads {str(commands)}")
+
+        subP = subprocess.run(
+            commands, stdin=subprocess.DEVNULL, capture_output=True)
+        if subP.returncode != 0 or not subP.stdout:
+            self.error = str(subP.stderr, 'utf-8', 'replace').strip()
+            self.logger.error(self.error)
+            return None
+
+        if out_file:
+            with open(out_file, 'wb') as out:
+                out.write(subP.stdout)
+            return True
+        return subP.stdout
+
+    @classmethod
+    def get_album_arts(
+            cls, file_names, max_workers: int = 0,
+            timeout: float = PROBE_TIMEOUT,
+            ffmpeg_path: Optional[str] = None):
+        """
+        Extract the cover art of many files concurrently.
+        Yields (file_name, result) in completion order, where result
+        is as get_album_art returns, or the exception raised
+        """
+        logger.info('Inside get_album_arts')
+
+        def _art(file_name):
+            return cls(
+                file_name, probe_timeout=timeout,
+                ffmpeg_path=ffmpeg_path).get_album_art()
+
+        yield from run_bounded(_art, file_names, max_workers)
 
     def _parse_other_meta(self):
         self.logger.info('Inside _parse_other_meta')
@@ -234,79 +475,53 @@ class FFprobe():
         self.logger.info('Inside probe')
         self.logger.info(f'Probing file: "{self.file_name}"')
 
-        # randomize the filename to avoid overwrite prompt
+        if self._from_cache():
+            return
 
-        commands = [
+        commands = self._probe_commands()
+        self.logger.info(f"Issuing commads {str(commands)}")
+
+        # stops ffmpeg once the headers are out
+        stdout = read_banner(commands, self.probe_timeout)
+
+        self._load_banner(stdout)
+
+    def _probe_commands(self):
+        return [
             self._ffmpeg, '-y', '-i',
             self.file_name, '-f',
             'null', os.devnull]
 
-        self.logger.info(f"Issuing commads {str(commands)}")
+    def _from_cache(self):
+        if not self.use_cache:
+            return False
 
-        # start subprocess
-        subP = subprocess.Popen(
-            commands,
-            stdin=subprocess.PIPE,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            text=True,
-            shell=False)
+        self._cache_key = probe_cache.key(self.file_name)
+        cached = probe_cache.get(self._cache_key)
+        if cached is None:
+            return False
 
-        # break the operation
-        sleep(0.5)
-        stdout, _ = subP.communicate(input='q')
+        self.logger.info('Probe result found in cache')
+        self.__dict__.update(cached)
+        return True
 
+    def _load_banner(self, stdout):
         self._extract_all(stdout)
+        self._loaded()
 
+    def _load_input(self, source):
+        self._use_input(source)
+        self._loaded()
+
+    def _loaded(self):
         # Expose publicly know var
         self._expose()
 
-    def _strip_meta(self, stdout):
-        self.logger.info('Inside _strip_meta')
-        std = stdout.splitlines()
-
-        # store in stream header
-        header = self._parse_header(std[0])
-        std.pop(0)
+        if self.use_cache:
+            probe_cache.put(self._cache_key, self._snapshot())
 
-        meta = []
-        for line in std:
-            items = line.split(': ')
-            if len(items) > 1 and items[1]:
-                meta.append(line)
-
-        return header + meta
-
-    def _strip_input_meta(self, stdout):
-        self.logger.info('Inside _strip_input_meta')
-        # replace commas with '\r\n'
-        stdout = stdout.replace(', ', '\r\n')
-        std = stdout.splitlines()
-
-        meta = []
-        for line in std:
-            items = line.split(': ')
-            if len(items) > 1 and items[1]:
-                meta.append(line)
-
-        return meta
+    def _snapshot(self):
+        return {attr: getattr(self, attr) for attr in self._PROBED_ATTRS}
 
     def _generate_tags(self, metadata):
-        prev_key = ''
-        tags = defaultdict(list)
-
-        for x in range(len(metadata)):
-            line = metadata[x]
-            data = line.split(":", 1)
-            key = data[0].strip() 
-            value = data[1].strip()
-            # this might be a continuation, if not we add it to orphaned key list
-            if key == '':
-                if prev_key == '':
-                    tags['unpaired_values'].append(value)
-                else:
-                    tags[prev_key].append("\\r\\n" + data[1].strip())
-            else:
-                tags[key] = value
-                prev_key = key
-        return tags
\ No newline at end of file
+        return generate_tags(metadata)
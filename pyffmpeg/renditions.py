@@ -0,0 +1,367 @@
+"""
+To encode many renditions of one input, eg. the ladder of an
+adaptive stream, on a single ffmpeg process: the input is decoded
+once, split and scaled into a branch per rendition, and every
+rendition encoded side by side
+
+    ladder = [
+        Rendition('1080.mp4', height=1080, video_bitrate='5M'),
+        Rendition('720.mp4', height=720, video_bitrate='3M'),
+        Rendition('360.mp4', height=360, video_bitrate='800k'),
+    ]
+    convert_renditions('film.mkv', ladder, directory='out')
+"""
+
+import os
+import re
+import threading
+import logging
+from subprocess import Popen, PIPE
+from typing import Callable, Dict, List, Optional
+
+from .command import Command, literal, literals
+from .misc import ConvertResult, ffmpeg_bin
+from .progress import PROGRESS_OPTIONS, ProgressInfo, read_progress
+from .pseudo_ffprobe import FFprobe
+
+
+logger = logging.getLogger('pyffmpeg.renditions')
+
+# log lines of one output, eg. '[out#1/mp4 @ 0x5f..] Error opening ...'
+# or '[vost#1:0/libx264 @ 0x5f..] Error while opening encoder'
+_OUTPUT_LINE = re.compile(r'^\[(?:out#(\d+)|[vas]ost#(\d+):\d+)[^\]]*\]\s*(.*)$')
+
+
+class Rendition():
+    """
+    One output of a fan out
+    output_file: relative to the directory of the fan out
+    width, height: size of the video, the other one is worked out
+        from the aspect ratio when only one is given. The size of
+        the input when neither is.
+    video_codec: None for no video, 'copy' keeps the input's video
+    audio_codec: None for no audio
+    container: format of the output, eg. 'mp4', from output_file's
+        extension when None
+    options: more output options, eg. ['-preset', 'fast']
+    """
+
+    __slots__ = (
+        'output_file', 'width', 'height', 'video_bitrate', 'video_codec',
+        'audio_bitrate', 'audio_codec', 'container', 'options')
+
+    def __init__(
+            self, output_file: str, width: Optional[int] = None,
+            height: Optional[int] = None, video_bitrate=None,
+            video_codec: Optional[str] = 'libx264', audio_bitrate=None,
+            audio_codec: Optional[str] = 'aac',
+            container: Optional[str] = None, options=()):
+
+        self.output_file = output_file
+        self.width = width
+        self.height = height
+        self.video_bitrate = video_bitrate
+        self.video_codec = video_codec
+        self.audio_bitrate = audio_bitrate
+        self.audio_codec = audio_codec
+        self.container = container
+        self.options = list(options)
+
+        if video_codec == 'copy' and self.scale() is not None:
+            raise ValueError(f'{output_file}: a copied video cannot be scaled')
+
+    def __repr__(self):
+        return (
+            f'Rendition({self.output_file!r}, width={self.width}, '
+            f'height={self.height}, video_bitrate={self.video_bitrate})')
+
+    def scale(self) -> Optional[str]:
+        """
+        The scale filter of the rendition, None when it keeps the size
+        """
+        if self.width is None and self.height is None:
+            return None
+        # -2 keeps the aspect ratio with an even size, as encoders need
+        width = -2 if self.width is None else self.width
+        height = -2 if self.height is None else self.height
+        return f'scale={width}:{height}'
+
+    @property
+    def encodes_video(self) -> bool:
+        # needs a branch of the filtergraph
+        return self.video_codec not in (None, 'copy')
+
+    def output_options(self, video: Optional[str]) -> list:
+        """
+        The options of the output, mapping video from video, a
+        filtergraph label or an input stream
+        """
+        options = []
+        if self.video_codec is None or video is None:
+            options.append('-vn')
+        else:
+            options.extend(['-map', video, '-c:v', self.video_codec])
+            if self.video_bitrate is not None:
+                options.extend(['-b:v', str(self.video_bitrate)])
+
+        if self.audio_codec is None:
+            options.append('-an')
+        else:
+            # no error for inputs without audio
+            options.extend(['-map', '0:a:0?', '-c:a', self.audio_codec])
+            if self.audio_bitrate is not None:
+                options.extend(['-b:a', str(self.audio_bitrate)])
+
+        if self.container:
+            options.extend(['-f', self.container])
+        options.extend(self.options)
+        return options
+
+
+class OutputProgress():
+    """
+    Progress of one output of a fan out. Its renditions are fed by
+    the same decode so they move on together, size and quality are
+    each output's own.
+    """
+
+    __slots__ = (
+        'index', 'output_file', 'out_time', 'size', 'quality', 'percent',
+        'eta', 'done')
+
+    def __init__(self, index: int, output_file: str, info: ProgressInfo):
+
+        self.index = index
+        self.output_file = output_file
+        self.out_time = info.out_time
+        self.percent = info.percent
+        self.eta = info.eta
+        self.done = info.done
+
+        # bytes written so far, the muxer may still hold some
+        try:
+            self.size = os.path.getsize(output_file)
+        except OSError:
+            self.size = 0
+
+        # quantizer of its video, as ffmpeg reports it
+        quality = info.raw.get(f'stream_{index}_0_q')
+        try:
+            self.quality = float(quality)
+        except (TypeError, ValueError):
+            self.quality = None
+
+    def __repr__(self):
+        return (
+            f'OutputProgress({self.index}, {self.output_file!r}, '
+            f'size={self.size}, percent={self.percent:.1f})')
+
+
+class FanOut():
+    """
+    Encodes the renditions of input_file on one ffmpeg process.
+    onOutputProgress is called with an OutputProgress for every
+    output at every report, onProgressInfo with the ProgressInfo of
+    the whole process.
+    errors holds, after a failed run, what went wrong for each output
+    by index in renditions, the output that failed first first.
+    """
+
+    def __init__(
+            self, input_file: str, renditions: List[Rendition],
+            directory: str = '.', ffmpeg_path: Optional[str] = None):
+
+        self.logger = logging.getLogger('pyffmpeg.renditions.FanOut')
+        if not renditions:
+            raise ValueError('No renditions to encode')
+
+        self.input_file = input_file
+        self.renditions = list(renditions)
+        self.directory = directory
+        self.ffmpeg_path = ffmpeg_path
+        self.overwrite = True
+
+        self.onOutputProgress: Callable = self.progressMock
+        self.onProgressInfo: Callable = self.progressMock
+        self.progress: List[Optional[OutputProgress]] = [None] * len(renditions)
+        self.errors: Dict[int, str] = {}
+        self.probe = None
+        self._process = None
+
+    def progressMock(self, progress):
+        pass
+
+    @property
+    def output_files(self) -> List[str]:
+        out = []
+        for rendition in self.renditions:
+            if os.path.isabs(rendition.output_file):
+                out.append(rendition.output_file)
+            else:
+                out.append(
+                    os.path.join(self.directory, rendition.output_file))
+        return out
+
+    def command(self, has_video: bool = True) -> Command:
+        """
+        The command encoding every rendition, with one -filter_complex
+        splitting the first video stream of the input in a scaled
+        branch per rendition that encodes video
+        """
+        command = Command(['-hide_banner']).input(literal(self.input_file))
+
+        encoding = [
+            x for x, rendition in enumerate(self.renditions)
+            if rendition.encodes_video]
+        # where the video of each rendition comes from
+        sources = {}
+        if has_video:
+            sources = {
+                x: '0:v:0' for x, rendition in enumerate(self.renditions)
+                if rendition.video_codec == 'copy'}
+
+        graph = []
+        if has_video and len(encoding) > 1:
+            graph.append('[0:v:0]split={}{}'.format(
+                len(encoding), ''.join(f'[s{x}]' for x in encoding)))
+        for x in encoding if has_video else ():
+            scale = self.renditions[x].scale()
+            branch = f'[s{x}]' if len(encoding) > 1 else '[0:v:0]'
+            if scale is None:
+                sources[x] = branch if len(encoding) > 1 else '0:v:0'
+                continue
+            graph.append(f'{branch}{scale}[v{x}]')
+            sources[x] = f'[v{x}]'
+
+        if graph:
+            command = command.filter(';'.join(graph))
+        for x, (rendition, out) in enumerate(
+                zip(self.renditions, self.output_files)):
+            command = command.output(literal(out), *literals(
+                rendition.output_options(sources.get(x))))
+        return command
+
+    def run(self) -> List[ConvertResult]:
+        """
+        Encodes every rendition and returns their output files.
+        Raises an Exception naming the outputs that failed, see errors.
+        """
+        self.logger.info('Inside run')
+
+        probe = FFprobe(self.input_file, ffmpeg_path=self.ffmpeg_path)
+        has_video = any(not x.attached_pic for x in probe.info.video_streams)
+        if not has_video:
+            scaled = [
+                x.output_file for x in self.renditions
+                if x.scale() is not None]
+            if scaled:
+                raise ValueError(
+                    f'{self.input_file} has no video to scale for '
+                    f'{", ".join(scaled)}')
+
+        for out in self.output_files:
+            out_path = os.path.dirname(out)
+            if out_path and not os.path.exists(out_path):
+                os.makedirs(out_path)
+
+        options = [ffmpeg_bin(ffmpeg_path=self.ffmpeg_path)]
+        options.extend(PROGRESS_OPTIONS)
+        options.extend(['-loglevel', 'error', '-y' if self.overwrite else '-n'])
+        options.extend(self.command(has_video).argv())
+        self.logger.info(f'Options is: {options}')
+
+        self.progress = [None] * len(self.renditions)
+        self.errors = {}
+        self._process = process = Popen(
+            options, stdin=PIPE, stdout=PIPE, stderr=PIPE)
+        monitor = threading.Thread(
+            target=self._monitor, args=[process, probe.info.duration or 0.0])
+        monitor.daemon = True
+        monitor.start()
+
+        log = self._read_errors(process)
+        process.wait()
+        monitor.join()
+        process.stdout.close()
+
+        if process.returncode != 0:
+            self._fail(log)
+
+        results = []
+        for out in self.output_files:
+            result = ConvertResult(out)
+            result.probe = probe
+            results.append(result)
+        self.logger.info('Renditions Done')
+        return results
+
+    def quit(self):
+        """
+        Stops the running process, as FFmpeg.quit does
+        """
+        if self._process is not None and self._process.poll() is None:
+            self._process.communicate(b'q')
+
+    def _monitor(self, process: Popen, duration: float):
+        files = self.output_files
+        for block in read_progress(process.stdout):
+            info = ProgressInfo(block, duration)
+            self.onProgressInfo(info)
+            for x, out in enumerate(files):
+                progress = OutputProgress(x, out, info)
+                self.progress[x] = progress
+                self.onOutputProgress(progress)
+
+    def _read_errors(self, process: Popen) -> List[str]:
+        # every line, keeping the first error of each output, after
+        # the line of its encoder or muxer just before it, eg.
+        # '[libx264 @ 0x5f..] width not divisible by 2 (215x121)'
+        lines = []
+        detail = None
+        for raw in process.stderr:
+            line = str(raw, 'utf-8', 'replace').strip()
+            if not line:
+                continue
+            lines.append(line)
+            found = _OUTPUT_LINE.match(line)
+            if not found:
+                detail = line.partition('] ')[2] if (
+                    line.startswith('[')) else None
+                continue
+
+            index = int(found.group(1) or found.group(2))
+            if index < len(self.renditions) and index not in self.errors:
+                error = found.group(3)
+                if detail:
+                    error = f'{detail}: {error}'
+                self.errors[index] = error
+            detail = None
+        return lines
+
+    def _fail(self, log: List[str]):
+        # outputs with no error of their own were stopped by the others
+        reason = log[-1] if log else 'ffmpeg failed'
+        if not self.errors:
+            for x in range(len(self.renditions)):
+                self.errors[x] = reason
+
+        # in the order they failed in, the first is the cause
+        message = '\n'.join(
+            f'{self.renditions[x].output_file}: {error}'
+            for x, error in self.errors.items())
+        self.logger.error(message)
+        raise Exception(message)
+
+
+def convert_renditions(
+        input_file: str, renditions: List[Rendition], directory: str = '.',
+        ffmpeg_path: Optional[str] = None,
+        on_progress: Optional[Callable] = None) -> List[ConvertResult]:
+    """
+    Encodes every rendition of input_file on one ffmpeg process, see
+    FanOut. on_progress is called with an OutputProgress per output.
+    """
+    fan_out = FanOut(input_file, renditions, directory, ffmpeg_path)
+    if on_progress is not None:
+        fan_out.onOutputProgress = on_progress
+    return fan_out.run()
@@ -0,0 +1,253 @@
+"""
+To transcode long inputs on every core, cutting them at keyframes
+into segments converted in parallel and stitched back without loss
+"""
+
+import os
+import shutil
+import logging
+import tempfile
+from functools import partial
+from subprocess import Popen, PIPE, DEVNULL
+from typing import List, Optional
+
+from . import FFmpeg
+from .misc import ConvertResult, ffmpeg_bin
+from .pipes import start_drain
+from .pool import FFmpegPool
+from .pseudo_ffprobe import FFprobe
+
+
+logger = logging.getLogger('pyffmpeg.segments')
+
+# shorter segments cost more in process start up than they gain
+MIN_SEGMENT = 10.0
+# the stitched output may differ from the input by this many frames
+FRAME_TOLERANCE = 2
+
+
+def keyframes(file_name: str, ffmpeg_path: Optional[str] = None) -> List[float]:
+    """
+    Times in seconds, from the start of file_name, of the keyframes of
+    its first video stream. Only packets are read, nothing is decoded.
+    """
+    logger.info('Inside keyframes')
+
+    commands = [
+        ffmpeg_bin(ffmpeg_path=ffmpeg_path), '-hide_banner',
+        '-loglevel', 'error', '-copyts', '-i', file_name, '-map', '0:v:0',
+        '-c', 'copy', '-f', 'framecrc', '-']
+    process = Popen(commands, stdin=DEVNULL, stdout=PIPE, stderr=PIPE)
+    drain, log_tail = start_drain(process.stderr)
+
+    times = []
+    time_base = None
+    for raw in process.stdout:
+        line = raw.decode('ascii', 'replace')
+        if line.startswith('#tb 0:'):
+            num, _, den = line[6:].strip().partition('/')
+            time_base = (int(num), int(den))
+            continue
+        if line.startswith('#') or time_base is None:
+            continue
+
+        # stream, dts, pts, duration, size, crc and, when they are
+        # not just the keyframe flag, the flags
+        fields = line.split(',')
+        if len(fields) > 6 and not int(fields[6].split('=')[1], 16) & 1:
+            continue
+        pts = fields[2].strip()
+        if pts.lstrip('-').isdigit():
+            times.append(int(pts) * time_base[0] / time_base[1])
+
+    process.wait()
+    drain.join()
+    process.stdout.close()
+    if process.returncode != 0:
+        raise Exception(''.join(log_tail).strip())
+
+    start = FFprobe(file_name, ffmpeg_path=ffmpeg_path).info.start
+    return sorted(round(x - start, 6) for x in times)
+
+
+def cut_points(
+        duration: float, key_times: List[float], segments: int) -> List[float]:
+    """
+    The keyframes nearest to splitting duration in segments equal
+    parts, without the start and the end
+    """
+    cuts = []
+    for part in range(1, segments):
+        target = duration * part / segments
+        nearest = min(key_times, key=lambda x: abs(x - target), default=None)
+        if nearest is None or nearest <= 0 or nearest >= duration:
+            continue
+        if not cuts or nearest > cuts[-1]:
+            cuts.append(nearest)
+    return cuts
+
+
+def segmented_convert(
+        input_file: str, output_file: str, segments: int = 0,
+        output_options: Optional[List[str]] = None,
+        audio_options: Optional[List[str]] = None,
+        max_jobs: int = 0, directory: str = '.',
+        ffmpeg_path: Optional[str] = None,
+        min_segment: float = MIN_SEGMENT,
+        keep_segments: bool = False, coordinator=None) -> ConvertResult:
+    """
+    Converts input_file to output_file like FFmpeg.convert, with its
+    video cut at keyframes into segments transcoded at once on their
+    own ffmpeg processes, while its audio is converted whole on another.
+    They are then joined with the concat demuxer, with no re-encoding,
+    and the result checked to last as long as the input.
+    segments: defaults to the number of cpus, fewer when a segment
+        would be shorter than min_segment seconds
+    output_options: options of every video segment, eg.
+        ['-c:v', 'libx264', '-crf', '23']
+    audio_options: options of the audio, eg. ['-c:a', 'aac']
+    max_jobs: ffmpeg processes at once, defaults to one per segment
+        and the audio, up to the number of cpus
+    coordinator: a worker.Coordinator to run the segments on its
+        workers instead, which must see the files at the same paths
+    Inputs without video, or too short to split, are converted in one
+    go. Only the first video and the audio streams are kept.
+    """
+    logger.info('Inside segmented_convert')
+
+    if not os.path.isabs(output_file):
+        output_file = os.path.join(directory, output_file)
+    # tasks may run on other machines, in other working directories
+    output_file = os.path.abspath(output_file)
+    source = input_file
+    if os.path.exists(input_file):
+        source = os.path.abspath(input_file)
+    out_path = os.path.dirname(output_file)
+    if out_path and not os.path.exists(out_path):
+        os.makedirs(out_path)
+
+    probe = FFprobe(input_file, use_cache=False, ffmpeg_path=ffmpeg_path)
+    info = probe.info
+    video = next(
+        (x for x in info.video_streams if not x.attached_pic), None)
+
+    cpus = os.cpu_count() or 1
+    segments = segments or cpus
+    if info.duration:
+        segments = min(segments, int(info.duration // min_segment) or 1)
+    cuts = []
+    if video is not None and info.duration and segments > 1:
+        cuts = cut_points(
+            info.duration, keyframes(input_file, ffmpeg_path), segments)
+
+    if not cuts:
+        logger.info('Converting in one go')
+        ff = FFmpeg(directory, enable_log=False, ffmpeg_path=ffmpeg_path)
+        ff.loglevel = 'info'
+        return ff.convert(
+            input_file, output_file, output_options=(
+                output_options or []) + (audio_options or []))
+
+    bounds = list(zip([None] + cuts, cuts + [None]))
+    logger.info(f'{len(bounds)} segments cut at {cuts}')
+
+    _, ext = os.path.splitext(output_file)
+    work = tempfile.mkdtemp(
+        prefix='.segments-', dir=os.path.dirname(output_file))
+    seg_files = [
+        os.path.join(work, f'{x:05d}{ext}') for x in range(len(bounds))]
+    audio_file = os.path.join(work, f'audio{ext}') if (
+        info.audio_streams) else None
+
+    tasks = [
+        {'input_file': source, 'output_file': seg_file, 'start': start,
+         'end': end, 'output_options': ['-map', '0:v:0', '-an', '-sn'] + (
+             output_options or [])}
+        for seg_file, (start, end) in zip(seg_files, bounds)]
+    if audio_file:
+        tasks.insert(0, {
+            'input_file': source, 'output_file': audio_file,
+            'output_options': ['-vn', '-sn'] + (audio_options or [])})
+
+    try:
+        if coordinator is not None:
+            futures = [coordinator.submit(x) for x in tasks]
+            for future in futures:
+                future.result()
+        else:
+            pool = FFmpegPool(
+                max_jobs=max_jobs or min(len(tasks), cpus),
+                directory=directory, enable_log=False,
+                ffmpeg_path=ffmpeg_path)
+            with pool:
+                futures = [
+                    pool.submit(partial(convert_task, task=x)) for x in tasks]
+                for future in futures:
+                    future.result()
+
+        _check_segments(seg_files, bounds, info.duration, video, ffmpeg_path)
+        _concat(seg_files, audio_file, output_file, work, ffmpeg_path)
+        _check_duration(output_file, info.duration, video, ffmpeg_path)
+    finally:
+        if not keep_segments:
+            shutil.rmtree(work, ignore_errors=True)
+
+    result = ConvertResult(output_file)
+    result.probe = probe
+    return result
+
+
+def convert_task(ff, task: dict) -> str:
+    """
+    Runs one piece of a segmented conversion, a dict of the arguments
+    of FFmpeg.convert, on ff. Workers run it too, see worker.py.
+    """
+    # convert checks the log for the output, it needs info
+    ff.loglevel = 'info'
+    return str(ff.convert(
+        task['input_file'], task['output_file'], start=task.get('start'),
+        end=task.get('end'), output_options=task.get('output_options')))
+
+
+def _tolerance(video) -> float:
+    frame = 1 / float(video.frame_rate) if video.frame_rate else 0.1
+    return FRAME_TOLERANCE * frame + 0.01
+
+
+def _check_segments(seg_files, bounds, duration, video, ffmpeg_path):
+    tolerance = _tolerance(video)
+    for seg_file, (start, end) in zip(seg_files, bounds):
+        expected = (end if end is not None else duration) - (start or 0)
+        found = FFprobe(
+            seg_file, use_cache=False, ffmpeg_path=ffmpeg_path).info.duration
+        if found is None or abs(found - expected) > tolerance:
+            raise Exception(
+                f'Segment {seg_file} lasts {found}s instead of {expected}s')
+
+
+def _concat(seg_files, audio_file, output_file, work, ffmpeg_path):
+    list_file = os.path.join(work, 'segments.txt')
+    with open(list_file, 'w', encoding='utf-8') as listing:
+        for seg_file in seg_files:
+            quoted = seg_file.replace("'", "'\\''")
+            listing.write(f"file '{quoted}'\n")
+
+    commands = [
+        ffmpeg_bin(ffmpeg_path=ffmpeg_path), '-loglevel', 'error', '-y',
+        '-f', 'concat', '-safe', '0', '-i', list_file]
+    if audio_file:
+        commands.extend(['-i', audio_file, '-map', '0:v', '-map', '1:a'])
+    commands.extend(['-c', 'copy', output_file])
+
+    process = Popen(commands, stdin=DEVNULL, stdout=DEVNULL, stderr=PIPE)
+    _, stderr = process.communicate()
+    if process.returncode != 0:
+        raise Exception(stderr.decode('utf-8', 'replace').strip())
+
+
+def _check_duration(output_file, duration, video, ffmpeg_path):
+    found = FFprobe(
+        output_file, use_cache=False, ffmpeg_path=ffmpeg_path).info.duration
+    if found is None or abs(found - duration) > _tolerance(video):
+        raise Exception(
+            f'{output_file} lasts {found}s, its input {duration}s')
@@ -0,0 +1,534 @@
+"""
+To spread segment tasks over workers on other machines, or other
+processes of this one. A Coordinator hands tasks out over a socket,
+a Worker runs them with FFmpeg, as segments.convert_task does locally.
+
+Run a worker with:
+
+    python -m pyffmpeg.worker HOST:PORT
+    python -m pyffmpeg.worker unix:/path/to/socket
+
+Messages are json, one per line. A worker says hello with the
+coordinator's token, then a heartbeat every few seconds, and done or
+failed for each task. Workers started elsewhere get the token from
+--token or the PYFFMPEG_WORKER_TOKEN environment variable.
+A worker silent for too long is dropped and its task handed to
+another one. Each attempt at a task writes its own file, renamed to
+the task's output_file when it is done, as a worker thought lost may
+still be writing.
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import socket
+import secrets
+import argparse
+import itertools
+import threading
+import logging
+from collections import deque
+from concurrent.futures import Future
+from subprocess import Popen
+from typing import Optional
+
+
+logger = logging.getLogger('pyffmpeg.worker')
+
+# seconds between heartbeats
+HEARTBEAT = 2.0
+# heartbeats a worker may miss before its task is given to another
+MISSED_HEARTBEATS = 3
+# times a task is handed out before it fails
+MAX_ATTEMPTS = 3
+# seconds tasks wait with no worker connected before they fail
+WORKER_TIMEOUT = 60.0
+# the token workers must say hello with
+TOKEN_ENV = 'PYFFMPEG_WORKER_TOKEN'
+
+
+# transports: scheme -> (listen, connect), for addresses 'scheme:rest'.
+# 'host:port' is tcp
+
+def _tcp_split(rest):
+    host, _, port = rest.rpartition(':')
+    return host or '127.0.0.1', int(port)
+
+
+def _tcp_listen(rest):
+    server = socket.create_server(_tcp_split(rest))
+    host, port = server.getsockname()[:2]
+    return server, f'tcp:{host}:{port}'
+
+
+def _tcp_connect(rest):
+    return socket.create_connection(_tcp_split(rest))
+
+
+def _unix_listen(rest):
+    if os.path.exists(rest):
+        os.remove(rest)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(rest)
+    server.listen()
+    return server, f'unix:{rest}'
+
+
+def _unix_connect(rest):
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.connect(rest)
+    return sock
+
+
+TRANSPORTS = {
+    'tcp': (_tcp_listen, _tcp_connect),
+    'unix': (_unix_listen, _unix_connect),
+}
+
+
+def _transport(address: str):
+    scheme, _, rest = address.partition(':')
+    if scheme in TRANSPORTS:
+        return TRANSPORTS[scheme], rest
+    return TRANSPORTS['tcp'], address
+
+
+def listen(address: str):
+    """
+    Returns the listening socket and its address, with the port
+    filled in when address asked for port 0
+    """
+    (listen_func, _), rest = _transport(address)
+    return listen_func(rest)
+
+
+def connect(address: str) -> socket.socket:
+    (_, connect_func), rest = _transport(address)
+    return connect_func(rest)
+
+
+class _Channel():
+    """
+    json messages, one per line, over a socket
+    """
+
+    __slots__ = ('sock', 'reader', '_lock')
+
+    def __init__(self, sock: socket.socket):
+
+        self.sock = sock
+        self.reader = sock.makefile('rb')
+        self._lock = threading.Lock()
+
+    def send(self, **message):
+        data = json.dumps(message).encode() + b'\n'
+        with self._lock:
+            self.sock.sendall(data)
+
+    def __iter__(self):
+        for line in self.reader:
+            yield json.loads(line)
+
+    def close(self):
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.reader.close()
+        self.sock.close()
+
+
+class _Peer():
+    # a worker, as the coordinator sees it
+
+    __slots__ = ('name', 'channel', 'task', 'last_seen')
+
+    def __init__(self, name: str, channel: _Channel):
+
+        self.name = name
+        self.channel = channel
+        self.task = None
+        self.last_seen = time.monotonic()
+
+
+class Coordinator():
+    """
+    Hands tasks, dicts of the arguments of segments.convert_task, to
+    the workers connected to address, one at a time each.
+    submit() returns a concurrent.futures.Future of the output file.
+
+        with Coordinator('0.0.0.0:7070') as coordinator:
+            segmented_convert(film, out, coordinator=coordinator)
+
+    spawn_local() starts workers on this machine.
+    Tasks fail when no worker has been connected for worker_timeout
+    seconds.
+    token: what workers must say hello with, from PYFFMPEG_WORKER_TOKEN
+        or a random one when None
+    """
+
+    def __init__(
+            self, address: str = '127.0.0.1:0',
+            heartbeat: float = HEARTBEAT, max_attempts: int = MAX_ATTEMPTS,
+            worker_timeout: float = WORKER_TIMEOUT,
+            token: Optional[str] = None):
+
+        self.logger = logging.getLogger('pyffmpeg.worker.Coordinator')
+        self.token = token or os.environ.get(TOKEN_ENV) or (
+            secrets.token_hex(16))
+        self.heartbeat = heartbeat
+        self.max_attempts = max_attempts
+        self.worker_timeout = worker_timeout
+        self._server, self.address = listen(address)
+        self.logger.info(f'Listening on {self.address}')
+
+        self._lock = threading.Lock()
+        self._ids = itertools.count()
+        self._pending = deque()
+        # task id -> [task, future, attempts]
+        self._tasks = {}
+        self._peers = {}
+        self._closed = False
+        self._local = []
+        # when the last worker left, or the coordinator started
+        self._idle_since = time.monotonic()
+
+        for target in (self._accept, self._monitor):
+            thread = threading.Thread(target=target)
+            thread.daemon = True
+            thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def submit(self, task: dict) -> Future:
+        future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError('cannot submit to a closed coordinator')
+            task_id = next(self._ids)
+            self._tasks[task_id] = [task, future, 0]
+            self._pending.append(task_id)
+        self._dispatch()
+        return future
+
+    @property
+    def workers(self) -> int:
+        with self._lock:
+            return len(self._peers)
+
+    def spawn_local(
+            self, count: int = 1, processes: bool = False,
+            ffmpeg_path: Optional[str] = None):
+        """
+        Start count workers on this machine, as threads of this
+        process or as processes running python -m pyffmpeg.worker
+        """
+        for _ in range(count):
+            if processes:
+                command = [sys.executable, '-m', 'pyffmpeg.worker']
+                if ffmpeg_path:
+                    command.extend(['--ffmpeg', ffmpeg_path])
+                command.extend(['--heartbeat', str(self.heartbeat)])
+                # not on the command line, where ps shows it
+                env = dict(os.environ, **{TOKEN_ENV: self.token})
+                self._local.append(Popen(command + [self.address], env=env))
+            else:
+                worker = Worker(
+                    self.address, heartbeat=self.heartbeat,
+                    ffmpeg_path=ffmpeg_path, token=self.token)
+                thread = threading.Thread(target=worker.run)
+                thread.daemon = True
+                thread.start()
+                self._local.append(worker)
+
+    def close(self):
+        """
+        Stop the workers and cancel the tasks not done yet
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            peers = list(self._peers.values())
+            self._peers.clear()
+            tasks = list(self._tasks.values())
+            self._tasks.clear()
+            self._pending.clear()
+
+        for peer in peers:
+            try:
+                peer.channel.send(type='stop')
+            except OSError:
+                pass
+            peer.channel.close()
+        for _, future, _ in tasks:
+            future.cancel()
+        try:
+            # wakes up _accept
+            self._server.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self._server.close()
+        if self.address.startswith('unix:'):
+            os.remove(self.address[5:])
+
+        for local in self._local:
+            if isinstance(local, Popen):
+                local.wait()
+            else:
+                local.stop()
+
+    def _accept(self):
+        while True:
+            try:
+                sock, _ = self._server.accept()
+            except OSError:
+                # closed
+                return
+            thread = threading.Thread(target=self._serve, args=[sock])
+            thread.daemon = True
+            thread.start()
+
+    def _serve(self, sock):
+        channel = _Channel(sock)
+        peer = None
+        try:
+            for message in channel:
+                kind = message.get('type')
+                if kind == 'hello' and peer is None:
+                    if not secrets.compare_digest(
+                            str(message.get('token')), self.token):
+                        self.logger.error('Worker with a wrong token refused')
+                        break
+                    peer = _Peer(str(message['worker']), channel)
+                    with self._lock:
+                        replaced = self._peers.get(peer.name)
+                        self._peers[peer.name] = peer
+                    self.logger.info(f'Worker {peer.name} joined')
+                    if replaced is not None:
+                        # same name, its task goes back in the queue
+                        self._lost(replaced)
+                    self._dispatch()
+                    continue
+                if peer is None:
+                    break
+
+                peer.last_seen = time.monotonic()
+                if kind in ('done', 'failed'):
+                    self._finished(peer, message)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            self.logger.error(f'Lost worker: {e!r}')
+
+        if peer is not None:
+            self._lost(peer)
+        else:
+            channel.close()
+
+    def _finished(self, peer, message):
+        with self._lock:
+            task_id = message['task']
+            if peer.task != task_id or task_id not in self._tasks:
+                # given to another worker since
+                return
+            peer.task = None
+            task, future, attempts = self._tasks.pop(task_id)
+
+        if message['type'] == 'done':
+            output = message.get('output')
+            if task.get('output_file'):
+                # the file of this attempt, not a path the worker sends
+                attempt = _attempt(task, task_id, attempts)
+                try:
+                    os.replace(attempt['output_file'], task['output_file'])
+                except OSError as e:
+                    future.set_exception(e)
+                    self._dispatch()
+                    return
+                output = task['output_file']
+            future.set_result(output)
+        else:
+            self.logger.error(f'Task {task_id} failed: {message["error"]}')
+            future.set_exception(Exception(message['error']))
+        self._dispatch()
+
+    def _lost(self, peer):
+        with self._lock:
+            # or replaced by a worker of the same name, which keeps it
+            if self._peers.get(peer.name) is peer:
+                del self._peers[peer.name]
+                if not self._peers:
+                    self._idle_since = time.monotonic()
+            task_id, peer.task = peer.task, None
+            failed = None
+            if task_id in self._tasks:
+                entry = self._tasks[task_id]
+                if entry[2] >= self.max_attempts:
+                    failed = self._tasks.pop(task_id)[1]
+                else:
+                    self._pending.appendleft(task_id)
+
+        self.logger.info(f'Worker {peer.name} left')
+        peer.channel.close()
+        if failed is not None:
+            failed.set_exception(Exception(
+                f'Task {task_id} lost {self.max_attempts} times'))
+        self._dispatch()
+
+    def _dispatch(self):
+        # send pending tasks to idle workers
+        sent = []
+        with self._lock:
+            for peer in self._peers.values():
+                if not self._pending:
+                    break
+                if peer.task is not None:
+                    continue
+                task_id = self._pending.popleft()
+                entry = self._tasks[task_id]
+                entry[2] += 1
+                peer.task = task_id
+                sent.append(
+                    (peer, task_id, _attempt(entry[0], task_id, entry[2])))
+
+        for peer, task_id, task in sent:
+            try:
+                peer.channel.send(type='task', task=task_id, args=task)
+            except OSError:
+                self._lost(peer)
+
+    def _monitor(self):
+        timeout = self.heartbeat * MISSED_HEARTBEATS
+        while not self._closed:
+            time.sleep(self.heartbeat / 2)
+            now = time.monotonic()
+            with self._lock:
+                silent = [
+                    x for x in self._peers.values()
+                    if now - x.last_seen > timeout]
+            for peer in silent:
+                self.logger.error(f'Worker {peer.name} missed its heartbeats')
+                self._lost(peer)
+            self._check_idle(now)
+
+    def _check_idle(self, now):
+        # fail the tasks nobody is there to run
+        with self._lock:
+            if self._peers or not self._pending or (
+                    now - self._idle_since < self.worker_timeout):
+                return
+            futures = [self._tasks.pop(x)[1] for x in self._pending]
+            self._pending.clear()
+
+        msg = f'No worker connected for {self.worker_timeout}s'
+        self.logger.error(msg)
+        for future in futures:
+            future.set_exception(Exception(msg))
+
+
+def _attempt(task: dict, task_id: int, attempt: int) -> dict:
+    # the task with an output_file of its own for this attempt, eg.
+    # 00001.mp4 -> 00001.3-2.mp4, keeping the extension for ffmpeg
+    if not task.get('output_file'):
+        return task
+    stem, ext = os.path.splitext(task['output_file'])
+    return dict(task, output_file=f'{stem}.{task_id}-{attempt}{ext}')
+
+
+class Worker():
+    """
+    Connects to a Coordinator at address and runs its tasks, one at a
+    time, with segments.convert_task on a new FFmpeg each.
+    token is the coordinator's, from PYFFMPEG_WORKER_TOKEN when None
+    """
+
+    def __init__(
+            self, address: str, heartbeat: float = HEARTBEAT,
+            ffmpeg_path: Optional[str] = None, name: Optional[str] = None,
+            token: Optional[str] = None):
+
+        self.logger = logging.getLogger('pyffmpeg.worker.Worker')
+        self.address = address
+        self.token = token or os.environ.get(TOKEN_ENV)
+        self.heartbeat = heartbeat
+        self.ffmpeg_path = ffmpeg_path
+        self.name = name or f'{socket.gethostname()}-{uuid.uuid4().hex[:8]}'
+        self._stopped = threading.Event()
+        self._channel = None
+
+    def run(self):
+        """
+        Serve until the coordinator stops or goes away
+        """
+        from .segments import convert_task
+        from . import FFmpeg
+
+        self._channel = channel = _Channel(connect(self.address))
+        channel.send(type='hello', worker=self.name, token=self.token)
+        self.logger.info(f'Worker {self.name} connected to {self.address}')
+
+        beat = threading.Thread(target=self._beat, args=[channel])
+        beat.daemon = True
+        beat.start()
+
+        try:
+            for message in channel:
+                if message.get('type') == 'stop':
+                    break
+                if message.get('type') != 'task':
+                    continue
+
+                task_id = message['task']
+                self.logger.info(f'Running task {task_id}')
+                try:
+                    ff = FFmpeg(
+                        enable_log=False, ffmpeg_path=self.ffmpeg_path)
+                    output = convert_task(ff, message['args'])
+                except Exception as e:
+                    channel.send(type='failed', task=task_id, error=str(e))
+                else:
+                    channel.send(type='done', task=task_id, output=output)
+        except (OSError, ValueError) as e:
+            self.logger.error(f'Connection lost: {e}')
+        finally:
+            self._stopped.set()
+            channel.close()
+
+    def stop(self):
+        self._stopped.set()
+        if self._channel is not None:
+            self._channel.close()
+
+    def _beat(self, channel):
+        while not self._stopped.wait(self.heartbeat):
+            try:
+                channel.send(type='heartbeat')
+            except OSError:
+                return
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m pyffmpeg.worker',
+        description='Run pyffmpeg segment tasks for a coordinator')
+    parser.add_argument(
+        'address', help="HOST:PORT or unix:PATH of the coordinator")
+    parser.add_argument('--ffmpeg', help='ffmpeg executable to use')
+    parser.add_argument(
+        '--heartbeat', type=float, default=HEARTBEAT,
+        help='seconds between heartbeats')
+    parser.add_argument(
+        '--token', help=f'token of the coordinator, or set {TOKEN_ENV}')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    Worker(args.address, args.heartbeat, args.ffmpeg, token=args.token).run()
+
+
+if __name__ == '__main__':
+    main()
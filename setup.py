@@ -48,4 +48,6 @@ setup(
     album art, cover art, metadata,
     conversion, converting, audio, video''',
     packages=find_packages(),
+    package_data={'pyffmpeg': [
+        'static/bin/*/ffmpeg.xz*', 'ffmpegcommands.preference']},
 )
@@ -0,0 +1,93 @@
+import os
+import asyncio
+import pytest
+from pyffmpeg.async_ffmpeg import AsyncFFmpeg, AsyncFFprobe
+from pyffmpeg.misc import Paths
+
+
+TEST_FOLDER = os.path.join(os.path.abspath('.'), 'tests')
+EASY_LEMON = os.path.join(TEST_FOLDER, 'Easy_Lemon_30_Second_-_Kevin_MacLeod.mp3')
+COUNTDOWN = os.path.join(TEST_FOLDER, 'countdown.mp4')
+
+home = Paths().home_path
+
+
+def test_async_probe():
+    fp = asyncio.run(AsyncFFprobe(COUNTDOWN, use_cache=False).probe())
+
+    assert fp.duration == "00:00:04.37"
+    assert fp.metadata[0]['codec'] == 'aac'
+
+
+def test_async_convert():
+
+    async def convert():
+        ff = AsyncFFmpeg()
+        ff.report_progress = True
+        job = await ff.start_convert(
+            COUNTDOWN, os.path.join(home, 'async_countdown.wav'))
+        reports = [info async for info in job.progress()]
+        out = await job
+        return out, reports
+
+    out, reports = asyncio.run(convert())
+
+    assert out.probe.duration == "00:00:04.37"
+    assert reports[-1].done
+
+
+def test_async_cancel():
+
+    async def cancel():
+        ff = AsyncFFmpeg()
+        # -re reads the input at its native rate, so it takes 30s
+        opts = ['-re', '-i', EASY_LEMON, os.path.join(home, 'async_cancel.wav')]
+        task = asyncio.ensure_future(ff.options(opts))
+        await asyncio.sleep(0.5)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        return ff._ffmpeg_instances['options'].returncode
+
+    assert asyncio.run(cancel()) is not None
+
+
+def test_async_convert_part():
+
+    async def convert():
+        ff = AsyncFFmpeg()
+        ff.loglevel = 'info'
+        return await ff.convert(
+            EASY_LEMON, os.path.join(home, 'async_part.wav'), start=2, end=5,
+            output_options=['-ac', '1'])
+
+    out = asyncio.run(convert())
+    info = asyncio.run(AsyncFFprobe(out, use_cache=False).probe()).info
+    assert abs(info.duration - 3) < 0.1
+    assert info.audio_streams[0].channels == 1
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2])
+def test_async_probe_many(chunk_size):
+    files = [COUNTDOWN, EASY_LEMON, os.path.join(TEST_FOLDER, 'not_a_file.mp3')]
+
+    async def probe():
+        return dict([x async for x in AsyncFFprobe.probe_many(
+            files, max_workers=2, use_cache=False, chunk_size=chunk_size)])
+
+    results = asyncio.run(probe())
+    assert set(results) == set(files)
+    # probed, not only made
+    assert results[COUNTDOWN].duration == "00:00:04.37"
+    assert results[EASY_LEMON].info.audio_streams
+    assert isinstance(results[files[2]], Exception)
+
+
+def test_async_album_arts():
+
+    async def arts():
+        return dict([x async for x in AsyncFFprobe.get_album_arts([COUNTDOWN])])
+
+    assert asyncio.run(arts()) == {COUNTDOWN: None}
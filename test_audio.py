@@ -0,0 +1,30 @@
+import os
+import pytest
+from pyffmpeg import audio
+from pyffmpeg.audio import AudioReader
+
+
+TEST_FOLDER = os.path.join(os.path.abspath('.'), 'tests')
+EASY_LEMON = os.path.join(TEST_FOLDER, 'Easy_Lemon_30_Second_-_Kevin_MacLeod.mp3')
+
+
+def test_read_blocks():
+    pytest.importorskip('numpy')
+    reader = AudioReader(EASY_LEMON, sample_rate=8000, channels=2, block_size=4000)
+    blocks = [block.copy() for block in reader]
+    whole = reader.read_all()
+
+    assert blocks[0].shape == (4000, 2)
+    assert str(whole.dtype) == 'float32'
+    assert sum(len(block) for block in blocks) == len(whole)
+    # about 31 seconds at 8kHz
+    assert abs(len(whole) - 31 * 8000) < 8000
+
+
+def test_read_blocks_no_numpy(monkeypatch):
+    monkeypatch.setattr(audio, 'np', None)
+    reader = AudioReader(EASY_LEMON, sample_rate=8000, sample_fmt='s16le')
+    whole = reader.read_all()
+
+    assert whole.format == 'h'
+    assert whole.shape[1] == 1
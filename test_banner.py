@@ -0,0 +1,82 @@
+import os
+import json
+import time
+import pytest
+from pyffmpeg.banner import parse_banner
+from pyffmpeg.pseudo_ffprobe import FFprobe
+
+# stderr of 'ffmpeg -i <file> -f null -' recorded from real files,
+# with the values the parser gave for them in expected.json
+BANNERS = os.path.join(os.path.abspath('.'), 'tests', 'banners')
+
+with open(os.path.join(BANNERS, 'expected.json')) as e_file:
+    EXPECTED = json.load(e_file)
+
+# mean time to parse a banner, generous
+MAX_PARSE_SECONDS = 0.001
+
+
+def _banner(name):
+    with open(os.path.join(BANNERS, name + '.log')) as b_file:
+        return b_file.read()
+
+
+@pytest.mark.parametrize('name', sorted(EXPECTED))
+def test_golden_banners(name):
+    expected = EXPECTED[name]
+    probe = FFprobe._blank(name, 10, False)
+
+    if 'error' in expected:
+        with pytest.raises(Exception) as err:
+            probe._load_banner(_banner(name))
+        assert str(err.value) == expected['error']
+        return
+
+    probe._load_banner(_banner(name))
+    assert probe.duration == expected['duration']
+    assert probe.start == expected['start']
+    assert probe.bitrate == expected['bitrate']
+    assert probe.album_art_stream == expected['album_art_stream']
+    assert dict(probe.metadata[-1]) == expected['input']
+    streams = {
+        k: v for k, v in probe.metadata[0].items() if isinstance(k, str)}
+    assert streams == expected['streams']
+
+
+def test_parse_banner_records():
+    inputs = parse_banner(_banner('group'))
+
+    assert [x.index for x in inputs] == [0, 1]
+    assert inputs[0].format == 'mov,mp4,m4a,3gp,3g2,mj2'
+    assert inputs[0].source == 'tests/countdown.mp4'
+    assert [(s.index, s.kind) for s in inputs[0].streams] == [
+        (0, 'Video'), (1, 'Audio')]
+    assert inputs[0].streams[0].tags['dimensions'] == '640x360'
+    assert inputs[1].streams[0].tags['codec'] == 'mp3'
+
+
+def test_parse_banner_chapters():
+    # 'Stream' and 'Input' in a title, a two line comment and chapters
+    # whose metadata must not leak into the input's
+    source, = parse_banner(_banner('chapters'))
+
+    assert source.tags['title'] == 'Live Stream Input'
+    assert source.tags['COMMENT'] == 'first line\nsecond line'
+    assert source.tags['Duration'] == '00:00:04.37'
+    assert [s.kind for s in source.streams] == ['Video', 'Audio', 'Subtitle']
+
+    chapter, = source.chapters
+    assert (chapter.start, chapter.end) == ('0.000000', '2.000000')
+    assert chapter.tags['title'] == 'Intro'
+
+
+def test_parse_banner_speed():
+    banner = _banner('countdown')
+    rounds = 500
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        parse_banner(banner)
+    took = (time.perf_counter() - start) / rounds
+
+    assert took < MAX_PARSE_SECONDS
@@ -0,0 +1,103 @@
+import io
+import os
+import pytest
+from pyffmpeg import columns
+from pyffmpeg.columns import probe_columns
+from pyffmpeg.models import FormatInfo
+
+
+TEST_FOLDER = os.path.join(os.path.abspath('.'), 'tests')
+FILES = [
+    os.path.join(TEST_FOLDER, x) for x in (
+        'countdown.mp4',
+        'Easy_Lemon_30_Second_-_Kevin_MacLeod.mp3',
+        'Ecossaise in E-flat - Kevin MacLeod.mp3',
+        'not_a_file.mp3')]
+
+
+@pytest.fixture(scope='module')
+def probed():
+    # rows come in completion order
+    probed = probe_columns(FILES, max_workers=2)
+    return probed, {x: probed.paths.index(x) for x in FILES}
+
+
+def test_probe_columns(probed):
+    probed, rows = probed
+    video, song, _, missing = (rows[x] for x in FILES)
+
+    assert len(probed) == 4
+    assert probed['width'][video] == 640
+    assert probed['video_codec'][video] == 'h264'
+    assert probed['video_codec'][song] is None
+    assert probed['sample_rate'][song] == 44100
+    assert probed['ok'][missing] == 0
+    assert FILES[3] in probed.errors
+    # one entry for both songs
+    assert probed.dictionaries['audio_codec'].values.count('mp3') == 1
+
+
+def test_to_numpy(probed):
+    np = pytest.importorskip('numpy')
+    probed, rows = probed
+    table = probed.to_numpy()
+
+    assert table['duration'][rows[FILES[0]]] == 4.37
+    assert np.isnan(table['duration'][rows[FILES[3]]])
+    assert table['bitrate'][table['ok'] == 1].min() == 320000
+    codecs = table.dtype.metadata['dictionaries']['video_codec']
+    assert codecs[table['video_codec'][rows[FILES[0]]]] == 'h264'
+
+
+def test_to_numpy_no_numpy(monkeypatch, probed):
+    monkeypatch.setattr(columns, 'np', None)
+    with pytest.raises(ImportError):
+        probed[0].to_numpy()
+
+
+def test_to_csv(probed):
+    probed, rows = probed
+    out = io.StringIO()
+    probed.to_csv(out)
+    lines = out.getvalue().splitlines()
+
+    assert lines[0].startswith('path,format_name,video_codec,audio_codec,')
+    assert len(lines) == 5
+    assert lines[rows[FILES[3]] + 1] == FILES[3] + ',,,,,0,0,0,,0,0,0'
+
+
+def test_to_pandas(probed):
+    pytest.importorskip('pandas')
+    probed, rows = probed
+    frame = probed.to_pandas()
+
+    assert str(frame['audio_codec'].dtype) == 'category'
+    assert frame.groupby('audio_codec', observed=True).size()['mp3'] == 2
+
+
+def test_to_arrow(probed):
+    pytest.importorskip('pyarrow')
+    probed, rows = probed
+    table = probed.to_arrow()
+
+    assert table.num_rows == 4
+    assert table.column('video_codec').null_count == 3
+    assert table.column('width').to_pylist()[rows[FILES[0]]] == 640
+
+
+def test_append_while_exported():
+    pytest.importorskip('numpy')
+    probed = probe_columns(FILES[:1])
+    info = probed.arrays()
+    row = FormatInfo()
+
+    # nothing is added while the arrays are alive
+    with pytest.raises(BufferError):
+        probed.append('other.mp4', row)
+    assert len(probed) == 1
+    assert {len(x) for x in probed.numbers.values()} == {1}
+    assert {len(x) for x in probed.dictionaries.values()} == {1}
+
+    del info
+    probed.append('other.mp4', row)
+    assert len(probed) == 2
@@ -0,0 +1,108 @@
+import os
+import pytest
+from pyffmpeg import FFmpeg, FFprobe
+from pyffmpeg.command import Command, output_indexes
+
+
+TEST_FOLDER = os.path.join(os.path.abspath('.'), 'tests')
+COUNTDOWN = os.path.join(TEST_FOLDER, 'countdown.mp4')
+EASY_LEMON = os.path.join(TEST_FOLDER, 'Easy_Lemon_30_Second_-_Kevin_MacLeod.mp3')
+
+
+def test_command_argv():
+    command = (
+        Command(['-hide_banner'])
+        .input('a b.mp4', '-ss', 10)
+        .input('c.mp3')
+        .filter('[0:v]scale=-2:720[v]')
+        .output('out.mp4', '-map', '[v]', '-map', '1:a'))
+
+    assert command.argv('ffmpeg') == [
+        'ffmpeg', '-hide_banner', '-ss', '10', '-i', 'a b.mp4',
+        '-i', 'c.mp3', '-filter_complex', '[0:v]scale=-2:720[v]',
+        '-map', '[v]', '-map', '1:a', 'out.mp4']
+
+
+def test_command_immutable():
+    base = Command().input('a.mp4')
+    mp3 = base.output('a.mp3')
+    wav = base.output('a.wav').input_options(0, '-t', 5)
+
+    assert base.argv() == ['-i', 'a.mp4']
+    assert mp3.argv() == ['-i', 'a.mp4', 'a.mp3']
+    assert wav.argv() == ['-t', '5', '-i', 'a.mp4', 'a.wav']
+    with pytest.raises(AttributeError):
+        base.inputs = ()
+
+
+def test_command_template():
+    command = Command().input('{src}').output(
+        '{dst}', '-b:a', '{bitrate}', '-vf', 'crop={{w}}')
+    template = command.compile()
+
+    assert command.placeholders == {'src', 'dst', 'bitrate'}
+    assert template.argv(src='a b.mp4', dst='x.mp3', bitrate='96k') == [
+        '-i', 'a b.mp4', '-b:a', '96k', '-vf', 'crop={w}', 'x.mp3']
+    with pytest.raises(ValueError):
+        template.argv(src='a.mp4')
+
+
+def test_chain_clip_one_input(tmp_path):
+    ff = FFmpeg(str(tmp_path), enable_log=False)
+    # '-i' in a path used to be rewritten by clip
+    ff.input(COUNTDOWN, EASY_LEMON).clip(0, 2, input=1)
+    ff.map('1:a').output('clip -i me.wav')
+
+    assert ff.command.inputs[0].options == ()
+    assert ff.command.inputs[1].options == ('-ss', '0', '-to', '2')
+    assert ff.run()
+    out = os.path.join(str(tmp_path), 'clip -i me.wav')
+    assert abs(FFprobe(out, use_cache=False).info.duration - 2) < 0.1
+    assert ff.chain_string == ''
+
+
+def test_run_command(tmp_path):
+    ff = FFmpeg(enable_log=False)
+    command = Command().input('{src}').output('{dst}', '-t', 1)
+    for name in ('a.wav', 'b c.wav'):
+        ff.run(command, src=EASY_LEMON, dst=str(tmp_path / name))
+
+    assert sorted(os.listdir(str(tmp_path))) == ['a.wav', 'b c.wav']
+
+
+def test_chain_braces(tmp_path):
+    # braces in chained arguments are not placeholders
+    source = str(tmp_path / 'a{b} {}.wav')
+    ff = FFmpeg(str(tmp_path), enable_log=False)
+    ff.input(EASY_LEMON).duration(1).output(source)
+    assert source in ff.chain_string.replace("'", '')
+    assert ff.run()
+
+    ff.input(source).output('c{}.wav').run()
+    assert sorted(os.listdir(str(tmp_path))) == ['a{b} {}.wav', 'c{}.wav']
+
+
+def test_chain_drawtext():
+    # not every ffmpeg has drawtext, only the command line is checked
+    text = "drawtext=text='%{pts\\:hms}':fontcolor=white"
+    ff = FFmpeg(enable_log=False)
+    ff.input(COUNTDOWN).filter(text, 'v').output('text.mp4')
+    ff.filter_complex('[0:v]drawtext=text=%{n}[v]')
+
+    argv = ff._run_args()
+    assert argv[argv.index('-filter:v') + 1] == text
+    assert argv[argv.index('-filter_complex') + 1] == (
+        '[0:v]drawtext=text=%{n}[v]')
+
+
+@pytest.mark.parametrize(
+    'argv,indexes', [
+        (['-i', 'a.mp4', 'b.mp3'], [2]),
+        (['-y', '-i', 'a.mp4', '-vn', 'b.mp3', '-c:v', 'copy', 'c.mp4'], [4, 7]),
+        # negative values, and - for stdout
+        (['-itsoffset', '-2', '-i', 'a.mp4', '-f', 'wav', '-'], [6]),
+        # an unknown flag before another option takes no value
+        (['-i', 'a.mp4', '-newflag', '-c', 'copy', 'b.mp4'], [5]),
+    ])
+def test_output_indexes(argv, indexes):
+    assert output_indexes(argv) == indexes
@@ -0,0 +1,60 @@
+import os
+import pytest
+from pyffmpeg import frames
+from pyffmpeg.frames import FrameReader, FrameWriter, frame_shape
+from pyffmpeg.misc import Paths
+
+
+TEST_FOLDER = os.path.join(os.path.abspath('.'), 'tests')
+COUNTDOWN = os.path.join(TEST_FOLDER, 'countdown.mp4')
+
+
+@pytest.mark.parametrize(
+    'pix_fmt,shape',
+    [
+        ('rgb24', (360, 640, 3)),
+        ('gray', (360, 640)),
+        ('yuv420p', (540, 640))
+    ])
+def test_frame_shape(pix_fmt, shape):
+    assert frame_shape(pix_fmt, 640, 360) == shape
+
+
+def test_read_frames():
+    pytest.importorskip('numpy')
+    reader = FrameReader(COUNTDOWN, batch_size=8)
+    batches = list(batch.copy() for batch in reader)
+
+    assert (reader.width, reader.height) == (640, 360)
+    assert batches[0].shape == (8, 360, 640, 3)
+    assert sum(len(batch) for batch in batches) == 129
+
+
+def test_read_frames_no_numpy(monkeypatch):
+    monkeypatch.setattr(frames, 'np', None)
+    reader = FrameReader(
+        COUNTDOWN, pix_fmt='gray', batch_size=10, size=(64, 36), fps=10)
+    shapes = [batch.shape for batch in reader]
+
+    assert shapes[0] == (10, 36, 64)
+    assert sum(shape[0] for shape in shapes) == 43
+
+
+def test_write_frames():
+    np = pytest.importorskip('numpy')
+    out = os.path.join(Paths().home_path, 'frames.mp4')
+
+    with FrameWriter(out, size=(64, 48), fps=25, queue_size=2) as writer:
+        for x in range(50):
+            writer.write(np.full((48, 64, 3), x * 5, np.uint8))
+
+    reader = FrameReader(out, batch_size=10)
+    assert (reader.width, reader.height) == (64, 48)
+    assert sum(len(batch) for batch in reader) == 50
+
+
+def test_write_wrong_size():
+    out = os.path.join(Paths().home_path, 'frames.mp4')
+    with pytest.raises(ValueError):
+        with FrameWriter(out, size=(64, 48)) as writer:
+            writer.write(bytes(10))
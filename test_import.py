@@ -0,0 +1,41 @@
+import os
+import sys
+import subprocess
+
+
+# generous, importing takes a few tens of milliseconds
+MAX_IMPORT_SECONDS = 0.5
+
+CHECK = '''
+import time
+start = time.perf_counter()
+import pyffmpeg
+took = time.perf_counter() - start
+import os, logging
+print(took)
+print(os.path.exists(os.path.join(os.environ['HOME'], '.pyffmpeg')))
+print(len(logging.getLogger('pyffmpeg').handlers))
+'''
+
+
+def _run(code, home):
+    env = dict(os.environ, HOME=str(home), USERPROFILE=str(home))
+    out = subprocess.run(
+        [sys.executable, '-c', code], env=env, check=True,
+        capture_output=True, text=True,
+        cwd=os.path.dirname(os.path.abspath(__file__)))
+    return out.stdout.split()
+
+
+def test_import_has_no_side_effects(tmp_path):
+    took, made_folder, handlers = _run(CHECK, tmp_path)
+
+    assert made_folder == 'False'
+    assert handlers == '0'
+    assert os.listdir(tmp_path) == []
+
+
+def test_import_time(tmp_path):
+    # best of a few, to ride out a busy machine
+    best = min(float(_run(CHECK, tmp_path)[0]) for _ in range(3))
+    assert best < MAX_IMPORT_SECONDS
@@ -1,6 +1,8 @@
+import os
 from platform import system
 import pytest
-from pyffmpeg.misc import fix_splashes
+from pyffmpeg import misc
+from pyffmpeg.misc import fix_splashes, Paths
 
 os_name = system().lower()
 
@@ -24,3 +26,108 @@ def test_fix_splashes(case, exp):
         assert ret == exp
     elif '\\' not in ret:
         assert True
+
+
+def test_extract_blob(tmp_path):
+    raw = os.urandom(3 * 1024 * 1024 + 17)
+    src = tmp_path / 'ffmpeg_src'
+    src.write_bytes(raw)
+
+    blob = Paths.convert_to_blob(str(src), str(tmp_path))
+    assert os.path.exists(blob + '.sha256')
+
+    target = str(tmp_path / 'ffmpeg')
+    Paths()._extract_blob(blob, target)
+    with open(target, 'rb') as f_file:
+        assert f_file.read() == raw
+    # no temp file is left behind
+    assert sorted(os.listdir(tmp_path)) == [
+        'ffmpeg', 'ffmpeg.xz', 'ffmpeg.xz.sha256', 'ffmpeg_src']
+
+
+def test_extract_blob_checksum(tmp_path):
+    src = tmp_path / 'ffmpeg_src'
+    src.write_bytes(b'ffmpeg')
+    blob = Paths.convert_to_blob(str(src), str(tmp_path))
+    with open(blob + '.sha256', 'w') as s_file:
+        s_file.write('0' * 64)
+
+    target = str(tmp_path / 'ffmpeg')
+    with pytest.raises(Exception):
+        Paths()._extract_blob(blob, target)
+    assert not os.path.exists(target)
+
+
+@pytest.fixture
+def fake_ffmpeg(tmp_path, monkeypatch):
+    # a stand in that only answers -version
+    path = tmp_path / 'ffmpeg'
+    path.write_text('#!/bin/sh\necho "ffmpeg version 9.9-fake Copyright"\n')
+    path.chmod(0o755)
+
+    monkeypatch.delenv(misc.FFMPEG_ENV, raising=False)
+    monkeypatch.delenv(misc.ORDER_ENV, raising=False)
+    misc.clear_resolved()
+    yield str(path)
+    misc.set_resolve_order()
+
+
+@pytest.mark.skipif(os_name == 'windows', reason='uses a shell script')
+def test_resolve_argument(fake_ffmpeg):
+    binary = misc.resolve_ffmpeg(fake_ffmpeg)
+    assert binary.path == fake_ffmpeg
+    assert binary.source == 'argument'
+    assert binary.version == '9.9-fake'
+    # remembered for the process
+    assert misc.resolve_ffmpeg(fake_ffmpeg) is binary
+
+
+@pytest.mark.skipif(os_name == 'windows', reason='uses a shell script')
+def test_resolve_env(fake_ffmpeg, monkeypatch):
+    monkeypatch.setenv(misc.FFMPEG_ENV, fake_ffmpeg)
+    binary = misc.resolve_ffmpeg()
+    assert (binary.path, binary.source) == (fake_ffmpeg, 'env')
+
+
+@pytest.mark.skipif(os_name == 'windows', reason='uses a shell script')
+def test_resolve_order(fake_ffmpeg, monkeypatch):
+    monkeypatch.setenv(misc.FFMPEG_ENV, fake_ffmpeg)
+    monkeypatch.setenv(
+        'PATH', os.path.dirname(fake_ffmpeg) + os.pathsep + os.environ['PATH'])
+
+    misc.set_resolve_order('system', 'env')
+    assert misc.resolve_ffmpeg().source == 'system'
+
+    monkeypatch.setenv(misc.ORDER_ENV, 'bundled')
+    misc.set_resolve_order()
+    assert misc.resolve_ffmpeg().source == 'bundled'
+
+    with pytest.raises(ValueError):
+        misc.set_resolve_order('nowhere')
+
+
+def test_resolve_order_default(monkeypatch):
+    # the bundled ffmpeg stays ahead of the one on PATH
+    monkeypatch.delenv(misc.ORDER_ENV, raising=False)
+    order = misc.resolve_order()
+    assert order.index('bundled') < order.index('system')
+
+
+@pytest.mark.skipif(os_name == 'windows', reason='uses a shell script')
+def test_resolve_no_bundle(fake_ffmpeg, tmp_path, monkeypatch):
+    # nothing extracted nor packaged, the one on PATH is used
+    monkeypatch.setenv('HOME', str(tmp_path / 'home'))
+    monkeypatch.setattr(Paths, 'bin_blob', lambda self: fake_ffmpeg + '.xz')
+    monkeypatch.setattr(misc, 'find_spec', lambda name: None)
+    monkeypatch.setenv(
+        'PATH', os.path.dirname(fake_ffmpeg) + os.pathsep + os.environ['PATH'])
+
+    assert not Paths().has_bundle()
+    binary = misc.resolve_ffmpeg()
+    assert (binary.path, binary.source) == (fake_ffmpeg, 'system')
+    assert not os.path.exists(tmp_path / 'home')
+
+
+def test_resolve_missing(fake_ffmpeg):
+    with pytest.raises(Exception):
+        misc.resolve_ffmpeg(fake_ffmpeg + '_missing')
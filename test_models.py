@@ -0,0 +1,98 @@
+import os
+import json
+import pickle
+import pytest
+from fractions import Fraction
+from pyffmpeg import FFprobe
+from pyffmpeg.banner import parse_banner
+from pyffmpeg.models import (
+    FormatInfo, VideoStream, AudioStream, SubtitleStream,
+    bits_per_second, frame_rate, stream_from_header)
+
+BANNERS = os.path.join(os.path.abspath('.'), 'tests', 'banners')
+
+
+def _info(name):
+    with open(os.path.join(BANNERS, name + '.log')) as b_file:
+        return FormatInfo.from_record(parse_banner(b_file.read())[0])
+
+
+@pytest.mark.parametrize(
+    'value,bits', [
+        ('128 kb/s', 128000), ('1.5 Mb/s', 1500000), ('N/A', 0), (None, 0)])
+def test_bits_per_second(value, bits):
+    assert bits_per_second(value) == bits
+
+
+@pytest.mark.parametrize(
+    'value,rate', [
+        ('25', Fraction(25)), ('29.97', Fraction(30000, 1001)),
+        ('23.98', Fraction(24000, 1001)), ('59.94', Fraction(60000, 1001)),
+        ('119.88', Fraction(120000, 1001)), ('12.50', Fraction(25, 2)),
+        # near, but not what ffmpeg prints for an NTSC rate
+        ('14.99', Fraction(1499, 100)), ('29.98', Fraction(1499, 50)),
+        ('90k', Fraction(90000)), ('', None)])
+def test_frame_rate(value, rate):
+    assert frame_rate(value) == rate
+
+
+def test_stream_from_header():
+    audio = stream_from_header(
+        'Stream #0:1(eng): Audio: ac3, 48000 Hz, 5.1(side), fltp, '
+        '384 kb/s (default) (forced)')
+
+    assert isinstance(audio, AudioStream)
+    assert (audio.index, audio.codec, audio.language) == (1, 'ac3', 'eng')
+    assert (audio.sample_rate, audio.channels) == (48000, 6)
+    assert audio.bitrate == 384000
+    assert audio.disposition == ('default', 'forced')
+
+
+def test_format_info():
+    info = _info('countdown')
+
+    assert info.duration == pytest.approx(4.37)
+    assert info.bitrate == 322000
+    assert info.tags['major_brand'] == 'mp42'
+
+    video, audio = info.streams
+    assert isinstance(video, VideoStream) and isinstance(audio, AudioStream)
+    assert (video.width, video.height) == (640, 360)
+    assert video.frame_rate == Fraction(30000, 1001)
+    assert video.pix_fmt == 'yuv420p'
+    assert (audio.sample_rate, audio.channels) == (44100, 2)
+    assert audio.tags['handler_name'].startswith('IsoMedia')
+
+
+def test_format_info_language_tags():
+    # matroska keeps BCP 47 tags, eg. en-US
+    info = _info('language')
+
+    assert [x.language for x in info.streams] == ['en-US', 'pt-BR']
+    assert info.video_streams[0].codec == 'h264'
+    assert info.audio_streams[0].sample_rate == 44100
+
+
+def test_format_info_kinds():
+    art = _info('album_art').video_streams[0]
+    assert art.attached_pic and art.frame_rate is None
+
+    subtitle, = _info('chapters').subtitle_streams
+    assert isinstance(subtitle, SubtitleStream)
+    assert subtitle.codec == 'subrip'
+
+
+def test_format_info_serialise():
+    info = _info('chapters')
+
+    assert FormatInfo.from_dict(json.loads(json.dumps(info.as_dict()))) == info
+    assert pickle.loads(pickle.dumps(info)) == info
+
+
+def test_probe_info():
+    test_file = os.path.join(os.path.abspath('.'), 'tests', 'countdown.mp4')
+    f = FFprobe(test_file)
+
+    assert f.info.duration == pytest.approx(4.37)
+    assert len(f.info.streams) == 2
+    assert f.fps == 29.97
@@ -0,0 +1,74 @@
+import os
+import shlex
+import threading
+from pyffmpeg import FFmpeg
+from pyffmpeg.pool import FFmpegPool, PRIORITY_BATCH, PRIORITY_INTERACTIVE
+from pyffmpeg.misc import Paths
+
+
+TEST_FOLDER = os.path.join(os.path.abspath('.'), 'tests')
+COUNTDOWN = os.path.join(TEST_FOLDER, 'countdown.mp4')
+
+home = Paths().home_path
+
+
+def test_pool_priority():
+    started = threading.Event()
+    release = threading.Event()
+    order = []
+
+    def blocker(ff):
+        started.set()
+        release.wait()
+
+    with FFmpegPool(max_jobs=1, enable_log=False) as pool:
+        pool.submit(blocker)
+        started.wait()
+        batch = pool.submit(lambda ff: order.append('batch'), PRIORITY_BATCH)
+        inter = pool.submit(
+            lambda ff: order.append('interactive'), PRIORITY_INTERACTIVE)
+        release.set()
+        batch.result()
+        inter.result()
+
+    assert order == ['interactive', 'batch']
+
+
+def test_pool_threads():
+    pool = FFmpegPool(max_jobs=2, threads_per_job=3, enable_log=False)
+    threads = pool.submit(lambda ff: ff.threads).result()
+    pool.shutdown()
+
+    assert threads == 3
+
+
+def test_pool_convert():
+    with FFmpegPool(max_jobs=2, enable_log=False) as pool:
+        futures = [
+            pool.submit_options(
+                ['-i', COUNTDOWN, os.path.join(home, f'pool_{x}.wav')])
+            for x in range(3)]
+        failed = pool.submit_options(
+            ['-i', 'not_a_file.mp4', os.path.join(home, 'pool.wav')])
+
+    assert all(f.result() for f in futures)
+    assert failed.exception() is not None
+
+
+def test_threads_every_output():
+    ff = FFmpeg(enable_log=False)
+    ff.threads = 2
+
+    argv = ff._options_args(
+        ['-i', 'a b.mp4', '-an', 'one two.mp4', '-map', '0:a', '-', '-y'])
+    assert argv[argv.index('-i'):] == [
+        '-i', 'a b.mp4', '-an', '-threads', '2', 'one two.mp4',
+        '-map', '0:a', '-threads', '2', '-', '-y']
+
+    # a quoted path stays whole, the string is not edited
+    argv = ff._options_args('-i "a b.mp4" -ss -5 "c d.mp3" e.wav')
+    if isinstance(argv, str):
+        argv = shlex.split(argv, posix=False)
+    assert argv[argv.index('-i'):] == [
+        '-i', '"a b.mp4"', '-ss', '-5', '-threads', '2', '"c d.mp3"',
+        '-threads', '2', 'e.wav']
@@ -0,0 +1,89 @@
+import os
+import pytest
+from pyffmpeg import FFprobe
+from pyffmpeg.pool import FFmpegPool
+import pyffmpeg.presets as registry
+from pyffmpeg.presets import load_presets, preset, presets, add_presets
+
+
+TEST_FOLDER = os.path.join(os.path.abspath('.'), 'tests')
+COUNTDOWN = os.path.join(TEST_FOLDER, 'countdown.mp4')
+EASY_LEMON = os.path.join(TEST_FOLDER, 'Easy_Lemon_30_Second_-_Kevin_MacLeod.mp3')
+ECOSSAISE = os.path.join(TEST_FOLDER, 'Ecossaise in E-flat - Kevin MacLeod.mp3')
+
+
+def test_load_presets():
+    loaded = presets()
+
+    assert {
+        'audio_from_video', 'reduce_audio_bitrate', 'copy_clip',
+        'video_snapshot', '1080_to_720', 'animated_gif', 'ringtone',
+        'concat', 'seek_and_collect',
+        'seek_and_collect_and_start_number'} <= set(loaded)
+    assert loaded['reduce_audio_bitrate'].defaults == {'br': '96k'}
+    assert loaded['seek_and_collect'].params == {'start', 'fps'}
+
+
+def test_preset_argv():
+    bound = preset('reduce audio bitrate', br='64k', output='{stem}.ogg')
+
+    assert bound.argv('a b.mp3') == [
+        '-i', 'a b.mp3', '-b:a', '64k', './a b.ogg']
+    assert preset('ringtone').argv('x.mp3', 'y.mp3', 'ffmpeg') == [
+        'ffmpeg', '-ss', '0', '-i', 'x.mp3', '-t', '00:15', 'y.mp3']
+
+
+def test_recipe_outputs():
+    # image sequences and gifs, as the recipes make them
+    assert preset('seek_and_collect').argv('/v/a.mp4')[-1] == (
+        '/v/a_%04d.png')
+    assert preset('video_snapshot').argv('/v/a.mp4')[-1] == '/v/a_%04d.jpg'
+    assert preset('animated_gif').argv('/v/a.mp4')[-1] == (
+        '/v/a_animated_gif.gif')
+    # the one given wins
+    assert preset('animated_gif', output='{stem}.webp').argv(
+        '/v/a.mp4')[-1] == './a.webp'
+
+
+def test_preset_errors():
+    with pytest.raises(ValueError):
+        preset('no_such_preset')
+    with pytest.raises(ValueError):
+        preset('reduce_audio_bitrate', bitrate='96k')
+
+
+def test_bad_preference(tmp_path):
+    preference = tmp_path / 'bad.preference'
+    preference.write_text('no output - [-i i -c copy]\n')
+    with pytest.raises(ValueError, match='bad.preference:1'):
+        load_presets(str(preference))
+
+    preference.write_text('bad output - [-i i o={name}.mp4]\n')
+    with pytest.raises(ValueError, match='bad.preference:1'):
+        load_presets(str(preference))
+
+
+def test_add_presets(tmp_path, monkeypatch):
+    # leave the presets of the other tests as they are
+    monkeypatch.setattr(registry, '_presets', {})
+    monkeypatch.setattr(registry, '_loaded', False)
+    preference = tmp_path / 'more.preference'
+    preference.write_text('mono - [-i i -ac 1 -ar {rate} o]\n')
+    add_presets(str(preference))
+
+    with pytest.raises(ValueError):
+        preset('mono')
+    assert preset('mono', rate=8000).values == {'rate': '8000'}
+
+
+def test_pool_map(tmp_path):
+    job = preset('ringtone', duration=2, output='{stem}.wav')
+    files = [EASY_LEMON, ECOSSAISE]
+    with FFmpegPool(max_jobs=2, directory=str(tmp_path), enable_log=False) as pool:
+        outputs = list(pool.map(job, files))
+
+    assert outputs == [
+        os.path.join(str(tmp_path), os.path.basename(x)[:-4] + '.wav')
+        for x in files]
+    for out in outputs:
+        assert abs(FFprobe(out, use_cache=False).info.duration - 2) < 0.1
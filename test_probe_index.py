@@ -0,0 +1,123 @@
+import os
+import shutil
+
+from pyffmpeg import FFprobe
+from pyffmpeg.probe_cache import ProbeCache
+from pyffmpeg.probe_index import ProbeIndex
+
+
+TEST_FOLDER = os.path.join(os.path.abspath('.'), 'tests')
+MEDIA = [
+    'countdown.mp4',
+    'Easy_Lemon_30_Second_-_Kevin_MacLeod.mp3',
+    'Ecossaise in E-flat - Kevin MacLeod.mp3']
+
+
+def _library(tmp_path):
+    folder = tmp_path / 'media'
+    (folder / 'music').mkdir(parents=True)
+    shutil.copy(os.path.join(TEST_FOLDER, MEDIA[0]), folder)
+    for name in MEDIA[1:]:
+        shutil.copy(os.path.join(TEST_FOLDER, name), folder / 'music')
+    (folder / 'notes.txt').write_text('not media')
+    return folder
+
+
+def test_scan(tmp_path):
+    folder = _library(tmp_path)
+    with ProbeIndex(str(tmp_path / 'library.db')) as index:
+        stats = index.scan(str(folder), max_workers=2)
+
+        assert stats == {
+            'unchanged': 0, 'probed': 3, 'failed': 1, 'removed': 0}
+        assert len(index) == 4
+        assert [x[0] for x in index.errors()] == [
+            os.path.realpath(folder / 'notes.txt')]
+
+        info = index.get(str(folder / 'countdown.mp4'))
+        assert info.duration == 4.37
+        assert info.video_streams[0].width == 640
+
+
+def test_rescan(tmp_path):
+    folder = _library(tmp_path)
+    db = str(tmp_path / 'library.db')
+    with ProbeIndex(db) as index:
+        index.scan(str(folder))
+
+    # a fresh connection, as in the next run of a program
+    with ProbeIndex(db) as index:
+        stats = index.scan(str(folder))
+        assert stats == {
+            'unchanged': 4, 'probed': 0, 'failed': 0, 'removed': 0}
+
+        os.utime(folder / 'countdown.mp4', ns=(0, 0))
+        os.remove(folder / 'notes.txt')
+        shutil.rmtree(folder / 'music')
+        stats = index.scan(str(folder))
+        assert stats == {
+            'unchanged': 0, 'probed': 1, 'failed': 0, 'removed': 3}
+        assert len(index) == 1
+
+
+def test_scan_links(tmp_path):
+    folder = _library(tmp_path)
+    # two names of one file, probed once
+    os.symlink(folder / 'countdown.mp4', folder / 'music' / 'link.mp4')
+    with ProbeIndex(str(tmp_path / 'library.db')) as index:
+        stats = index.scan(str(folder))
+        assert stats == {
+            'unchanged': 0, 'probed': 3, 'failed': 1, 'removed': 0}
+
+        os.remove(folder / 'music' / 'link.mp4')
+        stats = index.scan(str(folder))
+        assert stats == {
+            'unchanged': 4, 'probed': 0, 'failed': 0, 'removed': 0}
+
+        os.rename(folder / 'countdown.mp4', tmp_path / 'outside.mp4')
+        os.symlink(tmp_path / 'outside.mp4', folder / 'countdown.mp4')
+        stats = index.scan(str(folder))
+        assert stats == {
+            'unchanged': 3, 'probed': 1, 'failed': 0, 'removed': 1}
+        assert index.get(str(folder / 'countdown.mp4')) is not None
+
+
+def test_find(tmp_path):
+    folder = _library(tmp_path)
+    with ProbeIndex(str(tmp_path / 'library.db')) as index:
+        index.scan(str(folder), extensions=['.MP3', '.mp4'])
+
+        video = os.path.realpath(folder / 'countdown.mp4')
+        songs = sorted(
+            os.path.realpath(folder / 'music' / x) for x in MEDIA[1:])
+
+        assert len(index) == 3
+        assert index.find(codec='h264') == [video]
+        assert index.find(kind='Audio', codec='mp3') == songs
+        assert index.find(min_duration=30) == songs
+        assert index.find(max_duration=10, kind='Audio') == [video]
+        assert index.find(min_width=1280) == []
+        assert index.query(
+            'SELECT COUNT(*) FROM streams WHERE kind = ?', ('Audio',)) == [
+            (3,)]
+
+
+def test_probe_cache_index(tmp_path):
+    folder = _library(tmp_path)
+    file_name = str(folder / 'countdown.mp4')
+    cache = ProbeCache()
+    with ProbeIndex(str(tmp_path / 'library.db')) as index:
+        index.scan(str(folder))
+
+        cache.index = index
+        key = ProbeCache.key(file_name)
+        snapshot = cache.get(key)
+
+        assert cache.index_hits == 1
+        assert snapshot['duration'] == FFprobe(file_name).duration
+        assert snapshot['info'] == index.get(file_name)
+        assert snapshot['metadata'][0]['codec'] == 'aac'
+
+        # now it is in memory
+        cache.get(key)
+        assert cache.stats()['hits'] == 1
@@ -2,7 +2,13 @@ import pytest
 import os
 import requests
 from collections import defaultdict
-from pyffmpeg import FFprobe
+from subprocess import Popen
+from pyffmpeg import FFmpeg, FFprobe
+from pyffmpeg import pseudo_ffprobe
+from pyffmpeg.banner import BANNER_END_MARKERS
+from pyffmpeg.misc import Paths, ffmpeg_bin
+from pyffmpeg.pseudo_ffprobe import read_banner
+from pyffmpeg.probe_cache import ProbeCache, probe_cache
 
 # test speed to make sure no convertion took place
 # test file exist does not happen
@@ -31,7 +37,22 @@ def test_probe(file_name, duration):
 
 
 def test_album_art():
-    pass
+    folder = os.path.join(os.path.abspath('.'), 'tests')
+    countdown = os.path.join(folder, 'countdown.mp4')
+    with_art = os.path.join(Paths().home_path, 'album_art.m4a')
+
+    # give the audio of countdown a red cover
+    FFmpeg().options([
+        '-i', countdown, '-f', 'lavfi', '-i', 'color=c=red:s=32x32',
+        '-frames:v', '1', '-map', '0:a', '-map', '1:v', '-c:a', 'copy',
+        '-c:v', 'mjpeg', '-disposition:v:0', 'attached_pic', with_art])
+
+    art = FFprobe(with_art).get_album_art()
+    assert art[:2] == b'\xff\xd8'
+    assert FFprobe(countdown).get_album_art() is None
+
+    results = dict(FFprobe.get_album_arts([with_art, countdown]))
+    assert results == {with_art: art, countdown: None}
 
 @pytest.mark.parametrize(
     'file_name',
@@ -108,3 +129,107 @@ def test_generate_tags(file_name):
 
     assert tags_one == f._generate_tags(metadata_one)
     assert tags_two == f._generate_tags(metadata_two)
+
+
+def test_probe_stops_early(monkeypatch):
+    # the probe should stop at the headers, not sleep or decode
+    test_file = os.path.join(os.path.abspath('.'), 'tests', 'countdown.mp4')
+    started = []
+
+    def _popen(*args, **kwargs):
+        started.append(Popen(*args, **kwargs))
+        return started[-1]
+
+    monkeypatch.setattr(pseudo_ffprobe.subprocess, 'Popen', _popen)
+    log = read_banner(
+        [ffmpeg_bin(), '-y', '-i', test_file, '-f', 'null', os.devnull])
+
+    assert log.splitlines()[-1].startswith(BANNER_END_MARKERS)
+    assert 'frame=' not in log
+    # killed at the marker, not left to decode the whole input
+    assert started[0].returncode != 0
+
+    monkeypatch.undo()
+    f = FFprobe(test_file, use_cache=False)
+    assert f.duration == "00:00:04.37"
+
+
+def test_probe_timeout():
+    test_file = os.path.join(os.path.abspath('.'), 'tests', 'countdown.mp4')
+    with pytest.raises(Exception):
+        FFprobe(test_file, probe_timeout=0, use_cache=False)
+
+
+def test_probe_cache():
+    test_file = os.path.join(os.path.abspath('.'), 'tests', 'countdown.mp4')
+    probe_cache.clear()
+
+    first = FFprobe(test_file)
+    second = FFprobe(test_file)
+    FFprobe(test_file, use_cache=False)
+
+    assert probe_cache.hits == 1
+    assert probe_cache.misses == 1
+    assert second.duration == first.duration
+    assert second.metadata == first.metadata
+
+
+def test_probe_cache_eviction():
+    cache = ProbeCache(maxsize=2)
+    for x in range(3):
+        cache.put(('f', x), {'duration': x})
+
+    assert len(cache) == 2
+    assert cache.get(('f', 0)) is None
+    assert cache.get(('f', 2)) == {'duration': 2}
+
+
+def test_probe_many():
+    folder = os.path.join(os.path.abspath('.'), 'tests')
+    names = [
+        'countdown.mp4',
+        'Easy_Lemon_30_Second_-_Kevin_MacLeod.mp3',
+        'not_a_file.mp3']
+    files = [os.path.join(folder, x) for x in names]
+
+    results = dict(FFprobe.probe_many(files, max_workers=2))
+
+    assert set(results) == set(files)
+    assert results[files[0]].duration == "00:00:04.37"
+    assert isinstance(results[files[1]], FFprobe)
+    assert isinstance(results[files[2]], Exception)
+
+
+def test_probe_group():
+    folder = os.path.join(os.path.abspath('.'), 'tests')
+    names = [
+        'countdown.mp4',
+        'not_a_file.mp3',
+        'Easy_Lemon_30_Second_-_Kevin_MacLeod.mp3']
+    files = [os.path.join(folder, x) for x in names]
+
+    results = FFprobe.probe_group(files, use_cache=False)
+
+    assert [x[0] for x in results] == files
+    assert results[0][1].duration == "00:00:04.37"
+    assert results[0][1].metadata[0]['codec'] == 'aac'
+    assert isinstance(results[1][1], Exception)
+    assert results[2][1].metadata[0]['codec'] == 'mp3'
+
+
+@pytest.mark.parametrize('error', [
+    'No such file or directory', 'Invalid data found when processing input'])
+def test_probe_group_old_error(monkeypatch, error):
+    # ffmpeg before 5.0 names the file instead of [in#1 @ ...]
+    folder = os.path.join(os.path.abspath('.'), 'tests')
+    files = [os.path.join(folder, 'countdown.mp4'), 'not_a_file.mp3']
+    with open(os.path.join(folder, 'banners', 'countdown.log')) as b_file:
+        banner = b_file.read().replace('Stream mapping:\n', '')
+    log = banner + f'not_a_file.mp3: {error}\n'
+    monkeypatch.setattr(
+        pseudo_ffprobe, 'read_banner', lambda commands, timeout: log)
+
+    results = FFprobe.probe_group(files, use_cache=False)
+
+    assert results[0][1].duration == "00:00:04.37"
+    assert str(results[1][1]) == f'not_a_file.mp3: {error}'
@@ -1,9 +1,11 @@
+import io
 import os
 import requests
 # from platform import system
 import pytest
 from pyffmpeg import FFmpeg
-from pyffmpeg.misc import Paths
+from pyffmpeg.misc import Paths, ffmpeg_bin
+from pyffmpeg.progress import ProgressInfo, read_progress, time_to_seconds
 
 
 # are we offline?
@@ -105,3 +107,102 @@ def test_options():
         assert False
     else:
         assert True
+
+
+@pytest.mark.parametrize(
+    'value,seconds',
+    [
+        ('00:00:04.37', 4.37),
+        ('01:02:03.50', 3723.5),
+        ('N/A', 0.0),
+        (12, 12.0)
+    ])
+def test_time_to_seconds(value, seconds):
+    assert time_to_seconds(value) == pytest.approx(seconds)
+
+
+def test_read_progress():
+    report = io.BytesIO(
+        b'frame=120\nfps=29.97\nbitrate= 128.0kbits/s\n'
+        b'total_size=65536\nout_time_us=4000000\n'
+        b'out_time=00:00:04.000000\nspeed=2.00x\nprogress=continue\n'
+        b'frame=240\nfps=30.00\nbitrate=N/A\nout_time_us=N/A\n'
+        b'out_time=N/A\nspeed=N/A\nprogress=end\n')
+
+    blocks = list(read_progress(report))
+    first = ProgressInfo(blocks[0], 10.0)
+    last = ProgressInfo(blocks[1], 10.0)
+
+    assert len(blocks) == 2
+    assert first.out_time == 4.0
+    assert first.bitrate == 128.0
+    assert first.percent == 40.0
+    assert first.eta == 3.0
+    assert not first.done
+    assert last.done
+    assert last.percent == 100.0
+
+
+def test_report_progress():
+    ff = FFmpeg()
+    ff.loglevel = 'info'
+    ff.report_progress = True
+    reports = []
+    ff.onProgressChanged = reports.append
+
+    ff.convert(EASY_LEMON, os.path.join(home, 'progress.wav'))
+
+    assert reports[-1] == 100
+    assert ff.progress_info.done
+
+
+def test_convert_probe():
+    ff = FFmpeg()
+    ff.loglevel = 'info'
+
+    out = ff.convert(COUNTDOWN, os.path.join(home, 'countdown_probe.wav'))
+
+    assert out == os.path.join(home, 'countdown_probe.wav')
+    assert out.probe.duration == '00:00:04.37'
+    assert out.probe.metadata[0]['codec'] == 'aac'
+
+
+def test_convert_not_started(tmp_path):
+    # ffmpeg gone since it was resolved
+    ff = FFmpeg(str(tmp_path))
+    ff._ffmpeg_file = str(tmp_path / 'no-ffmpeg')
+
+    with pytest.raises(Exception) as e:
+        ff.convert(COUNTDOWN, 'out.wav')
+    assert 'no-ffmpeg' in str(e.value)
+    assert ff.error.startswith('New error info: ')
+
+
+def test_convert_stream():
+    with open(os.path.join('tests', 'countdown.mp4'), 'rb') as f_file:
+        data = f_file.read()
+
+    ff = FFmpeg()
+    out = b''.join(ff.convert_stream(data, 'wav', output_options=['-vn']))
+    from_file = b''.join(ff.convert_stream(io.BytesIO(data), 'wav'))
+
+    assert out[:4] == b'RIFF'
+    assert len(out) == len(from_file)
+
+
+def test_convert_stream_error():
+    ff = FFmpeg()
+    with pytest.raises(Exception):
+        b''.join(ff.convert_stream(b'not media' * 100, 'wav'))
+    assert ff.error
+
+
+def test_convert_probe_ffmpeg_path(tmp_path):
+    # the probe read from the log knows the ffmpeg that wrote it
+    link = tmp_path / 'my-ffmpeg'
+    os.symlink(ffmpeg_bin(), link)
+    ff = FFmpeg(str(tmp_path), ffmpeg_path=str(link))
+    ff.loglevel = 'info'
+
+    out = ff.convert(COUNTDOWN, 'path.wav')
+    assert out.probe._ffmpeg == str(link)
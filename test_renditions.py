@@ -0,0 +1,115 @@
+import os
+
+import pytest
+from pyffmpeg import FFprobe
+from pyffmpeg.renditions import FanOut, Rendition, convert_renditions
+
+
+TEST_FOLDER = os.path.join(os.path.abspath('.'), 'tests')
+COUNTDOWN = os.path.join(TEST_FOLDER, 'countdown.mp4')
+EASY_LEMON = os.path.join(TEST_FOLDER, 'Easy_Lemon_30_Second_-_Kevin_MacLeod.mp3')
+FAST = ['-preset', 'ultrafast']
+
+
+def test_command():
+    fan_out = FanOut(COUNTDOWN, [
+        Rendition('a.mp4', height=180, video_bitrate='300k'),
+        Rendition('b.mp4', width=160, audio_bitrate='48k'),
+        Rendition('c.mkv'),
+        Rendition('d.mp4', video_codec='copy', audio_codec='copy'),
+        Rendition('e.m4a', video_codec=None, container='ipod'),
+    ], directory='out')
+    argv = fan_out.command().argv()
+
+    # one input, decoded once and split in three
+    assert argv.count('-i') == 1
+    assert argv[argv.index('-filter_complex') + 1] == (
+        '[0:v:0]split=3[s0][s1][s2];'
+        '[s0]scale=-2:180[v0];[s1]scale=160:-2[v1]')
+    out_a = os.path.join('out', 'a.mp4')
+    assert argv[argv.index('[v0]') - 1:argv.index(out_a)] == [
+        '-map', '[v0]', '-c:v', 'libx264', '-b:v', '300k',
+        '-map', '0:a:0?', '-c:a', 'aac']
+    assert ['-map', '[s2]'] == argv[argv.index('[s2]') - 1:][:2]
+    assert ['-map', '0:v:0', '-c:v', 'copy'] == (
+        argv[argv.index('copy') - 3:][:4])
+    assert argv[-8:] == [
+        '-vn', '-map', '0:a:0?', '-c:a', 'aac', '-f', 'ipod',
+        os.path.join('out', 'e.m4a')]
+
+
+def test_command_one_branch():
+    # nothing to split
+    argv = FanOut(COUNTDOWN, [Rendition('a.mp4', height=90)]).command().argv()
+    assert '[0:v:0]scale=-2:90[v0]' in argv
+
+    argv = FanOut(COUNTDOWN, [Rendition('a.mp4')]).command().argv()
+    assert '-filter_complex' not in argv
+    assert ['-map', '0:v:0'] == argv[argv.index('-map'):][:2]
+
+
+def test_rendition_checks():
+    with pytest.raises(ValueError):
+        Rendition('a.mp4', height=90, video_codec='copy')
+    with pytest.raises(ValueError):
+        FanOut(COUNTDOWN, [])
+    # no video to scale
+    with pytest.raises(ValueError):
+        FanOut(EASY_LEMON, [Rendition('a.mp4', height=90)]).run()
+
+
+def test_convert_renditions(tmp_path):
+    seen = []
+    ladder = [
+        Rendition('180.mp4', height=180, video_bitrate='300k', options=FAST),
+        Rendition('90.mp4', height=90, video_bitrate='100k', options=FAST),
+        Rendition('audio.m4a', video_codec=None, audio_bitrate='64k'),
+    ]
+    outputs = convert_renditions(
+        COUNTDOWN, ladder, directory=str(tmp_path), on_progress=seen.append)
+
+    assert outputs == [str(tmp_path / x.output_file) for x in ladder]
+    sizes = []
+    for out in outputs:
+        info = FFprobe(out, use_cache=False).info
+        assert abs(info.duration - 4.37) < 0.1
+        assert len(info.audio_streams) == 1
+        sizes.append([x.height for x in info.video_streams])
+    assert sizes == [[180], [90], []]
+
+    # a report for every output, the last one done
+    last = {x.index: x for x in seen}
+    assert sorted(last) == [0, 1, 2]
+    assert all(x.done and x.percent == 100 for x in last.values())
+    assert last[0].size == os.path.getsize(outputs[0])
+    assert last[0].size > last[1].size
+
+
+def test_errors_per_output(tmp_path):
+    fan_out = FanOut(COUNTDOWN, [
+        Rendition('good.mp4', height=90, options=FAST),
+        Rendition('odd.mp4', width=215, height=121, options=FAST),
+    ], directory=str(tmp_path))
+
+    with pytest.raises(Exception) as e:
+        fan_out.run()
+    assert list(fan_out.errors)[0] == 1
+    assert 'width not divisible by 2' in fan_out.errors[1]
+    assert str(e.value).startswith('odd.mp4: ')
+
+    fan_out = FanOut(COUNTDOWN, [
+        Rendition('good.mp4', options=FAST),
+        Rendition('bad.mp4', video_codec='nocodec'),
+    ], directory=str(tmp_path))
+    with pytest.raises(Exception):
+        fan_out.run()
+    assert fan_out.errors == {1: "Unknown encoder 'nocodec'"}
+
+
+def test_command_braces():
+    # paths are not templates
+    fan_out = FanOut('/m/{draft} film.mkv', [Rendition('{a}.mp4')])
+    argv = fan_out.command().argv()
+
+    assert argv[argv.index('-i') + 1] == '/m/{draft} film.mkv'
+    assert argv[-1] == os.path.join('.', '{a}.mp4')
@@ -0,0 +1,53 @@
+import os
+
+from pyffmpeg import FFmpeg, FFprobe
+from pyffmpeg.segments import cut_points, keyframes, segmented_convert
+from conftest import EASY_LEMON, _frames
+
+
+def test_keyframes(long_video):
+    assert keyframes(long_video) == [float(x) for x in range(12)]
+
+
+def test_cut_points():
+    key_times = [0.0, 2.0, 4.0, 6.5, 8.0, 10.0]
+
+    assert cut_points(12.0, key_times, 3) == [4.0, 8.0]
+    assert cut_points(12.0, key_times, 4) == [2.0, 6.5, 8.0]
+    # never the start, never twice the same keyframe
+    assert cut_points(12.0, [0.0, 11.0], 4) == [11.0]
+
+
+def test_convert_clip(tmp_path):
+    ff = FFmpeg(str(tmp_path), enable_log=False)
+    ff.loglevel = 'info'
+    out = ff.convert(
+        EASY_LEMON, 'clip.wav', start=5, end=8, output_options=['-ac', '1'])
+
+    info = FFprobe(out, use_cache=False).info
+    assert abs(info.duration - 3) < 0.1
+    assert info.audio_streams[0].channels == 1
+
+
+def test_segmented_convert(long_video, tmp_path):
+    out = segmented_convert(
+        long_video, 'out.mp4', segments=3, min_segment=2,
+        directory=str(tmp_path),
+        output_options=['-c:v', 'libx264', '-preset', 'ultrafast'])
+
+    info = FFprobe(out, use_cache=False).info
+    assert out == os.path.join(str(tmp_path), 'out.mp4')
+    assert out.probe.info.duration == 12.0
+    assert abs(info.duration - 12.0) < 0.1
+    assert len(info.audio_streams) == 1
+    assert _frames(out) == 12 * 25
+    # the segments are gone
+    assert os.listdir(str(tmp_path)) == ['out.mp4']
+
+
+def test_segmented_convert_audio(tmp_path):
+    # no video to cut, converted in one go
+    out = segmented_convert(
+        EASY_LEMON, 'out.wav', segments=4, directory=str(tmp_path))
+
+    assert abs(FFprobe(out, use_cache=False).info.duration - 31.3) < 0.1
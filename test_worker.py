@@ -0,0 +1,129 @@
+import os
+import time
+
+import pytest
+from pyffmpeg import FFprobe
+from pyffmpeg.segments import segmented_convert
+from pyffmpeg.worker import Coordinator, _Channel, connect
+from conftest import EASY_LEMON, _frames
+
+
+def _clip_task(tmp_path, name='clip.wav'):
+    return {
+        'input_file': EASY_LEMON, 'output_file': str(tmp_path / name),
+        'start': 2, 'end': 4}
+
+
+def test_local_workers(long_video, tmp_path):
+    with Coordinator(heartbeat=0.5) as coordinator:
+        coordinator.spawn_local(2)
+        out = segmented_convert(
+            long_video, 'out.mp4', segments=3, min_segment=2,
+            directory=str(tmp_path), coordinator=coordinator,
+            output_options=['-c:v', 'libx264', '-preset', 'ultrafast'])
+
+    assert _frames(out) == 12 * 25
+    assert len(FFprobe(out, use_cache=False).info.audio_streams) == 1
+
+
+def test_failed_task(tmp_path):
+    with Coordinator(heartbeat=0.5) as coordinator:
+        coordinator.spawn_local(1)
+        task = _clip_task(tmp_path)
+        task['input_file'] = 'not_a_file.mp3'
+        with pytest.raises(Exception):
+            coordinator.submit(task).result(timeout=30)
+
+
+def test_lost_worker(tmp_path):
+    with Coordinator(heartbeat=0.2) as coordinator:
+        # takes the task, then never answers nor beats
+        silent = _Channel(connect(coordinator.address))
+        silent.send(type='hello', worker='silent', token=coordinator.token)
+        while not coordinator.workers:
+            time.sleep(0.01)
+        future = coordinator.submit(_clip_task(tmp_path))
+        message = next(iter(silent))
+        assert message['type'] == 'task'
+
+        coordinator.spawn_local(1)
+        out = future.result(timeout=30)
+        silent.close()
+
+    # the silent worker had a file of its own, still free to write
+    assert message['args']['output_file'] != out
+    assert out == str(tmp_path / 'clip.wav')
+    assert os.listdir(str(tmp_path)) == ['clip.wav']
+    assert abs(FFprobe(out, use_cache=False).info.duration - 2) < 0.1
+
+
+def _hello(coordinator, name, token=None):
+    channel = _Channel(connect(coordinator.address))
+    channel.send(type='hello', worker=name, token=token or coordinator.token)
+    return channel
+
+
+def test_wrong_token(tmp_path):
+    with Coordinator(heartbeat=0.2, token='secret') as coordinator:
+        channel = _hello(coordinator, 'intruder', token='guess')
+        # refused and hung up on
+        assert list(channel) == []
+        assert coordinator.workers == 0
+        channel.close()
+
+
+def test_done_output_ignored(tmp_path):
+    keep = tmp_path / 'keep.txt'
+    keep.write_text('mine')
+    with Coordinator(heartbeat=0.2) as coordinator:
+        channel = _hello(coordinator, 'liar')
+        while not coordinator.workers:
+            time.sleep(0.01)
+        future = coordinator.submit(_clip_task(tmp_path))
+        message = next(iter(channel))
+        channel.send(type='done', task=message['task'], output=str(keep))
+
+        # the attempt's file was never written, so nothing is renamed
+        with pytest.raises(OSError):
+            future.result(timeout=30)
+        channel.close()
+
+    assert keep.read_text() == 'mine'
+    assert sorted(os.listdir(str(tmp_path))) == ['keep.txt']
+
+
+def test_replaced_worker(tmp_path):
+    with Coordinator(heartbeat=0.5) as coordinator:
+        first = _hello(coordinator, 'same')
+        while not coordinator.workers:
+            time.sleep(0.01)
+        future = coordinator.submit(_clip_task(tmp_path))
+        assert next(iter(first))['type'] == 'task'
+
+        # a new hello with the name takes over, the task is handed out
+        # again rather than lost with the first connection
+        second = _hello(coordinator, 'same')
+        message = next(iter(second))
+        assert message['type'] == 'task'
+        assert message['task'] == 0
+        second.close()
+        first.close()
+
+        coordinator.spawn_local(1)
+        assert future.result(timeout=30) == str(tmp_path / 'clip.wav')
+
+
+def test_no_workers(tmp_path):
+    with Coordinator(heartbeat=0.1, worker_timeout=0.3) as coordinator:
+        future = coordinator.submit(_clip_task(tmp_path))
+        with pytest.raises(Exception, match='No worker'):
+            future.result(timeout=30)
+
+
+def test_worker_process(tmp_path):
+    address = 'unix:' + str(tmp_path / 'coordinator.sock')
+    with Coordinator(address, heartbeat=0.5) as coordinator:
+        coordinator.spawn_local(1, processes=True)
+        out = coordinator.submit(_clip_task(tmp_path)).result(timeout=60)
+
+    assert os.path.exists(out)